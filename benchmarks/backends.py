@@ -0,0 +1,345 @@
+import asyncio
+import gzip
+import json
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+from unittest import mock
+
+import httpx
+from neo4j import Record
+
+from benchmarks.fixtures import facet_key
+from src.resources import neo4j, psql
+from src.tools import llm, openvirome_client, palmprints
+from src.tools.request_encoding import (
+    ACCESSION_RANGES_FORMAT,
+    decode_accessions,
+    zstandard,
+)
+from src.tools.workflows import cache as workflow_cache
+
+# Columns returned for plain palm_virome selections, in fixture result-row order
+PALM_VIROME_COLUMNS = [
+    "run",
+    "palm_id",
+    "tax_species",
+    "tax_family",
+    "gb_pid",
+    "node_coverage",
+]
+PALM_VIROME_QUERY = f"SELECT {', '.join(PALM_VIROME_COLUMNS)} FROM palm_virome"
+
+
+def _read_payload(request: httpx.Request) -> dict:
+    # Accepts the opt-in request encodings, like an API that supports them would
+    content = request.content
+    coding = request.headers.get("Content-Encoding")
+    if coding == "gzip":
+        content = gzip.decompress(content)
+    elif coding == "zstd":
+        content = zstandard.ZstdDecompressor().decompress(content)
+    payload = json.loads(content)
+    ids = payload.get("ids")
+    if isinstance(ids, dict) and ids.get("format") == ACCESSION_RANGES_FORMAT:
+        payload["ids"] = decode_accessions(ids)
+    return payload
+
+
+def _page(rows: list, payload: dict) -> list:
+    start, end = payload.get("pageStart"), payload.get("pageEnd")
+    if start is None or end is None:
+        return rows
+    return rows[start:end]
+
+
+class _Cursor:
+    def __init__(self, backends: "ReplayBackends") -> None:
+        self._backends = backends
+        self._rows: list[tuple] = []
+        self._position = 0
+        self.description = None
+        self.itersize = 2000
+
+    def __enter__(self) -> "_Cursor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def execute(self, query: str, params: tuple | None = None) -> None:
+        colnames, self._rows = self._backends.sql_rows(query, params)
+        self._position = 0
+        self.description = [(name,) for name in colnames]
+
+    def fetchall(self) -> list[tuple]:
+        return self.fetchmany(len(self._rows))
+
+    def fetchmany(self, size: int) -> list[tuple]:
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class _Connection:
+    def __init__(self, backends: "ReplayBackends") -> None:
+        self._backends = backends
+
+    def cursor(self, name: str | None = None) -> _Cursor:
+        del name
+        return _Cursor(self._backends)
+
+    def rollback(self) -> None:
+        pass
+
+
+class _Pool:
+    def __init__(self, backends: "ReplayBackends") -> None:
+        self._backends = backends
+
+    def acquire(self) -> _Connection:
+        return _Connection(self._backends)
+
+    def release(self, conn: _Connection) -> None:
+        pass
+
+    @contextmanager
+    def connection(self) -> Iterator[_Connection]:
+        yield self.acquire()
+
+
+class _Result:
+    def __init__(self, keys: list[str], records: list[Record]) -> None:
+        self._keys = keys
+        self._records = records
+
+    def keys(self) -> list[str]:
+        return self._keys
+
+    def __iter__(self) -> Iterator[Record]:
+        return iter(self._records)
+
+
+class _Session:
+    """A Neo4j session, and its read transactions, answered from the fixture."""
+
+    def __init__(self, backends: "ReplayBackends") -> None:
+        self._backends = backends
+
+    def __enter__(self) -> "_Session":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def run(self, query: str, parameters: dict | None = None) -> _Result:
+        return self._backends.neo4j_result(query, parameters or {})
+
+    def execute_read(self, work):
+        return work(self)
+
+
+class _Driver:
+    def __init__(self, backends: "ReplayBackends") -> None:
+        self._backends = backends
+
+    def session(self, **kwargs) -> _Session:
+        del kwargs
+        return _Session(self._backends)
+
+    def close(self) -> None:
+        pass
+
+
+class _ChatModel:
+    """Stands in for the chat model so LLM nodes time everything but the completion."""
+
+    def __init__(self, schema=None) -> None:
+        self.schema = schema
+
+    def with_structured_output(self, schema) -> "_ChatModel":
+        return _ChatModel(schema)
+
+    def invoke(self, messages: list[dict]) -> dict:
+        del messages
+        report = {
+            "rating": 50.0,
+            "reasoning": "benchmark",
+            "supporting_metadata_counts": [],
+            "supporting_mwas_results": [],
+        }
+        fields = getattr(self.schema, "__annotations__", {})
+        if "validation_report" in fields:
+            return {"validation_report": report, "anomaly_report": dict(report)}
+        return report
+
+    async def ainvoke(self, messages: list[dict]) -> dict:
+        return self.invoke(messages)
+
+
+class ReplayBackends:
+    """
+    Serves the OpenVirome API, Postgres, Neo4j and the LLM from a fixture, in-process.
+    The real client-side code paths (payload encoding, response decoding, row and
+    record conversion) still run; only the network and databases are replaced.
+    """
+
+    def __init__(self, fixture: dict) -> None:
+        self.fixture = fixture
+        self.requests: list[str] = []
+        self._results_by_run: dict[str, list[dict]] = {}
+        for row in fixture["results"]:
+            self._results_by_run.setdefault(row["run"], []).append(row)
+        # Backend responses are built once per distinct query, so repeated runs only
+        # time the client-side conversion
+        self._sql_cache: dict[tuple, tuple[list[str], list[tuple]]] = {}
+        self._neo4j_cache: dict[tuple, _Result] = {}
+        self._adjacency: dict[str, list[tuple[str, float]]] = {}
+        for palm_id1, palm_id2, pident in fixture["palm_graph"]:
+            self._adjacency.setdefault(palm_id1, []).append((palm_id2, pident))
+            self._adjacency.setdefault(palm_id2, []).append((palm_id1, pident))
+
+    ### OpenVirome API
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        route = "/" + request.url.path.rsplit("/", 1)[-1]
+        payload = _read_payload(request)
+        self.requests.append(route)
+        if route == "/identifiers":
+            body = self.fixture["identifiers"]
+        elif route == "/counts":
+            rows = self.fixture["counts"].get(
+                facet_key(payload["table"], payload["groupBy"]), []
+            )
+            body = _page(rows, payload)
+        elif route == "/results":
+            body = _page(
+                self._results_for(payload["idColumn"], payload["ids"]), payload
+            )
+        elif route == "/mwas":
+            ids = set(payload["ids"])
+            families = payload.get("virusFamilies")
+            families = set(families) if families else None
+            rows = [
+                row
+                for row in self.fixture["mwas"]
+                if row["bioproject"] in ids
+                and (families is None or row["family"] in families)
+            ]
+            body = _page(rows, payload)
+        else:
+            return httpx.Response(404, json={"message": f"Unknown route {route}"})
+        return httpx.Response(200, content=json.dumps(body).encode("utf-8"))
+
+    def _results_for(self, id_column: str, ids: list[str]) -> list[dict]:
+        if id_column == "run":
+            return [row for run in ids for row in self._results_by_run.get(run, ())]
+        ids = set(ids)
+        return [row for row in self.fixture["results"] if row.get(id_column) in ids]
+
+    ### Postgres
+
+    def sql_rows(
+        self, query: str, params: tuple | None
+    ) -> tuple[list[str], list[tuple]]:
+        key = (query, params)
+        if key not in self._sql_cache:
+            self._sql_cache[key] = self._build_sql_rows(query, params)
+        return self._sql_cache[key]
+
+    def _build_sql_rows(
+        self, query: str, params: tuple | None
+    ) -> tuple[list[str], list[tuple]]:
+        if "tax_species" in query and "gb_pid >=" in query:
+            threshold = float(params[-1]) if params else 0.0
+            rows = [
+                tuple(row) for row in self.fixture["palm_virome"] if row[2] >= threshold
+            ]
+            return ["palm_id", "tax_species", "gb_pid"], rows
+        if "FROM palm_virome" in query:
+            rows = [
+                tuple(row.get(column) for column in PALM_VIROME_COLUMNS)
+                for row in self.fixture["results"]
+            ]
+            return PALM_VIROME_COLUMNS, rows
+        raise ValueError(f"No fixture data for SQL query: {query}")
+
+    ### Neo4j
+
+    def neo4j_result(self, query: str, parameters: dict) -> _Result:
+        key = (
+            query,
+            tuple(parameters.get("palm_ids", ())),
+            parameters.get("percent_identity"),
+        )
+        if key not in self._neo4j_cache:
+            keys, rows = self._build_neo4j_rows(query, parameters)
+            records = [Record(zip(keys, row)) for row in rows]
+            self._neo4j_cache[key] = _Result(keys, records)
+        return self._neo4j_cache[key]
+
+    def _build_neo4j_rows(
+        self, query: str, parameters: dict
+    ) -> tuple[list[str], list[list]]:
+        if "palm_ids" not in parameters:
+            edges = [list(edge) for edge in self.fixture["palm_graph"]]
+            return ["palm_id1", "palm_id2", "pident"], edges
+        threshold = parameters.get("percent_identity", 0.0)
+        edges = [
+            [palm_id, neighbor_id, pident]
+            for palm_id in parameters["palm_ids"]
+            for neighbor_id, pident in self._adjacency.get(palm_id, ())
+            if pident >= threshold
+        ]
+        if "AS palm_id1" not in query:
+            neighbors = dict.fromkeys(neighbor_id for _, neighbor_id, _ in edges)
+            return ["palm_id"], [[neighbor_id] for neighbor_id in neighbors]
+        return ["palm_id1", "palm_id2", "pident"], edges
+
+    def neo4j_connection(self) -> neo4j.Neo4jConnection:
+        """Return a Neo4jConnection whose read transactions run against the fixture."""
+        return neo4j.Neo4jConnection(None, None, None, driver=_Driver(self))
+
+    ### Installation
+
+    @contextmanager
+    def install(self) -> Iterator["ReplayBackends"]:
+        """Route every backend used by the workflows to this fixture."""
+        transport = httpx.MockTransport(self.handle_request)
+        sync_client = httpx.Client(
+            base_url=openvirome_client.OPENVIROME_API_URL, transport=transport
+        )
+        async_clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+        def get_async_client() -> httpx.AsyncClient:
+            loop = asyncio.get_running_loop()
+            if loop not in async_clients:
+                async_clients[loop] = httpx.AsyncClient(
+                    base_url=openvirome_client.OPENVIROME_API_URL, transport=transport
+                )
+            return async_clients[loop]
+
+        connection = self.neo4j_connection()
+        pool = _Pool(self)
+        with ExitStack() as stack:
+            patches = [
+                (openvirome_client, "get_openvirome_client", lambda: sync_client),
+                (openvirome_client, "get_openvirome_async_client", get_async_client),
+                (palmprints, "get_palm_graph_index", lambda: None),
+                (palmprints, "get_species_index", lambda: None),
+                (psql, "get_connection_pool", lambda database="serratus": pool),
+                (neo4j, "get_connection", lambda: connection),
+                (llm, "get_openai_client", lambda *args, **kwargs: _ChatModel()),
+                (llm, "get_llm_cache", lambda: None),
+                (workflow_cache, "get_workflow_store", lambda: None),
+            ]
+            for module, name, replacement in patches:
+                stack.enter_context(mock.patch.object(module, name, replacement))
+            openvirome_client.invalidate_openvirome_cache()
+            try:
+                yield self
+            finally:
+                openvirome_client.invalidate_openvirome_cache()
+                sync_client.close()
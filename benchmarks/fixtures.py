@@ -0,0 +1,245 @@
+import gzip
+import json
+import os
+import random
+
+from src.tools.workflows.metadata_counts import FACETS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Synthetic fixture sizes, used for any scale that has no recorded fixture
+SCALES = {
+    "small": {
+        "species": "Benchmark small virus",
+        "palm_ids": 5,
+        "neighbors_per_palm_id": 3,
+        "runs": 50,
+        "rows_per_run": 2,
+        "facet_values": 20,
+        "mwas_results": 20,
+    },
+    "medium": {
+        "species": "Benchmark medium virus",
+        "palm_ids": 200,
+        "neighbors_per_palm_id": 5,
+        "runs": 5_000,
+        "rows_per_run": 3,
+        "facet_values": 200,
+        "mwas_results": 500,
+    },
+    "very_large": {
+        "species": "Benchmark very large virus",
+        "palm_ids": 2_000,
+        "neighbors_per_palm_id": 8,
+        "runs": 100_000,
+        "rows_per_run": 2,
+        "facet_values": 1_000,
+        "mwas_results": 5_000,
+    },
+}
+
+VIRUS_FAMILIES = [f"Benchmarkviridae{i:02d}" for i in range(30)]
+BIOME_IDS = [f"WWF_TEW_BIOME_{i:02d}" for i in [*range(1, 15), 98, 99]]
+
+# Responses every fixture holds, besides its scale, source and species
+FIXTURE_SECTIONS = (
+    "palm_virome",
+    "palm_graph",
+    "identifiers",
+    "counts",
+    "results",
+    "mwas",
+)
+
+
+def facet_key(table: str, group_by: str) -> str:
+    """Key of a /counts histogram in a fixture."""
+    return f"{table}.{group_by}"
+
+
+def make_fixture(scale: str, source: str, species: str, **sections) -> dict:
+    """
+    Assemble a fixture, checking it has every section the benchmarks read.
+    Args:
+        scale: Fixture scale, e.g. "small".
+        source: "recorded" or "synthetic".
+        species: The virus species the fixture was built for.
+        **sections: The FIXTURE_SECTIONS responses.
+    Returns:
+        The fixture.
+    """
+    missing = set(FIXTURE_SECTIONS) - set(sections)
+    if missing:
+        raise ValueError(f"Fixture is missing sections: {sorted(missing)}")
+    return {"scale": scale, "source": source, "species": species, **sections}
+
+
+def generate_fixture(scale: str, seed: int = 0) -> dict:
+    """
+    Generate a deterministic synthetic fixture with the sizes configured for `scale`.
+    Args:
+        scale: One of SCALES.
+        seed: Random seed.
+    Returns:
+        A fixture in the same format as a recorded one.
+    """
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    species = sizes["species"]
+
+    palm_ids = [f"u{scale[0]}{i:06d}" for i in range(sizes["palm_ids"])]
+    palm_virome = [
+        [palm_id, species, round(rng.uniform(70, 100), 1)] for palm_id in palm_ids
+    ]
+    palm_graph = []
+    neighbor_ids = []
+    for palm_id in palm_ids:
+        for _ in range(sizes["neighbors_per_palm_id"]):
+            neighbor_id = f"n{scale[0]}{len(neighbor_ids):07d}"
+            neighbor_ids.append(neighbor_id)
+            palm_graph.append([palm_id, neighbor_id, round(rng.uniform(0.7, 1.0), 3)])
+
+    identifiers = _generate_identifiers(sizes["runs"])
+    return make_fixture(
+        scale,
+        "synthetic",
+        species,
+        palm_virome=palm_virome,
+        palm_graph=palm_graph,
+        identifiers=identifiers,
+        counts=_generate_counts(sizes, rng, identifiers),
+        results=_generate_results(sizes, rng, identifiers, neighbor_ids),
+        mwas=_generate_mwas(sizes, rng, identifiers, neighbor_ids),
+    )
+
+
+def _generate_identifiers(num_runs: int) -> dict:
+    runs = [f"SRR{i:08d}" for i in range(num_runs)]
+    biosamples = [f"SAMN{i:08d}" for i in range(max(1, num_runs * 4 // 5))]
+    bioprojects = [f"PRJNA{i:06d}" for i in range(max(1, num_runs // 50))]
+    return {
+        "run": {"totalCount": len(runs), "single": runs},
+        "biosample": {"totalCount": len(biosamples), "single": biosamples},
+        "bioproject": {"totalCount": len(bioprojects), "single": bioprojects},
+    }
+
+
+def _generate_counts(sizes: dict, rng: random.Random, identifiers: dict) -> dict:
+    num_runs = identifiers["run"]["totalCount"]
+    counts = {}
+    for table, group_by, _ in FACETS.values():
+        names = (
+            BIOME_IDS
+            if table.startswith("bgl")
+            else [f"{group_by}_{j}" for j in range(sizes["facet_values"])]
+        )
+        counts[facet_key(table, group_by)] = sorted(
+            ({"name": name, "count": rng.randint(1, num_runs)} for name in names),
+            key=lambda row: -row["count"],
+        )
+    return counts
+
+
+def _generate_results(
+    sizes: dict, rng: random.Random, identifiers: dict, neighbor_ids: list[str]
+) -> list[dict]:
+    runs = identifiers["run"]["single"]
+    # Co-occurring viruses make up most rows, as they do for real runs
+    results = []
+    for run in runs:
+        for _ in range(sizes["rows_per_run"]):
+            if rng.random() < 0.3:
+                palm_id, family = rng.choice(neighbor_ids), VIRUS_FAMILIES[0]
+            else:
+                palm_id = f"x{rng.randrange(10 * len(runs)):08d}"
+                family = rng.choice(VIRUS_FAMILIES)
+            results.append(
+                {
+                    "run": run,
+                    "palm_id": palm_id,
+                    "tax_species": sizes["species"],
+                    "tax_family": family,
+                    "gb_pid": round(rng.uniform(50, 100), 1),
+                    "node_coverage": round(rng.uniform(1, 1000), 2),
+                }
+            )
+    return results
+
+
+def _generate_mwas(
+    sizes: dict, rng: random.Random, identifiers: dict, neighbor_ids: list[str]
+) -> list[dict]:
+    biosamples = identifiers["biosample"]["single"]
+    bioprojects = identifiers["bioproject"]["single"]
+    mwas = []
+    for i in range(sizes["mwas_results"]):
+        mwas.append(
+            {
+                "bioproject": rng.choice(bioprojects),
+                "family": VIRUS_FAMILIES[0] if i % 2 else rng.choice(VIRUS_FAMILIES),
+                "metadata_field": f"field_{i % 50}",
+                "metadata_value": f"value_{i}",
+                "num_true": str(rng.randint(1, 100)),
+                "num_false": str(rng.randint(1, 100)),
+                "mean_rpm_true": str(rng.uniform(0, 100)),
+                "mean_rpm_false": str(rng.uniform(0, 100)),
+                "sd_rpm_true": str(rng.uniform(0, 10)),
+                "sd_rpm_false": str(rng.uniform(0, 10)),
+                "fold_change": str(rng.uniform(0, 10)),
+                "test_statistic": str(rng.uniform(0, 10)),
+                "p_value": str(rng.uniform(0, 0.05)),
+                "biosamples": rng.sample(biosamples, min(5, len(biosamples))),
+                "sotus": rng.sample(neighbor_ids, min(5, len(neighbor_ids))),
+                "taxSpecies": [sizes["species"]],
+            }
+        )
+    return mwas
+
+
+def fixture_path(scale: str, fixtures_dir: str = FIXTURES_DIR) -> str:
+    """Path of the recorded fixture for a scale."""
+    return os.path.join(fixtures_dir, f"{scale}.json.gz")
+
+
+def save_fixture(fixture: dict, path: str) -> None:
+    """Write a fixture as gzipped JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(fixture, f)
+
+
+def load_fixture(scale: str, fixtures_dir: str = FIXTURES_DIR) -> dict:
+    """
+    Load the recorded fixture for a scale, or generate a synthetic one if none exists.
+    Args:
+        scale: Fixture scale, e.g. "small", "medium" or "very_large".
+        fixtures_dir: Directory holding recorded `<scale>.json.gz` fixtures.
+    Returns:
+        The fixture.
+    """
+    path = fixture_path(scale, fixtures_dir)
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    if scale not in SCALES:
+        raise ValueError(
+            f"No recorded fixture at {path} and no synthetic scale {scale}."
+            f" Synthetic scales are: {list(SCALES)}"
+        )
+    return generate_fixture(scale)
+
+
+def describe_fixture(fixture: dict) -> dict[str, object]:
+    """Summarize a fixture's source and sizes for benchmark reports."""
+    identifiers = fixture["identifiers"]
+    return {
+        "source": fixture["source"],
+        "species": fixture["species"],
+        "palm_ids": len(fixture["palm_virome"]),
+        "palm_graph_edges": len(fixture["palm_graph"]),
+        "runs": len(identifiers["run"]["single"]),
+        "biosamples": len(identifiers["biosample"]["single"]),
+        "bioprojects": len(identifiers["bioproject"]["single"]),
+        "results_rows": len(fixture["results"]),
+        "mwas_results": len(fixture["mwas"]),
+    }
@@ -0,0 +1,146 @@
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+from benchmarks.fixtures import (
+    FIXTURES_DIR,
+    facet_key,
+    fixture_path,
+    make_fixture,
+    save_fixture,
+)
+from src.resources.psql import iter_sql_query
+from src.tools import openvirome, openvirome_results, palmprints
+from src.tools.workflows.metadata_counts import FACETS
+
+# Thresholds used by the virus_metadata_analysis workflow
+SPECIES_PERCENT_IDENTITY = 80
+SIMILARITY_PERCENT_IDENTITY = 80
+
+
+def record_fixture(species: str, scale: str) -> dict:
+    """
+    Record a fixture for one virus species from the live backends.
+    Follows the same lookups as the virus_metadata_analysis workflow, keeping every
+    response the workflow (and the component benchmarks) would read.
+    Args:
+        species: The virus species label to record.
+        scale: Name to record the fixture under, e.g. "small" or "very_large".
+    Returns:
+        The recorded fixture.
+    """
+    logging.info("Recording %s fixture for %s", scale, species)
+    palm_virome, palm_graph, similar_palm_ids = _record_palm_graph(species)
+
+    filters = [
+        {"filterType": "sotu", "filterValue": palm_id, "groupByKey": "sotu"}
+        for palm_id in similar_palm_ids
+    ]
+    identifiers = openvirome.get_sra_identifiers_by_filters(filters, use_cache=False)
+    runs = identifiers.get("run", {}).get("single", [])
+    biosamples = identifiers.get("biosample", {}).get("single", [])
+
+    facet_counts = openvirome.get_facet_counts_by_identifiers(
+        list(FACETS.values()),
+        {"run": runs, "biosample": biosamples},
+        sort_by_column="count",
+        sort_by_direction="desc",
+        use_cache=False,
+    )
+    results = list(
+        openvirome_results.iter_results_by_identifiers(
+            "palm_virome", "run", runs, use_cache=False
+        )
+    )
+    return make_fixture(
+        scale,
+        "recorded",
+        species,
+        palm_virome=palm_virome,
+        palm_graph=palm_graph,
+        identifiers=identifiers,
+        counts={
+            facet_key(table, group_by): rows
+            for (table, group_by, _), rows in facet_counts.items()
+        },
+        results=results,
+        mwas=_record_mwas(identifiers, results, similar_palm_ids),
+    )
+
+
+def _record_palm_graph(species: str) -> tuple[list, list, list[str]]:
+    """Return the species' palm_virome rows, its similarity edges and similar ids."""
+    palm_virome = [
+        [palm_id, tax_species, float(gb_pid)]
+        for _, rows in iter_sql_query(
+            palmprints.PALM_IDS_BY_SPECIES_QUERY,
+            params=(palmprints.species_pattern(species), 0),
+        )
+        for palm_id, tax_species, gb_pid in rows
+        if gb_pid is not None
+    ]
+    palm_ids = list(
+        dict.fromkeys(
+            row[0] for row in palm_virome if row[2] >= SPECIES_PERCENT_IDENTITY
+        )
+    )
+
+    batches = palmprints.run_similarity_batches(
+        palmprints.SIMILAR_PALM_IDS_QUERY, palm_ids, SIMILARITY_PERCENT_IDENTITY
+    )
+    palm_graph = [
+        [palm_id1, palm_id2, pident]
+        for columns in batches
+        for palm_id1, palm_id2, pident in zip(
+            columns["palm_id1"], columns["palm_id2"], columns["pident"]
+        )
+    ]
+    similar_palm_ids = list(
+        dict.fromkeys(edge[1] for edge in palm_graph if edge[1] not in palm_ids)
+    )
+    return palm_virome, palm_graph, similar_palm_ids
+
+
+def _record_mwas(
+    identifiers: dict, results: list[dict], similar_palm_ids: list[str]
+) -> list[dict]:
+    """Return the MWAS results for the similar viruses' families."""
+    bioprojects = identifiers.get("bioproject", {}).get("single", [])
+    similar = set(similar_palm_ids)
+    virus_families = sorted(
+        {
+            row["tax_family"]
+            for row in results
+            if row.get("palm_id") in similar and row.get("tax_family")
+        }
+    )
+    if not bioprojects or not virus_families:
+        return []
+    return openvirome.get_mwas_results_by_identifiers(
+        "bioproject", bioprojects, virus_families, use_cache=False
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Record a benchmark fixture from the live backends"
+    )
+    parser.add_argument("--species", required=True, help="Virus species label")
+    parser.add_argument("--scale", required=True, help="Fixture name, e.g. small")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture directory")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    fixture = record_fixture(args.species, args.scale)
+    path = fixture_path(args.scale, args.fixtures)
+    save_fixture(fixture, path)
+    logging.info("Wrote fixture to %s", path)
+
+
+if __name__ == "__main__":
+    main()
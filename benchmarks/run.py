@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.backends import PALM_VIROME_QUERY, ReplayBackends
+from benchmarks.fixtures import FIXTURES_DIR, describe_fixture, load_fixture
+from src.prompts.evidence import estimate_tokens
+from src.prompts.metadata_analysis import (
+    anomaly_detection_user_prompt,
+    combined_analysis_user_prompt,
+    validate_hypothesis_user_prompt,
+)
+from src.resources import neo4j
+from src.resources.psql import iter_sql_query, iter_sql_query_columns, run_sql_query
+from src.tools import openvirome, openvirome_client, openvirome_results, palmprints
+from src.tools.json_stream import ResponseDecoder
+from src.tools.workflows.virus_metadata_analysis import graph
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SCALES = ["small", "medium", "very_large"]
+DEFAULT_REPEATS = 5
+HYPOTHESIS = "The virus is associated with respiratory disease in mammalian hosts"
+
+
+class BenchmarkRun:
+    """Times benchmark cases and collects their summaries."""
+
+    def __init__(self, repeats: int, warmup: int = 1) -> None:
+        self.repeats = repeats
+        self.warmup = warmup
+        self.results: list[dict[str, object]] = []
+
+    def _record(
+        self, scale: str, group: str, name: str, samples: list[float], **extra
+    ) -> None:
+        result = {
+            "scale": scale,
+            "group": group,
+            "name": name,
+            "repeats": len(samples),
+            "min_ms": min(samples) * 1000,
+            "median_ms": statistics.median(samples) * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "max_ms": max(samples) * 1000,
+            **extra,
+        }
+        self.results.append(result)
+        logging.warning(
+            "%-10s %-10s %-60s median %10.3f ms",
+            scale,
+            group,
+            name,
+            result["median_ms"],
+        )
+
+    def time(self, scale: str, group: str, name: str, fn, setup=None, **extra):
+        """Time a sync callable; `setup` runs untimed before every call."""
+        samples, value = [], None
+        for i in range(self.warmup + self.repeats):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            value = fn()
+            if i >= self.warmup:
+                samples.append(time.perf_counter() - started)
+        self._record(scale, group, name, samples, **extra)
+        return value
+
+    async def time_async(
+        self, scale: str, group: str, name: str, fn, setup=None, **extra
+    ):
+        """Time an async callable; `setup` runs untimed before every call."""
+        samples, value = [], None
+        for i in range(self.warmup + self.repeats):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            value = await fn()
+            if i >= self.warmup:
+                samples.append(time.perf_counter() - started)
+        self._record(scale, group, name, samples, **extra)
+        return value
+
+
+def _clear_caches() -> None:
+    openvirome_client.invalidate_openvirome_cache()
+
+
+def _node_runnable(namespace: tuple[str, ...], name: str):
+    # Subgraph namespaces look like "<parent node>:<task id>"
+    current = graph
+    for part in namespace:
+        current = current.builder.nodes[part.split(":")[0]].runnable
+    return current.builder.nodes[name].runnable
+
+
+async def _capture_node_inputs(initial_state: dict) -> list[tuple[tuple, str, dict]]:
+    tasks = []
+    async for namespace, event in graph.astream(
+        initial_state, stream_mode="debug", subgraphs=True
+    ):
+        if event["type"] == "task":
+            payload = event["payload"]
+            tasks.append((namespace, payload["name"], payload["input"]))
+    return tasks
+
+
+async def bench_workflow(run: BenchmarkRun, scale: str, initial_state: dict) -> dict:
+    final_state = await run.time_async(
+        scale,
+        "graph",
+        "virus_metadata_analysis",
+        lambda: graph.ainvoke(initial_state),
+        setup=_clear_caches,
+    )
+    for namespace, name, node_input in await _capture_node_inputs(initial_state):
+        runnable = _node_runnable(namespace, name)
+        path = "/".join([part.split(":")[0] for part in namespace] + [name])
+        await run.time_async(
+            scale,
+            "node",
+            path,
+            lambda runnable=runnable, node_input=node_input: runnable.ainvoke(
+                node_input
+            ),
+            setup=_clear_caches,
+        )
+    return final_state
+
+
+def bench_openvirome_codec(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    _bench_openvirome_encode(run, scale, fixture)
+    _bench_openvirome_decode(run, scale, fixture)
+
+
+def _bench_openvirome_encode(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    runs = fixture["identifiers"]["run"]["single"]
+    page_size = openvirome_results.RESULTS_PAGE_SIZE
+
+    def payload(ids) -> dict:
+        return openvirome.results_payload(
+            "palm_virome", "run", ids, True, None, None, 0, page_size
+        )
+
+    encode = openvirome_client.encode_payload
+    run.time(scale, "openvirome", "encode_payload", lambda: encode(payload(runs)))
+    encoded_ids = run.time(
+        scale, "openvirome", "encode_ids", lambda: openvirome_client.EncodedIds(runs)
+    )
+    run.time(
+        scale,
+        "openvirome",
+        "encode_payload_shared_ids",
+        lambda: encode(payload(encoded_ids)),
+    )
+
+    encode_request = openvirome_client.encode_request
+    for name, coding, compact in [
+        ("encode_request_gzip", "gzip", False),
+        ("encode_request_compact_ids", None, True),
+        ("encode_request_compact_ids_gzip", "gzip", True),
+    ]:
+        content, _, _ = encode_request(payload(runs), coding, compact)
+        run.time(
+            scale,
+            "openvirome",
+            name,
+            lambda coding=coding, compact=compact: encode_request(
+                payload(runs), coding, compact
+            ),
+            bytes=len(content),
+        )
+
+
+def _bench_openvirome_decode(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    page_size = openvirome_results.RESULTS_PAGE_SIZE
+    decode = openvirome_client.decode_response
+    request = httpx.Request("POST", openvirome_client.OPENVIROME_API_URL + "/results")
+    bodies = {
+        "decode_results_page": fixture["results"][:page_size],
+        "decode_identifiers": fixture["identifiers"],
+    }
+    for name, body in bodies.items():
+        content = json.dumps(body).encode("utf-8")
+        run.time(
+            scale,
+            "openvirome",
+            name,
+            lambda content=content: decode(
+                httpx.Response(200, content=content, request=request)
+            ),
+            bytes=len(content),
+        )
+
+    content = json.dumps(bodies["decode_results_page"]).encode("utf-8")
+
+    def decode_streaming(content: bytes, chunk_size: int = 65536) -> int:
+        decoder = ResponseDecoder()
+        rows = 0
+        for start in range(0, len(content), chunk_size):
+            rows += len(decoder.feed(content[start : start + chunk_size]))
+        return rows + len(decoder.close())
+
+    run.time(
+        scale,
+        "openvirome",
+        "decode_results_page_streaming",
+        lambda: decode_streaming(content),
+        bytes=len(content),
+    )
+    encoded = base64.b64encode(content)
+    run.time(
+        scale,
+        "openvirome",
+        "decode_results_page_streaming_base64",
+        lambda: decode_streaming(encoded),
+        bytes=len(encoded),
+    )
+
+
+def bench_sql(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    def consume(batches) -> int:
+        return sum(1 for _ in batches)
+
+    rows = len(fixture["results"])
+    run.time(
+        scale,
+        "sql",
+        "run_sql_query",
+        lambda: run_sql_query(PALM_VIROME_QUERY),
+        rows=rows,
+    )
+    run.time(
+        scale,
+        "sql",
+        "iter_sql_query",
+        lambda: consume(iter_sql_query(PALM_VIROME_QUERY)),
+        rows=rows,
+    )
+    run.time(
+        scale,
+        "sql",
+        "iter_sql_query_columns",
+        lambda: consume(iter_sql_query_columns(PALM_VIROME_QUERY)),
+        rows=rows,
+    )
+    run.time(
+        scale,
+        "sql",
+        "get_palm_ids_by_species",
+        lambda: palmprints.get_palm_ids_by_species(fixture["species"], 80),
+    )
+
+
+def bench_neo4j(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    palm_ids = [row[0] for row in fixture["palm_virome"]]
+    params = {"palm_ids": palm_ids, "percent_identity": 0.8}
+    edges = len(fixture["palm_graph"])
+    run.time(
+        scale,
+        "neo4j",
+        "query_columns",
+        lambda: neo4j.run_neo4j_query_columns(
+            palmprints.SIMILAR_PALM_IDS_QUERY, params
+        ),
+        edges=edges,
+    )
+    run.time(
+        scale,
+        "neo4j",
+        "get_similar_palm_ids_neo4j",
+        lambda: palmprints.get_similar_palm_ids_neo4j(palm_ids, 80),
+        edges=edges,
+    )
+    run.time(
+        scale,
+        "neo4j",
+        "get_similar_palm_id_neighbors_neo4j",
+        lambda: palmprints.get_similar_palm_id_neighbors_neo4j(palm_ids, 80),
+        edges=edges,
+    )
+
+
+def bench_prompts(run: BenchmarkRun, scale: str, final_state: dict) -> None:
+    # Same inputs the LLM nodes build their prompts from
+    species = final_state["user_input"]["species_label"]
+    hypothesis = f"{HYPOTHESIS}. Given virus species: {species}"
+    metadata_counts = {
+        k: v
+        for k, v in final_state.get("metadata_counts", {}).items()
+        if isinstance(v, list)
+    }
+    mwas_results = final_state.get("mwas_results", [])
+    prompts = {
+        "validate_hypothesis_user_prompt": validate_hypothesis_user_prompt,
+        "anomaly_detection_user_prompt": anomaly_detection_user_prompt,
+        "combined_analysis_user_prompt": combined_analysis_user_prompt,
+    }
+    for name, build in prompts.items():
+        prompt = build(
+            hypothesis=hypothesis,
+            metadata_counts=metadata_counts,
+            mwas_results=mwas_results,
+        )
+        run.time(
+            scale,
+            "prompt",
+            name,
+            lambda build=build: build(
+                hypothesis=hypothesis,
+                metadata_counts=metadata_counts,
+                mwas_results=mwas_results,
+            ),
+            chars=len(prompt),
+            tokens=estimate_tokens(prompt),
+        )
+
+
+async def bench_scale(run: BenchmarkRun, scale: str, fixture: dict) -> None:
+    backends = ReplayBackends(fixture)
+    with backends.install():
+        initial_state = {
+            "user_input": {
+                "species_label": fixture["species"],
+                "hypothesis": HYPOTHESIS,
+            }
+        }
+        final_state = await bench_workflow(run, scale, initial_state)
+        bench_openvirome_codec(run, scale, fixture)
+        bench_sql(run, scale, fixture)
+        bench_neo4j(run, scale, fixture)
+        bench_prompts(run, scale, final_state)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    scales: list[str],
+    repeats: int = DEFAULT_REPEATS,
+    fixtures_dir: str = FIXTURES_DIR,
+) -> dict[str, object]:
+    """
+    Run every benchmark against the fixture for each scale.
+    Args:
+        scales: Fixture scales to run.
+        repeats: Timed repetitions per benchmark, after one warm-up call.
+        fixtures_dir: Directory holding recorded fixtures.
+    Returns:
+        The benchmark report.
+    """
+    run = BenchmarkRun(repeats)
+    fixtures = {}
+    for scale in scales:
+        fixture = load_fixture(scale, fixtures_dir)
+        fixtures[scale] = describe_fixture(fixture)
+        asyncio.run(bench_scale(run, scale, fixture))
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "fixtures": fixtures,
+        "benchmarks": run.results,
+    }
+
+
+def compare_reports(baseline: dict, current: dict) -> list[dict[str, object]]:
+    """
+    Compare the median times of two benchmark reports.
+    Returns:
+        One entry per benchmark present in both, with the relative change in median.
+    """
+    baseline_medians = {
+        (b["scale"], b["group"], b["name"]): b["median_ms"]
+        for b in baseline["benchmarks"]
+    }
+    comparison = []
+    for b in current["benchmarks"]:
+        key = (b["scale"], b["group"], b["name"])
+        if key not in baseline_medians:
+            continue
+        before = baseline_medians[key]
+        comparison.append(
+            {
+                "scale": b["scale"],
+                "group": b["group"],
+                "name": b["name"],
+                "baseline_median_ms": before,
+                "median_ms": b["median_ms"],
+                "change": (b["median_ms"] - before) / before if before else None,
+            }
+        )
+    return comparison
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the workflow hot paths against recorded fixtures"
+    )
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture directory")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    report = run_benchmarks(args.scales, args.repeats, args.fixtures)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare_reports(json.load(f), report)
+        for entry in report["comparison"]:
+            change = entry["change"]
+            logging.warning(
+                "%-10s %-10s %-60s %+8.1f%%",
+                entry["scale"],
+                entry["group"],
+                entry["name"],
+                change * 100 if change is not None else 0.0,
+            )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.warning("Wrote benchmark report to %s", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import math
+import os
+
+from src.tools.workflows.state import MetadataCounts, MWASResult
+
+# Approximate token budget for the evidence section of a prompt, overridable with
+# PROMPT_TOKEN_BUDGET
+PROMPT_TOKEN_BUDGET = 3000
+# Rough characters per token of tabular English/ids text for GPT-4-class tokenizers
+CHARS_PER_TOKEN = 4
+# Rows of every metadata facet kept before MWAS and facet rows compete for the budget
+MIN_ROWS_PER_FACET = 3
+# MWAS hits are the primary evidence, so they get this many rows per facet row
+MWAS_ROW_WEIGHT = 2.0
+# Items of a list-valued cell (e.g. an MWAS hit's biosamples) written out in full
+MAX_LIST_ITEMS = 3
+
+MWAS_COLUMNS = [
+    "bioproject",
+    "family",
+    "metadata_field",
+    "metadata_value",
+    "num_true",
+    "num_false",
+    "mean_rpm_true",
+    "mean_rpm_false",
+    "sd_rpm_true",
+    "sd_rpm_false",
+    "fold_change",
+    "test_statistic",
+    "p_value",
+]
+MWAS_NUMERIC_COLUMNS = frozenset(MWAS_COLUMNS[4:])
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in `text` without loading a tokenizer."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _to_float(value: object) -> float | None:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_value(value: object, numeric: bool = False) -> str:
+    """
+    Format a table cell compactly: floats keep 3 significant digits, integers are
+    written as is, lists show their first MAX_LIST_ITEMS items and how many more
+    there are, and `|`/newlines are escaped so each row stays on one line.
+    Args:
+        value: The cell value.
+        numeric: Whether numeric strings (as returned by /mwas) should be rounded too.
+    Returns:
+        The formatted cell.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        items = [format_value(item, numeric) for item in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"+{len(value) - MAX_LIST_ITEMS} more")
+        return ",".join(items)
+    if isinstance(value, float) or (numeric and isinstance(value, str)):
+        number = _to_float(value)
+        if number is not None and math.isfinite(number):
+            if number.is_integer() and abs(number) < 1e15:
+                return str(int(number))
+            return f"{number:.3g}"
+    text = value if isinstance(value, str) else str(value)
+    return text.replace("|", "/").replace("\n", " ")
+
+
+def encode_table(columns: list[str], rows: list[list[str]]) -> str:
+    """Encode formatted rows as a header line and one `|`-separated line per row."""
+    return "\n".join("|".join(row) for row in [columns, *rows])
+
+
+def _facet_rows(values: list[dict]) -> list[list[str]]:
+    # Most frequent values first, as the API returns them when sorted by count
+    values = sorted(values, key=lambda row: -(_to_float(row.get("count")) or 0.0))
+    return [
+        [format_value(row.get("name")), format_value(row.get("count"))]
+        for row in values
+    ]
+
+
+def _mwas_rank(result: MWASResult) -> tuple[float, float]:
+    # Most significant first, then largest effect
+    p_value = _to_float(result.get("p_value"))
+    fold_change = _to_float(result.get("fold_change"))
+    return (
+        p_value if p_value is not None and not math.isnan(p_value) else math.inf,
+        -abs(math.log(fold_change)) if fold_change and fold_change > 0 else 0.0,
+    )
+
+
+def _is_numeric_column(results: list[MWASResult], column: str) -> bool:
+    values = [result.get(column) for result in results]
+    return any(value is not None for value in values) and all(
+        value is None or _to_float(value) is not None for value in values
+    )
+
+
+def _mwas_columns(results: list[MWASResult]) -> tuple[list[str], frozenset[str]]:
+    # Known columns come first in their usual order, then any other fields the API
+    # returned (e.g. differently cased ones) in the order first seen
+    present = dict.fromkeys(key for result in results for key in result)
+    columns = [c for c in MWAS_COLUMNS if c in present]
+    extra = [c for c in present if c not in MWAS_COLUMNS]
+    numeric = MWAS_NUMERIC_COLUMNS | {
+        c for c in extra if _is_numeric_column(results, c)
+    }
+    return columns + extra, numeric
+
+
+def _mwas_rows(results: list[MWASResult]) -> tuple[list[str], list[list[str]]]:
+    columns, numeric = _mwas_columns(results)
+    rows = [
+        [format_value(result.get(c), c in numeric) for c in columns]
+        for result in sorted(results, key=_mwas_rank)
+    ]
+    return columns, rows
+
+
+def _allocate(
+    sections: list[tuple[str, list[str], list[list[str]], float]],
+    token_budget: int,
+) -> list[int]:
+    # Greedily admits rows in order of rank / weight across sections (so every section
+    # keeps its best rows) until the next row no longer fits the budget.
+    used = sum(
+        estimate_tokens(title) + estimate_tokens("|".join(columns)) + 2
+        for title, columns, rows, _ in sections
+        if rows
+    )
+    candidates = sorted(
+        (
+            (
+                0.0 if rank < MIN_ROWS_PER_FACET and weight <= 1.0 else rank / weight,
+                index,
+                rank,
+            )
+            for index, (_, _, rows, weight) in enumerate(sections)
+            for rank in range(len(rows))
+        )
+    )
+    kept = [0] * len(sections)
+    for _, index, rank in candidates:
+        if rank != kept[index]:
+            # A higher-ranked row of this section didn't fit
+            continue
+        cost = estimate_tokens("|".join(sections[index][2][rank])) + 1
+        if used + cost > token_budget:
+            continue
+        used += cost
+        kept[index] += 1
+    return kept
+
+
+def encode_evidence(
+    metadata_counts: MetadataCounts,
+    mwas_results: list[MWASResult],
+    token_budget: int | None = None,
+) -> str:
+    """
+    Encode metadata counts and MWAS results as compact tables for an LLM prompt.
+    Each facet and the MWAS results are written as a header line followed by one
+    `|`-separated row per line, with numbers rounded to 3 significant digits. Rows
+    are admitted across sections by rank (most frequent facet values, most
+    significant MWAS hits) until the token budget is spent; truncated sections note
+    how many rows they show.
+    Args:
+        metadata_counts: Metadata counts per facet.
+        mwas_results: MWAS results.
+        token_budget: Approximate tokens to spend; defaults to PROMPT_TOKEN_BUDGET.
+    Returns:
+        The encoded evidence.
+    """
+    if token_budget is None:
+        token_budget = int(os.environ.get("PROMPT_TOKEN_BUDGET", PROMPT_TOKEN_BUDGET))
+
+    summary = []
+    sections = []
+    for facet, values in (metadata_counts or {}).items():
+        if isinstance(values, dict):
+            summary.append(
+                f"{facet}: "
+                + ", ".join(f"{k}={format_value(v)}" for k, v in values.items())
+            )
+        elif isinstance(values, list) and values:
+            sections.append((facet, ["name", "count"], _facet_rows(values), 1.0))
+    if mwas_results:
+        columns, rows = _mwas_rows(mwas_results)
+        sections.append(("MWAS Results", columns, rows, MWAS_ROW_WEIGHT))
+
+    used_by_summary = sum(estimate_tokens(line) + 1 for line in summary)
+    kept = _allocate(sections, token_budget - used_by_summary)
+
+    parts = ["Metadata Counts:", *summary]
+    for (title, columns, rows, _), count in zip(sections, kept):
+        if title == "MWAS Results":
+            parts.append("")
+        shown = "" if count == len(rows) else f" (top {count} of {len(rows)})"
+        parts.append(f"{title}{shown}:")
+        parts.append(encode_table(columns, rows[:count]))
+    if not mwas_results:
+        parts.extend(["", "MWAS Results: none"])
+    return "\n".join(parts)
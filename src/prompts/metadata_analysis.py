@@ -1,3 +1,4 @@
+from src.prompts.evidence import encode_evidence
 from src.tools.workflows.state import MetadataCounts, MWASResult
 
 
@@ -19,6 +20,7 @@ def validate_hypothesis_user_prompt(
     hypothesis: str,
     metadata_counts: MetadataCounts,
     mwas_results: list[MWASResult],
+    token_budget: int | None = None,
 ) -> str:
     """
     Generate a prompt to validate a hypothesis based on metadata counts and MWAS results.
@@ -26,19 +28,20 @@ def validate_hypothesis_user_prompt(
         hypothesis: The user hypothesis to validate.
         metadata_counts: Metadata counts to analyze.
         mwas_results: MWAS results to analyze.
+        token_budget: Approximate tokens to spend on the evidence tables.
     Returns:
         A string prompt for hypothesis validation.
     """
+    evidence = encode_evidence(metadata_counts, mwas_results, token_budget)
     prompt = (
-        f"Hypothesis: {hypothesis}\n\nMetadata Counts: {metadata_counts}\n\nMWAS"
-        f" Results: {mwas_results}\n\nDetermine if the hypothesis is supported by the"
-        " data, and provide a structured report detailing the validation in the"
-        " following format:\nValidation Report:\n- Rating: [0-100]\n- Supporting"
-        " Metadata Counts: [list of 0-5 metadata counts]\n- Supporting MWAS Results:"
-        " [list of 0-5 MWAS results]\n- Reasoning: [explanation of the validation]If"
-        " the hypothesis is not supported, provide reasoning for why it is not"
-        " supported and suggest alternative hypotheses or areas for further"
-        " investigation.Leave fields blank if not applicable."
+        f"Hypothesis: {hypothesis}\n\n{evidence}\n\nDetermine if the hypothesis is"
+        " supported by the data, and provide a structured report detailing the"
+        " validation in the following format:\nValidation Report:\n- Rating:"
+        " [0-100]\n- Supporting Metadata Counts: [list of 0-5 metadata counts]\n-"
+        " Supporting MWAS Results: [list of 0-5 MWAS results]\n- Reasoning:"
+        " [explanation of the validation]If the hypothesis is not supported, provide"
+        " reasoning for why it is not supported and suggest alternative hypotheses or"
+        " areas for further investigation.Leave fields blank if not applicable."
     )
     return prompt
 
@@ -61,6 +64,7 @@ def anomaly_detection_user_prompt(
     hypothesis: str,
     metadata_counts: MetadataCounts,
     mwas_results: list[MWASResult],
+    token_budget: int | None = None,
 ) -> str:
     """
     Generate a prompt to find anomalies in metadata counts and MWAS results.
@@ -68,17 +72,71 @@ def anomaly_detection_user_prompt(
         hypothesis: The user hypothesis to analyze for anomalies.
         metadata_counts: Metadata counts to analyze for anomalies.
         mwas_results: MWAS results to analyze for anomalies.
+        token_budget: Approximate tokens to spend on the evidence tables.
     Returns:
         A string prompt for anomaly detection.
     """
+    evidence = encode_evidence(metadata_counts, mwas_results, token_budget)
     prompt = (
-        f"Hypothesis: {hypothesis}\n\nMetadata Counts: {metadata_counts}\n\nMWAS"
-        f" Results: {mwas_results}\n\nIdentify any anomalies or unexpected patterns in"
-        " the data.Output should be a structured report detailing the anomalies found"
-        " in the following format:\nAnomaly Report:\n- Rating: [0-100]\n- Supporting"
-        " Metadata Counts: [list of 0-5 metadata counts]\n- Supporting MWAS Results:"
-        " [list of 0-5 MWAS results]\n- Reasoning: [explanation of the anomalies"
-        " found]If no anomalies are found, provide a report indicating that no"
-        " anomalies were identified.Leave fields blank if not applicable."
+        f"Hypothesis: {hypothesis}\n\n{evidence}\n\nIdentify any anomalies or"
+        " unexpected patterns in the data.Output should be a structured report"
+        " detailing the anomalies found in the following format:\nAnomaly Report:\n-"
+        " Rating: [0-100]\n- Supporting Metadata Counts: [list of 0-5 metadata"
+        " counts]\n- Supporting MWAS Results: [list of 0-5 MWAS results]\n-"
+        " Reasoning: [explanation of the anomalies found]If no anomalies are found,"
+        " provide a report indicating that no anomalies were identified.Leave fields"
+        " blank if not applicable."
+    )
+    return prompt
+
+
+def combined_analysis_system_prompt() -> str:
+    """
+    Generate a system prompt for validating a hypothesis and detecting anomalies in one
+    pass over the metadata counts and MWAS results.
+    Returns:
+        A string prompt for the combined analysis.
+    """
+    return (
+        "You are an expert bioinformatics research assistant being used to analyze a"
+        " hypothesis based on associated metadata from the Sequence Read"
+        " Archive.\n\nValidate the following hypothesis and detect anomalies based on"
+        " metadata counts and statistical significance test results:\n\n"
+    )
+
+
+def combined_analysis_user_prompt(
+    hypothesis: str,
+    metadata_counts: MetadataCounts,
+    mwas_results: list[MWASResult],
+    token_budget: int | None = None,
+) -> str:
+    """
+    Generate a prompt asking for both a validation report and an anomaly report.
+    The evidence is written once, ahead of both sets of instructions.
+    Args:
+        hypothesis: The user hypothesis to validate and analyze for anomalies.
+        metadata_counts: Metadata counts to analyze.
+        mwas_results: MWAS results to analyze.
+        token_budget: Approximate tokens to spend on the evidence tables.
+    Returns:
+        A string prompt for the combined analysis.
+    """
+    evidence = encode_evidence(metadata_counts, mwas_results, token_budget)
+    prompt = (
+        f"Hypothesis: {hypothesis}\n\n{evidence}\n\nProduce two structured reports"
+        " from the same data.\n\n1. Determine if the hypothesis is supported by the"
+        " data, and provide a validation report in the following format:\nValidation"
+        " Report:\n- Rating: [0-100]\n- Supporting Metadata Counts: [list of 0-5"
+        " metadata counts]\n- Supporting MWAS Results: [list of 0-5 MWAS results]\n-"
+        " Reasoning: [explanation of the validation]If the hypothesis is not"
+        " supported, provide reasoning for why it is not supported and suggest"
+        " alternative hypotheses or areas for further investigation.\n\n2. Identify"
+        " any anomalies or unexpected patterns in the data, and provide an anomaly"
+        " report in the following format:\nAnomaly Report:\n- Rating: [0-100]\n-"
+        " Supporting Metadata Counts: [list of 0-5 metadata counts]\n- Supporting MWAS"
+        " Results: [list of 0-5 MWAS results]\n- Reasoning: [explanation of the"
+        " anomalies found]If no anomalies are found, provide a report indicating that"
+        " no anomalies were identified.\n\nLeave fields blank if not applicable."
     )
     return prompt
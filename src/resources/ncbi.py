@@ -2,12 +2,19 @@ import os
 
 from Bio import Entrez
 
+from src.tools.metrics import track
+
 Entrez.email = os.environ.get("ENTREZ_EMAIL")
 
 
 def get_pubmed_article_data(pmid: str) -> str:
     """Fetch a PubMed article by ID and return the abstract as plain text."""
-    with Entrez.efetch(
-        db="pubmed", id=pmid, rettype="abstract", retmode="text"
-    ) as handle:
-        return handle.read()
+    with (
+        track("backend", "entrez", "efetch") as call,
+        Entrez.efetch(
+            db="pubmed", id=pmid, rettype="abstract", retmode="text"
+        ) as handle,
+    ):
+        abstract = handle.read()
+        call.response_bytes = len(abstract.encode("utf-8"))
+        return abstract
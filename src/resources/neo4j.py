@@ -1,26 +1,73 @@
+import atexit
+import functools
+import logging
 import os
-from typing import Any
+import threading
+from typing import Any, Iterator
 
-from neo4j import GraphDatabase, Driver, Session, Record
+from neo4j import GraphDatabase, Driver, ManagedTransaction, Record
+
+from src.tools.cache import SingleFlight, canonical_hash
+from src.tools.metrics import track
+
+# Driver tuning. The driver is shared by the whole process, so the pool is sized for
+# concurrent graph runs rather than a single query.
+MAX_CONNECTION_POOL_SIZE = 50
+CONNECTION_ACQUISITION_TIMEOUT = 30.0
+MAX_CONNECTION_LIFETIME = 3600
+MAX_TRANSACTION_RETRY_TIME = 15.0
+FETCH_SIZE = 5000
 
 
 class Neo4jConnection:
-    def __init__(self, uri: str | None, user: str | None, pwd: str | None) -> None:
+    def __init__(
+        self,
+        uri: str | None,
+        user: str | None,
+        pwd: str | None,
+        driver: Driver | None = None,
+    ) -> None:
+        """Connect to Neo4j, or wrap an existing `driver` (e.g. a test double)."""
         self._uri: str | None = uri
         self._user: str | None = user
         self._pwd: str | None = pwd
-        self._driver: Driver | None = None
+        self._driver: Driver | None = driver
+        if driver is not None:
+            return
         try:
             self._driver = GraphDatabase.driver(
-                self._uri, auth=(self._user, self._pwd)
+                self._uri,
+                auth=(self._user, self._pwd),
+                max_connection_pool_size=MAX_CONNECTION_POOL_SIZE,
+                connection_acquisition_timeout=CONNECTION_ACQUISITION_TIMEOUT,
+                max_connection_lifetime=MAX_CONNECTION_LIFETIME,
+                max_transaction_retry_time=MAX_TRANSACTION_RETRY_TIME,
+                fetch_size=FETCH_SIZE,
             )  # type: ignore
         except Exception as e:
-            print("Failed to create the driver:", e)
+            logging.error("Failed to create the driver: %s", e)
 
     def close(self) -> None:
         """Close the Neo4j driver connection."""
         if self._driver is not None:
             self._driver.close()
+            self._driver = None
+
+    def _execute_read(
+        self,
+        work,
+        database: str | None = None,
+    ) -> Any:
+        """
+        Run a unit of work in a managed read transaction.
+        Transient failures (leader switches, dropped connections) are retried by the driver.
+        """
+        assert self._driver is not None, "Driver not initialized!"
+        session_args = {"default_access_mode": "READ", "fetch_size": FETCH_SIZE}
+        if database is not None:
+            session_args["database"] = database
+        with self._driver.session(**session_args) as session:
+            return session.execute_read(work)
 
     def query(
         self,
@@ -39,27 +86,119 @@ class Neo4jConnection:
         Returns:
             A list of neo4j.Record objects or None on failure.
         """
-        assert self._driver is not None, "Driver not initialized!"
-        session: Session | None = None
-        response: list[Record] | None = None
+
+        def work(tx: ManagedTransaction) -> list[Record]:
+            return list(tx.run(query, parameters))
+
+        try:
+            with track("backend", "neo4j", "read") as call:
+                records = self._execute_read(work, database)
+                call.rows = len(records)
+            return records
+        except Exception as e:
+            logging.error("Query failed: %s", e)
+            return None
+
+    def query_columns(
+        self,
+        query: str,
+        parameters: dict[str, Any] | None = None,
+        database: str | None = None,
+    ) -> dict[str, list] | None:
+        """
+        Execute a Cypher query and stream the records into one list per column.
+
+        Args:
+            query: The Cypher query string.
+            parameters: Optional dictionary of parameters to pass.
+            database: Optional database name to run the query against.
+
+        Returns:
+            A dictionary mapping each returned key to its column values, or None on failure.
+        """
+
+        def work(tx: ManagedTransaction) -> dict[str, list]:
+            result = tx.run(query, parameters)
+            keys = result.keys()
+            columns = {key: [] for key in keys}
+            appends = [columns[key].append for key in keys]
+            for record in result:
+                for append, value in zip(appends, record):
+                    append(value)
+            return columns
+
         try:
-            session = (
-                self._driver.session(database=database)
-                if database is not None
-                else self._driver.session()
-            )
-            response = list(session.run(query, parameters))
+            with track("backend", "neo4j", "read") as call:
+                columns = self._execute_read(work, database)
+                call.rows = len(next(iter(columns.values()), ()))
+            return columns
         except Exception as e:
-            print("Query failed:", e)
-        finally:
-            if session is not None:
-                session.close()
-        return response
+            logging.error("Query failed: %s", e)
+            return None
+
+    def stream_columns(
+        self,
+        query: str,
+        parameters: dict[str, Any] | None = None,
+        batch_size: int = FETCH_SIZE,
+        database: str | None = None,
+    ) -> Iterator[dict[str, list]]:
+        """
+        Stream a long-running Cypher query as batches of columns.
+        Runs in an auto-commit transaction so records are pulled lazily; use for
+        offline exports rather than request-path queries, which are not retried.
+
+        Args:
+            query: The Cypher query string.
+            parameters: Optional dictionary of parameters to pass.
+            batch_size: Number of records per yielded batch.
+            database: Optional database name to run the query against.
+
+        Yields:
+            Dictionaries mapping each returned key to at most `batch_size` values.
+        """
+        assert self._driver is not None, "Driver not initialized!"
+        session_args = {"default_access_mode": "READ", "fetch_size": batch_size}
+        if database is not None:
+            session_args["database"] = database
+        with (
+            track("backend", "neo4j", "stream") as call,
+            self._driver.session(**session_args) as session,
+        ):
+            result = session.run(query, parameters)
+            keys = result.keys()
+            columns = {key: [] for key in keys}
+            count = 0
+            for record in result:
+                for key, value in zip(keys, record):
+                    columns[key].append(value)
+                count += 1
+                call.rows += 1
+                if count == batch_size:
+                    yield columns
+                    columns = {key: [] for key in keys}
+                    count = 0
+            if count:
+                yield columns
+
+
+_connection_lock = threading.Lock()
+
+
+@functools.cache
+def _shared_connection() -> Neo4jConnection:
+    connection = Neo4jConnection(
+        uri=os.environ.get("NEO4J_URI"),
+        user=os.environ.get("NEO4J_USER"),
+        pwd=os.environ.get("NEO4J_PASSWORD"),
+    )
+    atexit.register(close_connection)
+    return connection
 
 
 def get_connection() -> Neo4jConnection:
     """
-    Create a new Neo4jConnection instance using environment variables.
+    Return the process-wide Neo4jConnection, creating it on first use.
 
     Required environment variables:
         - NEO4J_URI
@@ -67,18 +206,35 @@ def get_connection() -> Neo4jConnection:
         - NEO4J_PASSWORD
 
     Returns:
-        An instance of Neo4jConnection.
+        The shared instance of Neo4jConnection.
     """
-    return Neo4jConnection(
-        uri=os.environ.get("NEO4J_URI"),
-        user=os.environ.get("NEO4J_USER"),
-        pwd=os.environ.get("NEO4J_PASSWORD"),
-    )
+    with _connection_lock:
+        return _shared_connection()
+
+
+def close_connection() -> None:
+    """Close the shared Neo4j driver, if it was created."""
+    with _connection_lock:
+        if _shared_connection.cache_info().currsize:
+            _shared_connection().close()
+            _shared_connection.cache_clear()
+
+
+# Identical queries already running share one result
+_in_flight_records = SingleFlight("neo4j", copy=list)
+_in_flight_columns = SingleFlight(
+    "neo4j_columns", copy=lambda columns: {k: list(v) for k, v in columns.items()}
+)
+
+
+def _query_key(query: str, params: dict[str, Any] | None) -> str:
+    return canonical_hash([query, params])
 
 
 def run_neo4j_query(query: str, params: dict[str, Any] | None = None) -> list[Record]:
     """
-    Run a Neo4j query using the default connection.
+    Run a Neo4j query using the shared connection.
+    Identical queries running concurrently are coalesced into one.
 
     Args:
         query: The Cypher query string.
@@ -87,8 +243,42 @@ def run_neo4j_query(query: str, params: dict[str, Any] | None = None) -> list[Re
     Returns:
         A list of neo4j.Record objects.
     """
-    connection = get_connection()
-    try:
-        return connection.query(query, params)
-    finally:
-        connection.close()
+    return _in_flight_records.do(
+        _query_key(query, params), lambda: get_connection().query(query, params)
+    )
+
+
+def run_neo4j_query_columns(
+    query: str, params: dict[str, Any] | None = None
+) -> dict[str, list]:
+    """
+    Run a Neo4j query using the shared connection and return columnar results.
+    Identical queries running concurrently are coalesced into one.
+
+    Args:
+        query: The Cypher query string.
+        parameters: Optional dictionary of parameters to pass.
+
+    Returns:
+        A dictionary mapping each returned key to a list of its values.
+    """
+    return _in_flight_columns.do(
+        _query_key(query, params), lambda: get_connection().query_columns(query, params)
+    )
+
+
+def iter_neo4j_query_columns(
+    query: str, params: dict[str, Any] | None = None, batch_size: int = FETCH_SIZE
+) -> Iterator[dict[str, list]]:
+    """
+    Stream a Neo4j query using the shared connection as batches of columns.
+
+    Args:
+        query: The Cypher query string.
+        parameters: Optional dictionary of parameters to pass.
+        batch_size: Number of records per yielded batch.
+
+    Yields:
+        Dictionaries mapping each returned key to a list of its values.
+    """
+    yield from get_connection().stream_columns(query, params, batch_size)
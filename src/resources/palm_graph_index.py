@@ -0,0 +1,311 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from src.resources.neo4j import iter_neo4j_query_columns
+from src.resources.psql import iter_sql_query_columns
+
+INDEX_FORMAT_VERSION = 1
+EXPORT_BATCH_SIZE = 100_000
+# Indexes older than this are treated as stale and ignored
+DEFAULT_MAX_AGE_DAYS = 90
+
+NEO4J_EDGES_QUERY = """
+MATCH (n:Palmprint)-[r:SEQUENCE_ALIGNMENT]-(m:Palmprint)
+RETURN n.palmId AS palm_id1, m.palmId AS palm_id2, r.percentIdentity AS pident
+"""
+SQL_EDGES_QUERY = "SELECT palm_id1, palm_id2, pident FROM public.palm_graph"
+
+
+def _quantize(pident: np.ndarray, scale: float) -> np.ndarray:
+    # The small epsilon keeps values like 0.29 * 100 from flooring to 28
+    return np.clip(np.floor(pident * scale + 1e-6), 0, 100).astype(np.uint8)
+
+
+def _iter_neo4j_edges():
+    for columns in iter_neo4j_query_columns(
+        NEO4J_EDGES_QUERY, batch_size=EXPORT_BATCH_SIZE
+    ):
+        yield (
+            columns["palm_id1"],
+            columns["palm_id2"],
+            _quantize(np.asarray(columns["pident"], dtype=np.float64), 100.0),
+        )
+
+
+def _iter_sql_edges():
+    for columns in iter_sql_query_columns(
+        SQL_EDGES_QUERY, batch_size=EXPORT_BATCH_SIZE
+    ):
+        yield (
+            columns["palm_id1"],
+            columns["palm_id2"],
+            _quantize(columns["pident"], 1.0),
+        )
+
+
+def _collect_edges(batches) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate exported (palm_id1, palm_id2, pident) batches into arrays."""
+    palm_id1_parts, palm_id2_parts, pident_parts = [], [], []
+    for palm_id1, palm_id2, pident in batches:
+        palm_id1_parts.append(np.asarray(palm_id1, dtype="S"))
+        palm_id2_parts.append(np.asarray(palm_id2, dtype="S"))
+        pident_parts.append(pident)
+        logging.info("Exported %d palm graph edges", sum(len(p) for p in pident_parts))
+    if not pident_parts:
+        empty = np.empty(0, dtype="S1")
+        return empty, empty, np.empty(0, dtype=np.uint8)
+    return (
+        np.concatenate(palm_id1_parts),
+        np.concatenate(palm_id2_parts),
+        np.concatenate(pident_parts),
+    )
+
+
+def _build_csr(
+    palm_id1: np.ndarray, palm_id2: np.ndarray, pident: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the (nodes, offsets, neighbors, pident) arrays of the CSR index."""
+    nodes = np.unique(np.concatenate([palm_id1, palm_id2]))
+    src = np.searchsorted(nodes, palm_id1).astype(np.uint32)
+    dst = np.searchsorted(nodes, palm_id2).astype(np.uint32)
+
+    # Store both directions, then keep the best pident per (src, dst) pair
+    src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+    pident = np.concatenate([pident, pident])
+    order = np.lexsort((-pident.astype(np.int16), dst, src))
+    src, dst, pident = src[order], dst[order], pident[order]
+    keep = np.ones(src.size, dtype=bool)
+    keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst, pident = src[keep], dst[keep], pident[keep]
+
+    # Within each row, order neighbors by descending pident
+    order = np.lexsort((-pident.astype(np.int16), src))
+    src, dst, pident = src[order], dst[order], pident[order]
+    offsets = np.zeros(nodes.size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=nodes.size), out=offsets[1:])
+    return nodes, offsets, dst, pident
+
+
+def _write_index(
+    output_dir: str, arrays: dict[str, np.ndarray], metadata: dict[str, object]
+) -> None:
+    """Write the index arrays and metadata, replacing output_dir atomically."""
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".palm_graph_index_", dir=parent)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging_dir, f"{name}.npy"), array)
+    with open(os.path.join(staging_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(staging_dir, output_dir)
+
+
+def build_palm_graph_index(
+    output_dir: str,
+    source: str = "neo4j",
+    release: str | None = None,
+) -> dict[str, object]:
+    """
+    Export the palm similarity graph into a memory-mappable CSR index directory:
+        nodes.npy: sorted palm ids (fixed-width bytes); node i is row i
+        offsets.npy: int64, neighbors of node i are at offsets[i]:offsets[i + 1]
+        neighbors.npy: uint32 node indices, by descending pident within each row
+        pident.npy: uint8 percent identity (0-100, floored)
+        metadata.json: source, release, build time and sizes
+    Edges are stored in both directions and duplicate pairs keep their highest pident.
+    Run as `python -m src.resources.palm_graph_index --output <dir>`.
+    Args:
+        output_dir: Directory to write the index to; replaced atomically if it exists.
+        source: "neo4j" for SEQUENCE_ALIGNMENT edges or "sql" for palm_graph.
+        release: Optional PalmDB release label recorded in the metadata.
+    Returns:
+        The index metadata.
+    """
+    if source == "neo4j":
+        batches = _iter_neo4j_edges()
+    elif source == "sql":
+        batches = _iter_sql_edges()
+    else:
+        raise ValueError(f"Invalid source: {source}. Valid sources are: neo4j, sql")
+
+    nodes, offsets, neighbors, pident = _build_csr(*_collect_edges(batches))
+    metadata = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "source": source,
+        "release": release,
+        "built_at": time.time(),
+        "num_nodes": int(nodes.size),
+        "num_edges": int(neighbors.size),
+    }
+    _write_index(
+        output_dir,
+        {
+            "nodes": nodes,
+            "offsets": offsets,
+            "neighbors": neighbors,
+            "pident": pident,
+        },
+        metadata,
+    )
+    logging.info("Wrote palm graph index to %s: %s", output_dir, metadata)
+    return metadata
+
+
+class PalmGraphIndex:
+    """Read-only, memory-mapped view of a palm graph CSR index directory."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            self.metadata: dict[str, object] = json.load(f)
+        if self.metadata.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported palm graph index format: {self.metadata}"
+                f" (expected version {INDEX_FORMAT_VERSION})"
+            )
+        self.nodes = np.load(os.path.join(path, "nodes.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.neighbors = np.load(os.path.join(path, "neighbors.npy"), mmap_mode="r")
+        self.pident = np.load(os.path.join(path, "pident.npy"), mmap_mode="r")
+
+    def is_stale(
+        self, max_age_days: float | None = None, release: str | None = None
+    ) -> bool:
+        """
+        Check whether the index is too old or built from a different PalmDB release.
+        Args:
+            max_age_days: Maximum index age in days, if any.
+            release: Expected PalmDB release label, if any.
+        """
+        if release and self.metadata.get("release") != release:
+            return True
+        if max_age_days is not None:
+            age = time.time() - float(self.metadata.get("built_at", 0))
+            return age > max_age_days * 86400
+        return False
+
+    def _edges(
+        self, palm_ids: list[str], percent_identity: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row index, edge position) arrays for edges above the threshold."""
+        if not palm_ids or self.nodes.size == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        query = np.unique(np.asarray([p.encode("utf-8") for p in palm_ids]))
+        rows = np.searchsorted(self.nodes, query)
+        in_range = rows < self.nodes.size
+        rows, query = rows[in_range], query[in_range]
+        rows = rows[self.nodes[rows] == query]
+
+        starts = np.asarray(self.offsets[rows])
+        lengths = np.asarray(self.offsets[rows + 1]) - starts
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        row_starts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = row_starts + np.arange(total)
+        edge_rows = np.repeat(rows, lengths)
+
+        threshold = int(np.ceil(percent_identity - 1e-6))
+        mask = np.asarray(self.pident[positions]) >= threshold
+        return edge_rows[mask], positions[mask]
+
+    def _decode(self, indices: np.ndarray) -> list[str]:
+        return [value.decode("utf-8") for value in self.nodes[indices].tolist()]
+
+    def similar(
+        self, palm_ids: list[str], percent_identity: float = 90
+    ) -> tuple[list[str], list[str], list[int]]:
+        """
+        Find edges from the given palm ids with pident >= percent_identity.
+        Returns:
+            Parallel lists of (palm_id1, palm_id2, pident).
+        """
+        edge_rows, positions = self._edges(palm_ids, percent_identity)
+        return (
+            self._decode(edge_rows),
+            self._decode(np.asarray(self.neighbors[positions])),
+            np.asarray(self.pident[positions]).tolist(),
+        )
+
+    def neighbor_ids(
+        self, palm_ids: list[str], percent_identity: float = 90
+    ) -> list[str]:
+        """Return the distinct palm ids adjacent to any of the given palm ids."""
+        _, positions = self._edges(palm_ids, percent_identity)
+        return self._decode(np.unique(np.asarray(self.neighbors[positions])))
+
+
+_index_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_index(path: str, mtime: float) -> PalmGraphIndex:
+    # Keyed by the metadata file's mtime too, so a rebuilt index is reloaded
+    del mtime
+    return PalmGraphIndex(path)
+
+
+def get_palm_graph_index() -> PalmGraphIndex | None:
+    """
+    Return the palm graph index configured by PALM_GRAPH_INDEX_DIR, if usable.
+
+    Optional environment variables:
+        - PALM_GRAPH_INDEX_DIR: index directory; the index is disabled if unset
+        - PALM_GRAPH_INDEX_MAX_AGE_DAYS: staleness cutoff (default 90)
+        - PALM_GRAPH_INDEX_RELEASE: required PalmDB release label
+
+    Returns:
+        The loaded index, or None if it is not configured, missing, invalid or stale.
+        The index is reloaded when its directory is rebuilt.
+    """
+    path = os.environ.get("PALM_GRAPH_INDEX_DIR")
+    if not path:
+        return None
+    try:
+        mtime = os.stat(os.path.join(path, "metadata.json")).st_mtime
+    except OSError:
+        return None
+
+    with _index_lock:
+        try:
+            index = _load_index(path, mtime)
+        except (OSError, ValueError) as e:
+            logging.warning("Failed to load palm graph index at %s: %s", path, e)
+            return None
+
+    max_age_days = float(
+        os.environ.get("PALM_GRAPH_INDEX_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)
+    )
+    if index.is_stale(max_age_days, os.environ.get("PALM_GRAPH_INDEX_RELEASE")):
+        logging.warning("Palm graph index at %s is stale, ignoring it", path)
+        return None
+    return index
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Build the palm graph CSR index")
+    parser.add_argument("--output", required=True, help="Index directory to write")
+    parser.add_argument("--source", choices=["neo4j", "sql"], default="neo4j")
+    parser.add_argument("--release", help="PalmDB release label to record")
+    args = parser.parse_args()
+    build_palm_graph_index(args.output, args.source, args.release)
@@ -1,8 +1,31 @@
+import asyncio
+import itertools
 import os
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Iterator
 
+import numpy as np
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extensions import connection
+from psycopg2.pool import PoolError
+
+from src.tools.cache import SingleFlight, canonical_hash
+from src.tools.metrics import track
+
+# Pool tuning, shared by the Serratus and Logan pools
+POOL_MAX_SIZE = 10
+POOL_ACQUIRE_TIMEOUT = 30.0
+# Idle connections older than this are pinged before being handed out
+POOL_HEALTH_CHECK_INTERVAL = 60.0
+# Rows per fetchmany round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 10_000
 
 
 def get_serratus_connection() -> connection:
@@ -27,40 +50,410 @@ def get_logan_connection() -> connection:
     )
 
 
+@dataclass(frozen=True)
+class PoolSettings:
+    """How a ConnectionPool opens, bounds and health-checks its connections."""
+
+    connect: Callable[[], connection]
+    max_size: int = POOL_MAX_SIZE
+    acquire_timeout: float = POOL_ACQUIRE_TIMEOUT
+    health_check_interval: float = POOL_HEALTH_CHECK_INTERVAL
+
+
+@dataclass
+class PoolStats:
+    """Usage counters of a ConnectionPool, updated under the pool's lock."""
+
+    in_use: int = 0
+    checkouts: int = 0
+    checkout_failures: int = 0
+    discarded: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the counters, plus the average wait per checkout."""
+        return {
+            "in_use": self.in_use,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "discarded": self.discarded,
+            "wait_time_total": self.wait_time_total,
+            "wait_time_max": self.wait_time_max,
+            "wait_time_avg": (
+                self.wait_time_total / self.checkouts if self.checkouts else 0.0
+            ),
+        }
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    Callers block for up to `acquire_timeout` seconds when all connections are in use.
+    Idle connections are health-checked before reuse and replaced if broken.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[], connection],
+        max_size: int = POOL_MAX_SIZE,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+        health_check_interval: float = POOL_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.name = name
+        self._settings = PoolSettings(
+            connect, max_size, acquire_timeout, health_check_interval
+        )
+        self._lock = threading.Lock()
+        # Notified whenever a checked out connection is given back
+        self._slot_freed = threading.Condition(self._lock)
+        self._idle: deque[tuple[connection, float]] = deque()
+        self._closed = False
+        self._stats = PoolStats()
+
+    def _is_healthy(self, conn: connection, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - idle_since < self._settings.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: connection) -> None:
+        with self._lock:
+            self._stats.discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _checkout_idle(self) -> connection | None:
+        """Pop idle connections until a healthy one turns up, discarding the rest."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, idle_since = self._idle.popleft()
+            if self._is_healthy(conn, idle_since):
+                return conn
+            self._discard(conn)
+
+    def acquire(self) -> connection:
+        """
+        Check out a healthy connection from the pool.
+        Raises:
+            PoolError: If the pool is closed or no connection frees up in time.
+        """
+        if self._closed:
+            raise PoolError(f"Connection pool '{self.name}' is closed")
+        start = time.monotonic()
+        # A slot is reserved (counted as in use) from here until the connection is
+        # released, so connections are opened without holding the lock
+        with self._slot_freed:
+            if not self._slot_freed.wait_for(
+                lambda: self._stats.in_use < self._settings.max_size,
+                timeout=self._settings.acquire_timeout,
+            ):
+                self._stats.checkout_failures += 1
+                raise PoolError(
+                    f"Timed out after {self._settings.acquire_timeout}s waiting for a"
+                    f" '{self.name}' connection"
+                )
+            self._stats.in_use += 1
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._checkout_idle()
+            if conn is None:
+                conn = self._settings.connect()
+        except BaseException:
+            with self._slot_freed:
+                self._stats.in_use -= 1
+                self._stats.checkout_failures += 1
+                self._slot_freed.notify()
+            raise
+
+        with self._lock:
+            self._stats.checkouts += 1
+            self._stats.wait_time_total += waited
+            self._stats.wait_time_max = max(self._stats.wait_time_max, waited)
+        return conn
+
+    def release(self, conn: connection) -> None:
+        """Return a connection to the pool, discarding it if it is unusable."""
+        keep = not self._closed and not conn.closed
+        if keep:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        if not keep:
+            self._discard(conn)
+        with self._slot_freed:
+            self._stats.in_use -= 1
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._slot_freed.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[connection]:
+        """Context manager that checks out a connection and returns it afterwards."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def metrics(self) -> dict[str, object]:
+        """Return a snapshot of the pool's usage counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_size": self._settings.max_size,
+                "idle": len(self._idle),
+                **self._stats.to_dict(),
+            }
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pool_factories: dict[str, Callable[[], connection]] = {
+    "serratus": get_serratus_connection,
+    "logan": get_logan_connection,
+}
+
+
+def get_connection_pool(database: str = "serratus") -> ConnectionPool:
+    """
+    Return the process-wide connection pool for a database, creating it on first use.
+    Args:
+        database: Either "serratus" or "logan".
+    Returns:
+        The shared ConnectionPool for that database.
+    """
+    if database not in _pool_factories:
+        raise ValueError(
+            f"Unknown database: {database}. Valid databases are:"
+            f" {list(_pool_factories)}"
+        )
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                pool = ConnectionPool(database, _pool_factories[database])
+                _pools[database] = pool
+    return pool
+
+
+def get_pool_metrics() -> list[dict[str, object]]:
+    """Return usage metrics for every connection pool created so far."""
+    return [pool.metrics() for pool in list(_pools.values())]
+
+
+def close_connection_pools() -> None:
+    """Close every connection pool created so far."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+_in_flight = SingleFlight("postgres", copy=lambda rows: [list(row) for row in rows])
+
+
+def _fetch_str_rows(
+    conn: connection, query: str, params: tuple | None
+) -> list[list[str]]:
+    with conn.cursor() as cursor:
+        if params is not None:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        rows = cursor.fetchall()
+        colnames = [desc[0] for desc in cursor.description]
+    str_rows = [[str(col) if col is not None else "" for col in row] for row in rows]
+    return [colnames] + str_rows
+
+
 def run_sql_query(
     query: str,
     conn: connection | None = None,
     params: tuple | None = None,
+    database: str = "serratus",
 ) -> list[list[str]]:
     """
     Run a SQL query using psycopg2 and return the results as a list of rows.
 
     Args:
         query: A valid SQL SELECT query string with `%s` placeholders for parameters.
-        conn: Optional psycopg2 connection. If None, uses Serratus DB connection.
+        conn: Optional psycopg2 connection. If None, a pooled connection is used and
+            identical queries running concurrently are coalesced into one.
         params: Optional tuple of parameters to safely inject into the query.
+        database: Pool to check a connection out of when `conn` is None.
 
     Returns:
         A list of rows, where each row is a list of strings (including header as first row).
     """
     logging.info("Running SQL query")
-    close_conn = False
     if conn is None:
-        conn = get_serratus_connection()
-        close_conn = True
+        # Identical queries already running on the pool share that query's rows
+        key = canonical_hash([database, query, params])
+        return _in_flight.do(key, _run_tracked, None, query, params, database)
+    return _run_tracked(conn, query, params, database)
+
 
+def _run_tracked(
+    conn: connection | None, query: str, params: tuple | None, database: str
+) -> list[list[str]]:
+    with track("backend", "postgres", database) as call:
+        if conn is None:
+            with get_connection_pool(database).connection() as pooled_conn:
+                rows = _fetch_str_rows(pooled_conn, query, params)
+        else:
+            rows = _fetch_str_rows(conn, query, params)
+        call.rows = len(rows) - 1
+    return rows
+
+
+async def run_sql_query_async(
+    query: str,
+    params: tuple | None = None,
+    database: str = "serratus",
+) -> list[list[str]]:
+    """
+    Run a SQL query on a pooled connection without blocking the event loop.
+
+    Args:
+        query: A valid SQL SELECT query string with `%s` placeholders for parameters.
+        params: Optional tuple of parameters to safely inject into the query.
+        database: Pool to check a connection out of.
+
+    Returns:
+        A list of rows, where each row is a list of strings (including header as first row).
+    """
+    return await asyncio.to_thread(run_sql_query, query, None, params, database)
+
+
+_cursor_ids = itertools.count()
+
+
+def iter_sql_query(
+    query: str,
+    params: tuple | None = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    database: str = "serratus",
+    conn: connection | None = None,
+) -> Iterator[tuple[list[str], list[tuple]]]:
+    """
+    Stream a SQL query through a named server-side cursor in `fetchmany` batches.
+    Only one batch is held in memory at a time, and values keep their database types.
+    The connection stays checked out until the iterator is exhausted or closed, so
+    close iterators that aren't read to the end (e.g. with `contextlib.closing`).
+
+    Args:
+        query: A valid SQL SELECT query string with `%s` placeholders for parameters.
+        params: Optional tuple of parameters to safely inject into the query.
+        batch_size: Number of rows per yielded batch.
+        database: Pool to check a connection out of when `conn` is None.
+        conn: Optional psycopg2 connection to use instead of the pool.
+
+    Yields:
+        (column names, rows) tuples, where rows is a list of at most `batch_size` tuples.
+    """
+    logging.info("Streaming SQL query")
+    pool = get_connection_pool(database) if conn is None else None
+    stream_conn = pool.acquire() if pool is not None else conn
     try:
-        cursor = conn.cursor()
-        if params is not None:
+        # The recorded latency covers the whole stream, including time spent by the
+        # consumer
+        with (
+            track("backend", "postgres", f"{database}:stream") as call,
+            stream_conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor,
+        ):
+            cursor.itersize = batch_size
             cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        rows = cursor.fetchall()
-        colnames = [desc[0] for desc in cursor.description]
-        str_rows = [
-            [str(col) if col is not None else "" for col in row] for row in rows
-        ]
-        return [colnames] + str_rows
+            colnames = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if colnames is None:
+                    # Named cursors only describe their columns after the first fetch
+                    colnames = [desc[0] for desc in cursor.description]
+                call.rows += len(rows)
+                yield colnames, rows
     finally:
-        if close_conn:
-            conn.close()
+        # Runs when the iterator is exhausted, closed or garbage collected; the pool
+        # rolls back the transaction the named cursor was opened in
+        if pool is not None:
+            pool.release(stream_conn)
+
+
+def _column_array(values: list[Any]) -> np.ndarray:
+    sample = next((value for value in values if value is not None), None)
+    has_nulls = any(value is None for value in values)
+    if isinstance(sample, bool):
+        return np.asarray(values, dtype=object if has_nulls else bool)
+    if isinstance(sample, int) and not has_nulls:
+        return np.asarray(values, dtype=np.int64)
+    if isinstance(sample, (int, float, Decimal)):
+        # NULLs become NaN so numeric columns stay vectorizable
+        return np.asarray(
+            [np.nan if value is None else float(value) for value in values],
+            dtype=np.float64,
+        )
+    return np.asarray(values, dtype=object)
+
+
+def iter_sql_query_columns(
+    query: str,
+    params: tuple | None = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    database: str = "serratus",
+    conn: connection | None = None,
+) -> Iterator[dict[str, np.ndarray]]:
+    """
+    Stream a SQL query as columnar numpy batches; see `iter_sql_query`.
+    Integer columns become int64 (float64 if they contain NULLs), real and numeric
+    columns float64 with NaN for NULL, and anything else an object array.
+
+    Args:
+        query: A valid SQL SELECT query string with `%s` placeholders for parameters.
+        params: Optional tuple of parameters to safely inject into the query.
+        batch_size: Number of rows per yielded batch.
+        database: Pool to check a connection out of when `conn` is None.
+        conn: Optional psycopg2 connection to use instead of the pool.
+
+    Yields:
+        Dictionaries mapping each column name to an array of at most `batch_size` values.
+    """
+    for colnames, rows in iter_sql_query(query, params, batch_size, database, conn):
+        columns = zip(*rows)
+        yield {
+            name: _column_array(list(values)) for name, values in zip(colnames, columns)
+        }
@@ -1,10 +1,30 @@
 import logging
 
-from src.resources.psql import (
-    get_serratus_connection,
-    run_sql_query,
-)
+from src.resources.psql import get_pool_metrics, run_sql_query_async
 from src.resources.ncbi import get_pubmed_article_data
+from src.tools.cache import get_single_flight_stats
+from src.tools.llm import get_llm_cache_stats
+from src.tools.metrics import get_metrics_snapshot, render_prometheus
+from src.tools.workflows.cache import get_workflow_cache_stats
+from src.tools.openvirome_client import (
+    get_openvirome_cache_stats,
+    get_request_encoding_capabilities,
+    get_upstream_stats,
+)
+
+
+def get_server_metrics() -> dict[str, object]:
+    """Collect call metrics, pool usage, cache, coalescing and upstream statistics."""
+    return {
+        **get_metrics_snapshot(),
+        "postgres_pools": get_pool_metrics(),
+        "openvirome_cache": get_openvirome_cache_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "workflow_cache": get_workflow_cache_stats(),
+        "single_flight": get_single_flight_stats(),
+        "upstream": get_upstream_stats(),
+        "request_encodings": get_request_encoding_capabilities(),
+    }
 
 
 def register_resources(mcp):
@@ -20,11 +40,11 @@ def register_resources(mcp):
         return {"error": error_msg}
 
     @mcp.resource("db://serratus/palmdb/{palm_id}")
-    def get_palm_id_row(palm_id: str) -> dict[str, object]:
+    async def get_palm_id_row(palm_id: str) -> dict[str, object]:
         """Fetch data for a specific palm_id from the Serratus database."""
         query = "SELECT * FROM public.palmdb2 WHERE palm_id = %s"
         try:
-            rows = run_sql_query(query, get_serratus_connection(), params=(palm_id,))
+            rows = await run_sql_query_async(query, params=(palm_id,))
             if not rows:
                 return _handle_error(f"Palm ID '{palm_id}' not found")
             return {"data": rows}
@@ -39,3 +59,17 @@ def register_resources(mcp):
             return {"pmid": pmid, "abstract": abstract}
         except Exception as error:
             return _handle_error(f"Error fetching PubMed article {pmid}: {error}")
+
+    @mcp.resource("metrics://server")
+    def server_metrics() -> dict[str, object]:
+        """
+        Latency histograms, call, error, byte and row counts for every graph node and
+        backend (OpenVirome API, Postgres, Neo4j, Azure OpenAI, Entrez), plus connection
+        pool and API cache statistics.
+        """
+        return get_server_metrics()
+
+    @mcp.resource("metrics://server/prometheus", mime_type="text/plain")
+    def server_metrics_prometheus() -> str:
+        """The server metrics in the Prometheus text exposition format."""
+        return render_prometheus(get_server_metrics())
@@ -0,0 +1,278 @@
+import logging
+import os
+import threading
+import time
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from src.resources.psql import iter_sql_query
+
+LOAD_BATCH_SIZE = 50_000
+# How often the background thread reloads the index, and how soon it retries a failure
+DEFAULT_REFRESH_SECONDS = 6 * 3600
+RETRY_SECONDS = 300
+# Minimum trigram similarity for a fuzzy match, matching pg_trgm's default threshold
+FUZZY_MIN_SIMILARITY = 0.3
+
+SPECIES_INDEX_QUERY = """
+SELECT DISTINCT palm_id, tax_species, gb_pid FROM
+palm_virome
+WHERE
+    node_qc = 'true'
+    AND tax_species IS NOT NULL
+"""
+RESULT_HEADER = ["palm_id", "tax_species", "gb_pid"]
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+class _NameIndex:
+    """
+    Trigram inverted index of species names, matching them by case-insensitive
+    substring, with trigram-similarity matching as a fallback for misspellings.
+    """
+
+    def __init__(self, names: list[str]) -> None:
+        self._names = [_normalize(name) for name in names]
+        postings: dict[str, list[int]] = {}
+        self._counts = np.zeros(len(self._names), dtype=np.int32)
+        for i, name in enumerate(self._names):
+            # Padding lets fuzzy matching weigh word starts and ends like pg_trgm
+            trigrams = _trigrams(f"  {name} ")
+            self._counts[i] = len(trigrams)
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(i)
+        self._postings = {
+            trigram: np.asarray(ids, dtype=np.int32)
+            for trigram, ids in postings.items()
+        }
+
+    def match_substring(self, query: str) -> list[int]:
+        """Return indices of names that contain `query`, ignoring case."""
+        query = _normalize(query)
+        if len(query) < 3:
+            candidates = range(len(self._names))
+        else:
+            postings = [self._postings.get(t) for t in _trigrams(query)]
+            if any(ids is None for ids in postings):
+                return []
+            postings.sort(key=len)
+            candidates = postings[0]
+            for ids in postings[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            candidates = candidates.tolist()
+        names = self._names
+        return [i for i in candidates if query in names[i]]
+
+    def match_fuzzy(self, query: str) -> list[int]:
+        """Return indices of the names most similar to `query` by trigram overlap."""
+        trigrams = _trigrams(f"  {_normalize(query)} ")
+        hits = [self._postings[t] for t in trigrams if t in self._postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._names))
+        similarity = shared / (len(trigrams) + self._counts - shared)
+        best = similarity.max()
+        if best < FUZZY_MIN_SIMILARITY:
+            return []
+        return np.flatnonzero(similarity >= best - 1e-9).tolist()
+
+
+class SpeciesIndex:
+    """
+    In-memory index of palm_virome species names to their palm_id postings.
+    Species are matched by case-insensitive substring, narrowed through a trigram
+    inverted index, with trigram-similarity matching as a fallback for misspellings.
+    """
+
+    def __init__(self, rows: Iterable[tuple[str, str, object]]) -> None:
+        postings: dict[str, list[tuple[str, object]]] = {}
+        for palm_id, species, gb_pid in rows:
+            if species:
+                postings.setdefault(species, []).append((palm_id, gb_pid))
+
+        self.species: list[str] = sorted(postings)
+        self._names = _NameIndex(self.species)
+        lengths = np.fromiter(
+            (len(postings[species]) for species in self.species),
+            dtype=np.int64,
+            count=len(self.species),
+        )
+        self.offsets = np.zeros(len(self.species) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+
+        entries = [entry for species in self.species for entry in postings[species]]
+        self.palm_ids: list[str] = [palm_id for palm_id, _ in entries]
+        # Text is kept as run_sql_query would render it; NULL pident never matches
+        self._gb_pid_text = [
+            "" if gb_pid is None else str(gb_pid) for _, gb_pid in entries
+        ]
+        self.gb_pid = np.asarray(
+            [np.nan if gb_pid is None else float(gb_pid) for _, gb_pid in entries],
+            dtype=np.float64,
+        )
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.palm_ids)
+
+    def match_substring(self, query: str) -> list[int]:
+        """Return indices of species whose name contains `query`, ignoring case."""
+        return self._names.match_substring(query)
+
+    def match_fuzzy(self, query: str) -> list[int]:
+        """Return indices of the species most similar to `query` by trigram overlap."""
+        return self._names.match_fuzzy(query)
+
+    def lookup(
+        self, query: str, percent_identity: float = 90, fuzzy: bool = False
+    ) -> list[list[str]]:
+        """
+        Find palm_ids of the species matching `query`.
+        Args:
+            query: Species name or name fragment.
+            percent_identity: Minimum gb_pid of the returned palm_ids.
+            fuzzy: Fall back to the closest species names if no name contains `query`.
+                The names matched are in the tax_species column of the result.
+        Returns:
+            A header row followed by [palm_id, tax_species, gb_pid] rows, as strings.
+        """
+        matches = self.match_substring(query)
+        if not matches and fuzzy:
+            matches = self.match_fuzzy(query)
+            if matches:
+                log_fuzzy_match(query, [self.species[i] for i in matches])
+
+        rows = [RESULT_HEADER]
+        for i in matches:
+            start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+            keep = np.flatnonzero(self.gb_pid[start:end] >= percent_identity) + start
+            species = self.species[i]
+            rows.extend(
+                [self.palm_ids[j], species, self._gb_pid_text[j]] for j in keep.tolist()
+            )
+        return rows
+
+
+def match_species_fuzzy(query: str, species: Iterable[str]) -> list[str]:
+    """
+    Return the species names most similar to `query`, as `SpeciesIndex.match_fuzzy`
+    would pick them, for lookups made without the index.
+    """
+    names = sorted({name for name in species if name})
+    return [names[i] for i in _NameIndex(names).match_fuzzy(query)]
+
+
+def log_fuzzy_match(query: str, species: list[str]) -> None:
+    """Warn that `query` was resolved to other species names."""
+    logging.warning("No species contain %r, using closest matches: %s", query, species)
+
+
+def _iter_species_rows() -> Iterator[tuple[str, str, object]]:
+    for _, rows in iter_sql_query(SPECIES_INDEX_QUERY, batch_size=LOAD_BATCH_SIZE):
+        yield from rows
+
+
+class _SpeciesIndexRefresher:
+    """The active species index and the background thread that keeps it loaded."""
+
+    def __init__(self) -> None:
+        self.index: SpeciesIndex | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def load(self) -> SpeciesIndex:
+        """Build the index from palm_virome and make it the active index."""
+        started = time.monotonic()
+        index = SpeciesIndex(_iter_species_rows())
+        self.index = index
+        logging.info(
+            "Loaded species index: %d species, %d palm_ids in %.1fs",
+            len(index.species),
+            len(index),
+            time.monotonic() - started,
+        )
+        return index
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.load()
+                delay = interval
+            except Exception as e:
+                logging.error("Failed to load species index: %s", e)
+                delay = min(interval, RETRY_SECONDS) if interval > 0 else RETRY_SECONDS
+            else:
+                if interval <= 0:
+                    return
+            self._stop.wait(delay)
+
+    def start(self, interval: float) -> None:
+        """Start the refresh thread, unless it is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(interval,),
+                name="species-index-refresh",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the refresh thread, keeping the current index."""
+        self._stop.set()
+
+
+_refresher = _SpeciesIndexRefresher()
+
+
+def load_species_index() -> SpeciesIndex:
+    """
+    Build the species index from palm_virome and make it the active index.
+    Returns:
+        The newly loaded index.
+    """
+    return _refresher.load()
+
+
+def get_species_index() -> SpeciesIndex | None:
+    """Return the active species index, or None if it has not been loaded yet."""
+    return _refresher.index
+
+
+def start_species_index_refresh(interval: float | None = None) -> None:
+    """
+    Load the species index in a background thread and keep it refreshed.
+    Lookups fall back to Postgres until the first load completes.
+
+    Optional environment variables:
+        - SPECIES_INDEX_REFRESH_SECONDS: reload interval (default 6 hours);
+          0 loads the index once, a negative value disables it
+
+    Args:
+        interval: Reload interval in seconds, overriding the environment.
+    """
+    if interval is None:
+        interval = float(
+            os.environ.get("SPECIES_INDEX_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)
+        )
+    if interval < 0:
+        logging.info("Species index disabled")
+        return
+    _refresher.start(interval)
+
+
+def stop_species_index_refresh() -> None:
+    """Stop the background refresh thread, keeping the current index."""
+    _refresher.stop()
@@ -6,6 +6,7 @@ from mcp.server.fastmcp import FastMCP
 from src.prompts.register import register_prompts
 from src.tools.register import register_tools
 from src.resources.register import register_resources
+from src.resources.species_index import start_species_index_refresh
 
 load_dotenv()
 
@@ -19,3 +20,5 @@ mcp = FastMCP("OpenVirome MCP")
 register_tools(mcp)
 register_prompts(mcp)
 register_resources(mcp)
+
+start_species_index_refresh()
@@ -0,0 +1,452 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def canonicalize(value: Any, unordered_keys: frozenset[str] = frozenset()) -> Any:
+    """
+    Return a canonical form of a JSON-like value.
+    Dict keys are sorted, and lists stored under any of `unordered_keys` are sorted so
+    that payloads differing only in the order of those lists compare equal.
+    Args:
+        value: The value to canonicalize.
+        unordered_keys: Dict keys whose list values are order-insensitive.
+    Returns:
+        The canonicalized value.
+    """
+    if isinstance(value, dict):
+        items = []
+        for key in sorted(value):
+            item = canonicalize(value[key], unordered_keys)
+            if key in unordered_keys and isinstance(item, list):
+                item = sorted(item, key=_sort_key)
+            items.append((key, item))
+        return dict(items)
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item, unordered_keys) for item in value]
+    return value
+
+
+def _sort_key(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def canonical_hash(value: Any, unordered_keys: frozenset[str] = frozenset()) -> str:
+    """
+    Return a stable SHA-256 hex digest of a JSON-like value.
+    Args:
+        value: The value to hash.
+        unordered_keys: Dict keys whose list values are order-insensitive.
+    Returns:
+        The hex digest of the canonical JSON encoding.
+    """
+    encoded = json.dumps(
+        canonicalize(value, unordered_keys),
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Lookup and eviction counters of a cache, updated under the cache's lock."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the counters, plus the hit rate of all lookups."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    The cache is bounded both by number of entries and by the total size reported
+    for the stored values; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int | None = None) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = CacheStats()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: int = 0) -> None:
+        """
+        Store a value.
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl: Seconds until the entry expires.
+            size: Size of the value in bytes, counted against `max_bytes`.
+        """
+        if ttl <= 0 or (self._max_bytes is not None and size > self._max_bytes):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self._max_entries or (
+                self._max_bytes is not None and self._bytes > self._max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats.evictions += 1
+
+    def invalidate(self, key: Hashable | None = None, predicate=None) -> int:
+        """
+        Remove entries from the cache.
+        Args:
+            key: A single key to remove.
+            predicate: Optional callable; keys for which it returns True are removed.
+                If neither argument is given, the whole cache is cleared.
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            if key is not None:
+                keys = [key] if key in self._entries else []
+            elif predicate is not None:
+                keys = [k for k in self._entries if predicate(k)]
+            else:
+                keys = list(self._entries)
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict[str, object]:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self._max_entries,
+                "max_bytes": self._max_bytes,
+                **self._stats.to_dict(),
+            }
+
+
+class SQLiteCache:
+    """
+    A persistent, thread-safe cache of byte values stored in a SQLite database.
+
+    Entries may expire after a per-entry TTL. When the stored values exceed `max_bytes`,
+    the least recently read entries are evicted first. Hit/miss counters are kept
+    per process.
+    """
+
+    def __init__(self, path: str, max_bytes: int | None = None) -> None:
+        self.path = path
+        self._max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def get(self, key: str, default: bytes | None = None) -> bytes | None:
+        """Return the cached value for `key`, or `default` if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return default
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        """
+        Store a value.
+        Args:
+            key: The cache key.
+            value: The bytes to store.
+            ttl: Seconds until the entry expires, or None to keep it until evicted.
+        """
+        size = len(value)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, expires_at, now),
+            )
+            if self._max_bytes is not None:
+                self._evict(self._max_bytes)
+
+    def _evict(self, max_bytes: int) -> None:
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at"
+        ):
+            if total <= max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self._stats.evictions += len(evicted)
+
+    def invalidate(self, key: str | None = None, prefix: str | None = None) -> int:
+        """
+        Remove one entry, every entry whose key starts with `prefix`, or the whole
+        cache if neither is given.
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            if key is not None:
+                cursor = self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            elif prefix is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM entries WHERE substr(key, 1, ?) = ?",
+                    (len(prefix), prefix),
+                )
+            else:
+                cursor = self._conn.execute("DELETE FROM entries")
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, object]:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self._max_bytes,
+                **self._stats.to_dict(),
+            }
+
+
+_sqlite_caches: dict[tuple[str, int | None], SQLiteCache] = {}
+_sqlite_caches_lock = threading.Lock()
+
+
+def get_sqlite_cache(path: str, max_bytes: int | None = None) -> SQLiteCache:
+    """
+    Return the process-wide SQLiteCache of a database file, opening it on first use.
+    Args:
+        path: The SQLite database path.
+        max_bytes: Size above which least recently read entries are evicted.
+    Returns:
+        The shared SQLiteCache for that path and size limit.
+    Raises:
+        OSError, sqlite3.Error: If the database can't be created or opened.
+    """
+    key = (path, max_bytes)
+    cache = _sqlite_caches.get(key)
+    if cache is None:
+        with _sqlite_caches_lock:
+            cache = _sqlite_caches.get(key)
+            if cache is None:
+                cache = _sqlite_caches[key] = SQLiteCache(path, max_bytes=max_bytes)
+    return cache
+
+
+@dataclass(slots=True)
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: BaseException | None = None
+
+
+_single_flights: "list[SingleFlight]" = []
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight, other
+    callers with the same key wait for it and share its result (or its exception)
+    instead of issuing their own.
+
+    Results handed to waiters are passed through `copy` so callers that mutate their
+    result don't affect each other; a None result (e.g. from a failed query) is shared
+    as is. Sync calls coalesce across threads and async calls across tasks of the same
+    event loop.
+    """
+
+    def __init__(self, name: str, copy: Callable[[Any], Any] | None = None) -> None:
+        self.name = name
+        self._copy = copy
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._tasks: dict[tuple[int, Hashable], asyncio.Future] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        _single_flights.append(self)
+
+    def _share(self, result: Any) -> Any:
+        if result is None or self._copy is None:
+            return result
+        return self._copy(result)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call `fn(*args, **kwargs)`, or wait for the in-flight call with the same key.
+        Args:
+            key: Identifies identical calls, e.g. a canonical hash of the request.
+            fn: The function making the call.
+        Returns:
+            The call's result.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self._share(flight.result)
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(
+        self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        """
+        Await `fn(*args, **kwargs)`, or the in-flight call with the same key.
+        The call runs as its own task, so a cancelled caller doesn't cancel it for the
+        other waiters.
+        Args:
+            key: Identifies identical calls, e.g. a canonical hash of the request.
+            fn: The coroutine function making the call.
+        Returns:
+            The call's result.
+        """
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[task_key] = asyncio.ensure_future(
+                    fn(*args, **kwargs)
+                )
+                task.add_done_callback(lambda _: self._forget(task_key, task))
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+        result = await asyncio.shield(task)
+        return result if leader else self._share(result)
+
+    def _forget(self, task_key: tuple[int, Hashable], task: asyncio.Future) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+        if not task.cancelled():
+            # Retrieve the exception so it isn't reported as unhandled when every
+            # waiter was cancelled
+            task.exception()
+
+    def stats(self) -> dict[str, object]:
+        """Return the number of calls made and of calls that joined one in flight."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self._leaders,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._flights) + len(self._tasks),
+            }
+
+
+def get_single_flight_stats() -> list[dict[str, object]]:
+    """Return the counters of every SingleFlight in the process."""
+    return [single_flight.stats() for single_flight in _single_flights]
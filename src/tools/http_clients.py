@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import threading
+from typing import Callable
+
+import httpx
+
+
+def close_async_client(
+    client: httpx.AsyncClient | None, loop: asyncio.AbstractEventLoop | None
+) -> None:
+    """
+    Close an async HTTP client that is being replaced because the event loop changed.
+    Its connections belong to `loop`, so they are closed there if that loop is still
+    running (in another thread). A loop that has stopped can't run the close; its
+    connections are dropped with the client.
+    Args:
+        client: The client being replaced.
+        loop: The event loop the client was used on.
+    """
+    if client is None or loop is None or client.is_closed:
+        return
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    else:
+        logging.debug("Dropping HTTP client of a stopped event loop")
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SharedHTTPClients:
+    """
+    A process-wide pair of sync and async HTTP clients, created on first use and
+    recreated once closed, so repeated requests reuse pooled connections.
+
+    Async connections belong to the event loop that opened them, so the async client
+    is bound to the loop it is first used on. It is recreated when used from another
+    loop, and the replaced client is closed on its own loop.
+    """
+
+    def __init__(
+        self,
+        create_sync: Callable[[], httpx.Client],
+        create_async: Callable[[], httpx.AsyncClient],
+    ) -> None:
+        self._create_sync = create_sync
+        self._create_async = create_async
+        self._sync: httpx.Client | None = None
+        self._async: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def get_sync(self) -> httpx.Client:
+        """Return the sync client."""
+        client = self._sync
+        if client is None or client.is_closed:
+            with self._lock:
+                client = self._sync
+                if client is None or client.is_closed:
+                    client = self._sync = self._create_sync()
+        return client
+
+    def get_async(self) -> httpx.AsyncClient:
+        """Return the async client of the running event loop."""
+        loop = _running_loop()
+        client = self._async
+        if client is not None and not client.is_closed and self._async_loop is loop:
+            return client
+        with self._lock:
+            old_client, old_loop = self._async, self._async_loop
+            if old_client is not None and not old_client.is_closed and old_loop is loop:
+                return old_client
+            client = self._async = self._create_async()
+            self._async_loop = loop
+        if old_loop is not loop:
+            close_async_client(old_client, old_loop)
+        return client
+
+    async def aclose(self) -> None:
+        """Close both clients and release their pooled connections."""
+        with self._lock:
+            sync_client, self._sync = self._sync, None
+            async_client, self._async = self._async, None
+            self._async_loop = None
+        if sync_client is not None:
+            sync_client.close()
+        if async_client is not None:
+            await async_client.aclose()
@@ -0,0 +1,170 @@
+import os
+import threading
+from typing import Iterable
+
+import numpy as np
+
+# Interned codes are dense, so 32 bits covers every palm id and SRA accession
+CODE_DTYPE = np.uint32
+# Identifiers an interner holds before it's retired for a fresh one, overridable with
+# IDENTIFIER_INTERNER_MAX_IDS
+IDENTIFIER_INTERNER_MAX_IDS = 2_000_000
+
+
+class IdentifierInterner:
+    """
+    Maps identifier strings of one kind (e.g. palm ids, runs) to dense integers.
+    Codes are assigned on first sight and stay stable for the life of the interner.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self._codes: dict[str, int] = {}
+        self._strings: list[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def intern(self, values: Iterable[str]) -> "IdSet":
+        """Intern values, assigning codes to unseen ones, and return them as a set."""
+        codes = self._codes
+        with self._lock:
+            encoded = []
+            for value in values:
+                code = codes.get(value)
+                if code is None:
+                    code = len(self._strings)
+                    codes[value] = code
+                    self._strings.append(value)
+                encoded.append(code)
+        return IdSet(self, np.unique(np.asarray(encoded, dtype=CODE_DTYPE)))
+
+    def lookup(self, values: Iterable[str]) -> "IdSet":
+        """Return the set of already-interned values; unseen values are dropped."""
+        codes = self._codes
+        encoded = [code for code in map(codes.get, values) if code is not None]
+        return IdSet(self, np.unique(np.asarray(encoded, dtype=CODE_DTYPE)))
+
+    def code(self, value: str) -> int | None:
+        """Return the code of an interned value, or None if it was never interned."""
+        return self._codes.get(value)
+
+    def decode(self, codes: np.ndarray) -> list[str]:
+        """Map codes back to their identifier strings."""
+        strings = self._strings
+        return [strings[code] for code in codes.tolist()]
+
+
+class IdSet:
+    """
+    An immutable set of interned identifiers, stored as a sorted array of unique codes.
+    Set algebra runs on the integer arrays; strings are only produced by `to_list`.
+    """
+
+    __slots__ = ("interner", "codes", "_bitmap")
+
+    def __init__(self, interner: IdentifierInterner, codes: np.ndarray) -> None:
+        self.interner = interner
+        self.codes = codes
+        self._bitmap: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return int(self.codes.size)
+
+    def __bool__(self) -> bool:
+        return self.codes.size > 0
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __contains__(self, value: str) -> bool:
+        code = self.interner.code(value)
+        if code is None:
+            return False
+        bitmap = self._membership_bitmap()
+        return code < bitmap.size and bool(bitmap[code])
+
+    def _membership_bitmap(self) -> np.ndarray:
+        # Built on first membership test so repeated per-row checks are O(1)
+        if self._bitmap is None:
+            size = int(self.codes[-1]) + 1 if self.codes.size else 0
+            bitmap = np.zeros(size, dtype=bool)
+            bitmap[self.codes] = True
+            self._bitmap = bitmap
+        return self._bitmap
+
+    def _align(
+        self, other: "IdSet"
+    ) -> tuple[IdentifierInterner, np.ndarray, np.ndarray]:
+        """Return an interner both sets can be expressed in, and both code arrays."""
+        if other.interner is self.interner:
+            return self.interner, self.codes, other.codes
+        if other.interner.kind != self.interner.kind:
+            raise ValueError(
+                f"Cannot combine {self.interner.kind} and {other.interner.kind} sets"
+            )
+        # One of the sets predates its interner being retired; re-intern into the
+        # current one
+        interner = get_interner(self.interner.kind)
+        codes = [
+            s.codes if s.interner is interner else interner.intern(s.to_list()).codes
+            for s in (self, other)
+        ]
+        return interner, codes[0], codes[1]
+
+    def __or__(self, other: "IdSet") -> "IdSet":
+        interner, codes, other_codes = self._align(other)
+        return IdSet(interner, np.union1d(codes, other_codes))
+
+    def __and__(self, other: "IdSet") -> "IdSet":
+        interner, codes, other_codes = self._align(other)
+        return IdSet(interner, np.intersect1d(codes, other_codes, assume_unique=True))
+
+    def __sub__(self, other: "IdSet") -> "IdSet":
+        interner, codes, other_codes = self._align(other)
+        return IdSet(interner, np.setdiff1d(codes, other_codes, assume_unique=True))
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+
+    def to_list(self) -> list[str]:
+        """Decode the set back to identifier strings, ordered by interning order."""
+        return self.interner.decode(self.codes)
+
+
+_interners: dict[str, IdentifierInterner] = {}
+_interners_lock = threading.Lock()
+
+
+def get_interner(kind: str) -> IdentifierInterner:
+    """
+    Return the process-wide interner for an identifier kind.
+    Once it holds IDENTIFIER_INTERNER_MAX_IDS identifiers it's replaced by an empty
+    one, so memory stays bounded; the old one is freed with the last set using it.
+
+    Optional environment variables:
+        - IDENTIFIER_INTERNER_MAX_IDS: identifiers per kind before the interner is
+          replaced
+
+    Args:
+        kind: The identifier kind, e.g. "palm_id", "run", "biosample" or "bioproject".
+    Returns:
+        The shared IdentifierInterner for that kind.
+    """
+    max_ids = int(
+        os.environ.get("IDENTIFIER_INTERNER_MAX_IDS", IDENTIFIER_INTERNER_MAX_IDS)
+    )
+    interner = _interners.get(kind)
+    if interner is None or len(interner) >= max_ids:
+        with _interners_lock:
+            interner = _interners.get(kind)
+            if interner is None or len(interner) >= max_ids:
+                interner = _interners[kind] = IdentifierInterner(kind)
+    return interner
+
+
+def intern_ids(kind: str, values: Iterable[str]) -> IdSet:
+    """Intern identifier strings of the given kind and return them as an IdSet."""
+    return get_interner(kind).intern(values)
@@ -0,0 +1,206 @@
+import base64
+import codecs
+import json
+import re
+
+try:
+    from orjson import loads as orjson_loads
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson_loads = None
+
+# Bytes of a single array element the incremental parser buffers before giving up
+MAX_ELEMENT_BYTES = 64 * 1024 * 1024
+
+_JSON_START = frozenset(b'[{"-0123456789tfn')
+_WHITESPACE = re.compile(r"\s*")
+_BASE64_IGNORED = b" \t\n\r\x0b\x0c"
+
+
+def loads(data: bytes | str) -> object:
+    """
+    Parse a complete JSON document, with orjson if it is installed. orjson reads
+    integers wider than 64 bits as floats.
+    """
+    if orjson_loads is not None:
+        try:
+            return orjson_loads(data)
+        except ValueError:
+            # e.g. NaN and Infinity, which the json module accepts
+            pass
+    return json.loads(data)
+
+
+class Base64Decoder:
+    """
+    Decodes base64 incrementally: each call decodes the complete 4-character groups
+    received so far and keeps the remainder for the next call. Invalid input raises
+    binascii.Error, a ValueError.
+    """
+
+    def __init__(self) -> None:
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> bytes:
+        data = self._pending + chunk.translate(None, _BASE64_IGNORED)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable], validate=True)
+
+    def close(self) -> bytes:
+        data, self._pending = self._pending, b""
+        if not data:
+            return b""
+        # Tolerate missing padding
+        return base64.b64decode(data + b"=" * (-len(data) % 4), validate=True)
+
+
+class JSONArrayParser:
+    """
+    Parses a top-level JSON array incrementally, returning each element once the
+    delimiter that follows it has arrived. Only the text of elements not yet complete
+    is buffered. Documents that aren't arrays are buffered whole and parsed on close.
+    """
+
+    def __init__(self) -> None:
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._raw = bytearray()
+        self._state = "start"
+        self.value: object = None
+
+    def feed(self, chunk: bytes) -> list:
+        """Parse the next chunk of the document and return the elements it completed."""
+        if self._state == "document":
+            self._raw += chunk
+            return []
+        if self._state == "start":
+            stripped = chunk.lstrip()
+            if not stripped:
+                return []
+            if stripped[:1] != b"[":
+                self._state = "document"
+                self._raw += chunk
+                return []
+            self._state = "items"
+            chunk = stripped[1:]
+        self._buffer += self._text.decode(chunk)
+        return self._parse(final=False)
+
+    def close(self) -> list:
+        """Parse the rest of the document and return the remaining elements."""
+        if self._state == "document":
+            self.value = loads(bytes(self._raw))
+            self._raw = bytearray()
+            return []
+        if self._state == "start":
+            raise ValueError("Empty JSON document")
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Unterminated JSON array")
+        return items
+
+    def _parse(self, final: bool) -> list:
+        items = []
+        text = self._buffer
+        position = _WHITESPACE.match(text, 0).end()
+        # Fast path: parse the objects completed so far with one call. If the last
+        # "}," isn't the end of a top-level element, the slice either leaves a string
+        # unterminated or its braces unbalanced, so it fails to parse.
+        cut = text.rfind("},")
+        if cut > position and text[position] == "{":
+            try:
+                items = loads("[" + text[position : cut + 1] + "]")
+                position = _WHITESPACE.match(text, cut + 2).end()
+            except ValueError:
+                items = []
+        while position < len(text) and self._state == "items":
+            if text[position] == "]":
+                self._state = "done"
+                position += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+            after = _WHITESPACE.match(text, end).end()
+            if after == len(text) and not final:
+                # A number at the end of the buffer may continue in the next chunk
+                break
+            if after < len(text) and text[after] == ",":
+                after = _WHITESPACE.match(text, after + 1).end()
+            elif after < len(text) and text[after] != "]":
+                raise ValueError(
+                    f"Expected ',' or ']' in JSON array, got {text[after]!r}"
+                )
+            items.append(item)
+            position = after
+        self._buffer = text[position:]
+        if len(self._buffer) > MAX_ELEMENT_BYTES:
+            raise ValueError("JSON array element exceeds MAX_ELEMENT_BYTES")
+        return items
+
+
+class ResponseDecoder:
+    """
+    Decodes an OpenVirome API response body as it streams in. The body is either JSON
+    or base64-encoded JSON; a top-level array is returned element by element, so only
+    one network chunk of rows is held at a time. Other documents are parsed whole and
+    available as `value` after `close`.
+    """
+
+    def __init__(self, keep_bytes: int = 0) -> None:
+        """
+        Args:
+            keep_bytes: Keep the decoded JSON body (e.g. to cache it) while it is no
+                larger than this; `body` is None once it grows past it.
+        """
+        self._parser = JSONArrayParser()
+        self._base64: Base64Decoder | None = None
+        self._detected = False
+        self._keep_bytes = keep_bytes
+        self._kept: bytearray | None = bytearray() if keep_bytes > 0 else None
+        self.bytes_received = 0
+
+    @property
+    def value(self) -> object:
+        return self._parser.value
+
+    @property
+    def body(self) -> bytes | None:
+        return bytes(self._kept) if self._kept is not None else None
+
+    def feed(self, chunk: bytes) -> list:
+        """Decode the next chunk of the body and return the array elements it completed."""
+        self.bytes_received += len(chunk)
+        if not self._detected:
+            stripped = chunk.lstrip()
+            if not stripped:
+                return []
+            self._detected = True
+            if stripped[0] not in _JSON_START:
+                self._base64 = Base64Decoder()
+        if self._base64 is not None:
+            chunk = self._base64.feed(chunk)
+        self._keep(chunk)
+        return self._parser.feed(chunk)
+
+    def close(self) -> list:
+        """Decode the end of the body and return the remaining array elements."""
+        items = []
+        if self._base64 is not None:
+            chunk = self._base64.close()
+            self._keep(chunk)
+            items = self._parser.feed(chunk)
+        return items + self._parser.close()
+
+    def _keep(self, chunk: bytes) -> None:
+        if self._kept is None:
+            return
+        if len(self._kept) + len(chunk) > self._keep_bytes:
+            self._kept = None
+            return
+        self._kept += chunk
@@ -1,13 +1,72 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
 from typing_extensions import Any
 
+import httpx
+from langchain_core.utils.function_calling import convert_to_openai_function
 from langchain_openai import AzureChatOpenAI
+from pydantic import BaseModel
+
+from src.tools.cache import SQLiteCache, canonical_hash, get_sqlite_cache
+from src.tools.metrics import track
+from src.tools.http_clients import SharedHTTPClients
+
+EXISTING_DEPLOYMENTS = {
+    "gpt-4o": "open-virome-llm",
+    "o1-mini": "open-virome-llm-o1-mini",
+    "gpt-4o-mini": "open-virome-llm-gpt-4o-mini",
+}
+
+# Completion cache defaults, overridable with LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+# and LLM_CACHE_TTL_SECONDS
+LLM_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "open-virome-mcp", "llm_completions.sqlite3"
+)
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+LLM_CACHE_TTL_SECONDS = 30 * 86400
+
+
+# Shared HTTP settings for the Azure OpenAI clients. Completions can take minutes, so
+# the read timeout is generous but bounded; override it with LLM_TIMEOUT_SECONDS.
+LLM_TIMEOUT_SECONDS = 180.0
+LLM_CONNECT_TIMEOUT_SECONDS = 10.0
+LLM_MAX_RETRIES = 2
+LLM_POOL_LIMITS = httpx.Limits(
+    max_connections=16,
+    max_keepalive_connections=8,
+    keepalive_expiry=120.0,
+)
+
+
+def _llm_timeout() -> httpx.Timeout:
+    seconds = float(os.environ.get("LLM_TIMEOUT_SECONDS", LLM_TIMEOUT_SECONDS))
+    return httpx.Timeout(seconds, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+_http_clients = SharedHTTPClients(
+    lambda: httpx.Client(timeout=_llm_timeout(), limits=LLM_POOL_LIMITS),
+    lambda: httpx.AsyncClient(timeout=_llm_timeout(), limits=LLM_POOL_LIMITS),
+)
+# Chat clients by (model, temperature), with the async HTTP client each was built on
+_clients: dict[tuple[str, float], tuple[AzureChatOpenAI, httpx.AsyncClient]] = {}
+_clients_lock = threading.Lock()
 
 
 def get_openai_client(
     model_name: str = "gpt-4o", temperature: float = 0.0
 ) -> AzureChatOpenAI:
     """
-    Create an OpenAI client for the specified model.
+    Return the shared OpenAI client for the specified model and temperature.
+    Clients are created once per process and share keep-alive HTTP connection pools,
+    so repeated completions reuse TLS sessions. Async connections belong to the event
+    loop that opened them, so clients are rebuilt when called from a different loop.
+
+    Optional environment variables:
+        - LLM_TIMEOUT_SECONDS: read timeout of a completion request
 
     Args:
         model_name (str): The name of the OpenAI model to use.
@@ -16,27 +75,171 @@ def get_openai_client(
     Returns:
         AzureChatOpenAI: An instance of the OpenAI client.
     """
-
-    existing_deployments = {
-        "gpt-4o": "open-virome-llm",
-        "o1-mini": "open-virome-llm-o1-mini",
-        "gpt-4o-mini": "open-virome-llm-gpt-4o-mini",
-    }
-    if model_name not in existing_deployments:
+    if model_name not in EXISTING_DEPLOYMENTS:
         raise ValueError(
             f"{model_name} not registered. Existing deployments:"
-            f" {existing_deployments.keys()}"
+            f" {EXISTING_DEPLOYMENTS.keys()}"
         )
 
-    deployment_name = existing_deployments[model_name]
+    async_http_client = _http_clients.get_async()
+    key = (model_name, temperature)
+    entry = _clients.get(key)
+    if entry is not None and entry[1] is async_http_client:
+        return entry[0]
+
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry is None or entry[1] is not async_http_client:
+            client = AzureChatOpenAI(
+                azure_deployment=EXISTING_DEPLOYMENTS[model_name],
+                api_version="2024-09-01-preview",
+                temperature=temperature,
+                max_tokens=None,
+                timeout=_llm_timeout(),
+                max_retries=LLM_MAX_RETRIES,
+                http_client=_http_clients.get_sync(),
+                http_async_client=async_http_client,
+            )
+            entry = _clients[key] = (client, async_http_client)
+    return entry[0]
+
+
+async def close_openai_clients() -> None:
+    """Close the shared OpenAI clients and release pooled connections."""
+    with _clients_lock:
+        _clients.clear()
+    await _http_clients.aclose()
+
+
+def get_llm_cache() -> SQLiteCache | None:
+    """
+    Return the on-disk LLM completion cache, opening it on first use.
+
+    Optional environment variables:
+        - LLM_CACHE_PATH: SQLite database path; set it to an empty string to disable
+        - LLM_CACHE_MAX_BYTES: size above which least recently used entries are evicted
+        - LLM_CACHE_TTL_SECONDS: how long cached completions are reused
+
+    Returns:
+        The shared SQLiteCache, or None if caching is disabled or the database can't be
+        opened.
+    """
+    path = os.environ.get("LLM_CACHE_PATH", LLM_CACHE_PATH)
+    if not path:
+        return None
+    max_bytes = int(os.environ.get("LLM_CACHE_MAX_BYTES", LLM_CACHE_MAX_BYTES))
+    try:
+        return get_sqlite_cache(path, max_bytes=max_bytes)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning("Failed to open LLM cache at %s: %s", path, e)
+        return None
+
+
+def get_llm_cache_stats() -> dict[str, object] | None:
+    """Return the LLM completion cache counters, or None if caching is disabled."""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else None
+
+
+def _schema_signature(structured_output: Any) -> object:
+    if structured_output is None:
+        return None
+    try:
+        return convert_to_openai_function(structured_output)
+    except (TypeError, ValueError):
+        return repr(structured_output)
+
+
+def _completion_cache_key(
+    deployment: str,
+    temperature: float,
+    messages: list[dict],
+    structured_output: Any,
+) -> str:
+    return canonical_hash(
+        {
+            "deployment": deployment,
+            "temperature": temperature,
+            "messages": messages,
+            "structured_output": _schema_signature(structured_output),
+        }
+    )
+
+
+def _encode_completion(result: Any) -> bytes:
+    if isinstance(result, BaseModel):
+        result = result.model_dump(mode="json")
+    return json.dumps({"result": result}).encode("utf-8")
+
+
+def _decode_completion(value: bytes, structured_output: Any) -> Any:
+    result = json.loads(value)["result"]
+    if isinstance(structured_output, type) and issubclass(structured_output, BaseModel):
+        return structured_output.model_validate(result)
+    return result
+
 
-    return AzureChatOpenAI(
-        azure_deployment=deployment_name,
-        api_version="2024-09-01-preview",
-        temperature=temperature,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
+def _lookup_completion(
+    messages: list[dict],
+    model: AzureChatOpenAI | None,
+    model_name: str,
+    temperature: float,
+    structured_output: Any,
+    use_cache: bool,
+) -> tuple[str | None, Any]:
+    # Returns the cache key to store the completion under (None if it shouldn't be
+    # cached) and the cached completion, if any
+    if not messages or not isinstance(messages, list):
+        raise ValueError("Messages must be a non-empty list of dictionaries.")
+
+    cache = get_llm_cache() if use_cache else None
+    if model is None:
+        deployment = EXISTING_DEPLOYMENTS.get(model_name, model_name)
+    else:
+        deployment = getattr(model, "deployment_name", None)
+        temperature = getattr(model, "temperature", temperature)
+    if cache is None or deployment is None:
+        return None, None
+
+    key = _completion_cache_key(deployment, temperature, messages, structured_output)
+    try:
+        cached = cache.get(key)
+    except sqlite3.Error as e:
+        logging.warning("LLM cache read failed: %s", e)
+        return key, None
+    if cached is None:
+        return key, None
+    logging.info("Using cached %s completion", model_name)
+    return key, _decode_completion(cached, structured_output)
+
+
+def _store_completion(key: str | None, result: Any) -> None:
+    cache = get_llm_cache()
+    if key is None or cache is None or not result:
+        return
+    ttl = float(os.environ.get("LLM_CACHE_TTL_SECONDS", LLM_CACHE_TTL_SECONDS))
+    try:
+        cache.set(key, _encode_completion(result), ttl=ttl)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logging.warning("LLM cache write failed: %s", e)
+
+
+def _prepare_model(
+    model: AzureChatOpenAI | None,
+    model_name: str,
+    temperature: float,
+    structured_output: Any,
+):
+    if model is None:
+        model = get_openai_client(model_name, temperature)
+    if structured_output is not None:
+        model = model.with_structured_output(structured_output)
+    return model
+
+
+def _request_bytes(messages: list[dict]) -> int:
+    return sum(
+        len(str(message.get("content", "")).encode("utf-8")) for message in messages
     )
 
 
@@ -46,29 +249,63 @@ def run_llm_completion(
     model_name: str = "gpt-4o",
     temperature: float = 0.0,
     structured_output: Any = None,
+    use_cache: bool = True,
 ) -> str:
     """
     Run a completion using the specified OpenAI client.
+    Completions are memoized on disk, keyed by deployment, temperature, the
+    canonicalized messages and the structured output schema.
 
     Args:
         client (AzureChatOpenAI): The OpenAI client instance.
         messages (list[dict]): The messages to send to the model.
         model_name (str): The name of the model to use.
         temperature (float): The temperature for the model's response.
+        use_cache (bool): Whether to reuse and store cached completions.
 
     Returns:
         str: The response from the model.
     """
-    if model is None:
-        model = get_openai_client(model_name, temperature)
-    if not messages or not isinstance(messages, list):
-        raise ValueError("Messages must be a non-empty list of dictionaries.")
-    if structured_output is not None:
-        model = model.with_structured_output(structured_output)
+    key, cached = _lookup_completion(
+        messages, model, model_name, temperature, structured_output, use_cache
+    )
+    if cached is not None:
+        return cached
 
-    response = model.invoke(messages)
+    model = _prepare_model(model, model_name, temperature, structured_output)
+    with track("backend", "azure_openai", model_name) as call:
+        call.request_bytes = _request_bytes(messages)
+        response = model.invoke(messages)
 
-    if structured_output is not None:
-        return response
+    result = response if structured_output is not None else response.content
+    _store_completion(key, result)
+    return result
+
+
+async def run_llm_completion_async(
+    messages: list[dict],
+    model: AzureChatOpenAI | None = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.0,
+    structured_output: Any = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Async version of `run_llm_completion`.
+    The request is awaited on the shared async connection pool instead of blocking a
+    worker thread, so concurrent completions overlap on the event loop.
+    """
+    key, cached = _lookup_completion(
+        messages, model, model_name, temperature, structured_output, use_cache
+    )
+    if cached is not None:
+        return cached
+
+    model = _prepare_model(model, model_name, temperature, structured_output)
+    with track("backend", "azure_openai", model_name) as call:
+        call.request_bytes = _request_bytes(messages)
+        response = await model.ainvoke(messages)
 
-    return response.content
+    result = response if structured_output is not None else response.content
+    _store_completion(key, result)
+    return result
@@ -0,0 +1,301 @@
+import bisect
+import functools
+import inspect
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+METRIC_PREFIX = "openvirome_mcp"
+# Fields of listed snapshot records that identify the record; they become labels of
+# the record's numeric fields
+LABEL_FIELDS = ("name", "route", "encoding")
+
+_METRIC_NAME_PART = re.compile(r"[a-zA-Z0-9_:]+")
+
+
+@dataclass(slots=True)
+class Call:
+    """Sizes reported by an in-flight call; recorded when the call finishes."""
+
+    request_bytes: int = 0
+    response_bytes: int = 0
+    rows: int = 0
+
+
+@dataclass(slots=True)
+class LatencyHistogram:
+    """Sum, maximum and bucket counts of call latencies, in seconds."""
+
+    total: float = 0.0
+    maximum: float = 0.0
+    # One slot per bucket plus the +Inf overflow slot
+    bucket_counts: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+    def observe(self, seconds: float) -> None:
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def cumulative_buckets(self) -> list[list[object]]:
+        """Return [upper bound, calls at or below it] pairs, ending with "+Inf"."""
+        cumulative, buckets = 0, []
+        for bound, count in zip((*LATENCY_BUCKETS, math.inf), self.bucket_counts):
+            cumulative += count
+            buckets.append(["+Inf" if bound == math.inf else bound, cumulative])
+        return buckets
+
+
+@dataclass(slots=True)
+class CallStats:
+    """Counters and a latency histogram for one (kind, name, operation)."""
+
+    calls: int = 0
+    errors: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    # Sizes summed over every call
+    totals: Call = field(default_factory=Call)
+
+    def observe(self, seconds: float, error: bool, call: Call) -> None:
+        self.calls += 1
+        self.errors += error
+        self.latency.observe(seconds)
+        self.totals.request_bytes += call.request_bytes
+        self.totals.response_bytes += call.response_bytes
+        self.totals.rows += call.rows
+
+    def to_dict(self) -> dict[str, object]:
+        latency = self.latency
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_sum_seconds": latency.total,
+            "latency_avg_seconds": latency.total / self.calls if self.calls else 0.0,
+            "latency_max_seconds": latency.maximum,
+            "latency_buckets": latency.cumulative_buckets(),
+            "request_bytes": self.totals.request_bytes,
+            "response_bytes": self.totals.response_bytes,
+            "rows": self.totals.rows,
+        }
+
+
+class MetricsRegistry:
+    """
+    A thread-safe registry of call metrics keyed by (kind, name, operation), e.g.
+    ("node", "mwas/get_mwas_results", "") or ("backend", "postgres", "serratus").
+    Recording a call is a dict lookup and a few additions under a lock.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[tuple[str, str, str], CallStats] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(
+        self,
+        kind: str,
+        name: str,
+        operation: str,
+        seconds: float,
+        error: bool,
+        call: Call,
+    ) -> None:
+        """Record one finished call."""
+        key = (kind, name, operation)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CallStats()
+            stats.observe(seconds, error, call)
+
+    @contextmanager
+    def track(self, kind: str, name: str, operation: str = "") -> Iterator[Call]:
+        """
+        Time the enclosed block as one call. The yielded Call can be given the
+        request/response sizes and row count; exceptions are counted as errors.
+        """
+        call = Call()
+        error = False
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(
+                kind, name, operation, time.perf_counter() - started, error, call
+            )
+
+    def snapshot(self) -> list[dict[str, object]]:
+        """Return the metrics of every call recorded so far."""
+        with self._lock:
+            items = [(key, stats.to_dict()) for key, stats in self._stats.items()]
+        return [
+            {"kind": kind, "name": name, "operation": operation, **stats}
+            for (kind, name, operation), stats in sorted(items)
+        ]
+
+    def reset(self) -> None:
+        """Forget every recorded call."""
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+
+_registry = MetricsRegistry()
+
+
+def track(kind: str, name: str, operation: str = ""):
+    """Time a block as one call in the process-wide registry; see MetricsRegistry.track."""
+    return _registry.track(kind, name, operation)
+
+
+def track_node(graph: str):
+    """
+    Decorator that records a LangGraph node's calls under ("node", "<graph>/<node>").
+    Works for sync and async node functions and keeps their signature and type hints.
+    Args:
+        graph: Name of the graph the node belongs to.
+    """
+
+    def decorator(fn):
+        name = f"{graph}/{fn.__name__}"
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _registry.track("node", name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _registry.track("node", name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_metrics_snapshot() -> dict[str, object]:
+    """Return the uptime and per-node and per-backend call metrics."""
+    return {
+        "started_at": _registry.started_at,
+        "uptime_seconds": time.time() - _registry.started_at,
+        "calls": _registry.snapshot(),
+    }
+
+
+def reset_metrics() -> None:
+    """Clear the process-wide call metrics."""
+    _registry.reset()
+
+
+def _label_value(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, object]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _gauges(section: str, value: object, labels: dict[str, object]) -> Iterator[str]:
+    # Flattens numeric fields of nested dicts and of lists of records identified by
+    # LABEL_FIELDS. Keys that can't be part of a metric name, such as route paths,
+    # become a "key" label instead.
+    if isinstance(value, bool):
+        yield f"{METRIC_PREFIX}_{section}{_labels(labels)} {int(value)}"
+    elif isinstance(value, (int, float)):
+        yield f"{METRIC_PREFIX}_{section}{_labels(labels)} {value}"
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key in LABEL_FIELDS:
+                continue
+            if _METRIC_NAME_PART.fullmatch(str(key)):
+                yield from _gauges(f"{section}_{key}", item, labels)
+            else:
+                yield from _gauges(section, item, {**labels, "key": key})
+    elif isinstance(value, list):
+        for item in value:
+            if not isinstance(item, dict):
+                continue
+            item_labels = {k: item[k] for k in LABEL_FIELDS if k in item}
+            if item_labels:
+                yield from _gauges(section, item, {**labels, **item_labels})
+
+
+def render_prometheus(snapshot: dict[str, object]) -> str:
+    """
+    Render a metrics snapshot in the Prometheus text exposition format.
+    Call metrics become counters and a latency histogram labelled by kind, name and
+    operation; numeric fields of any other snapshot section become gauges.
+    Args:
+        snapshot: A snapshot from `get_metrics_snapshot`, optionally with extra sections.
+    Returns:
+        The exposition text.
+    """
+    counters = {
+        "calls_total": ("calls", "Calls made"),
+        "errors_total": ("errors", "Calls that raised an exception"),
+        "request_bytes_total": ("request_bytes", "Request payload bytes sent"),
+        "response_bytes_total": ("response_bytes", "Response payload bytes received"),
+        "rows_total": ("rows", "Rows or records returned"),
+    }
+    calls = snapshot.get("calls", [])
+    lines = []
+    for metric, (stat, help_text) in counters.items():
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+        for call in calls:
+            labels = _labels({k: call[k] for k in ("kind", "name", "operation")})
+            lines.append(f"{METRIC_PREFIX}_{metric}{labels} {call[stat]}")
+
+    histogram = f"{METRIC_PREFIX}_latency_seconds"
+    lines.append(f"# HELP {histogram} Call latency")
+    lines.append(f"# TYPE {histogram} histogram")
+    for call in calls:
+        labels = {k: call[k] for k in ("kind", "name", "operation")}
+        for bound, count in call["latency_buckets"]:
+            lines.append(
+                f"{histogram}_bucket{_labels({**labels, 'le': bound})} {count}"
+            )
+        lines.append(f"{histogram}_sum{_labels(labels)} {call['latency_sum_seconds']}")
+        lines.append(f"{histogram}_count{_labels(labels)} {call['calls']}")
+
+    gauges = []
+    for section, value in snapshot.items():
+        if section != "calls":
+            gauges.extend(_gauges(section, value, {}))
+    # Keep each gauge's samples together; the sort is stable, so label order is kept
+    lines.extend(sorted(gauges, key=lambda line: line.split("{")[0].split(" ")[0]))
+    return "\n".join(lines) + "\n"
@@ -1,78 +1,311 @@
+import asyncio
 import logging
-import base64
-import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-
-from src.resources.psql import run_sql_query
-from src.resources.neo4j import run_neo4j_query
+from src.tools.openvirome_client import (
+    EncodedIds,
+    chunk_rows,
+    post_to_openvirome_api,
+    post_to_openvirome_api_async,
+)
 from src.tools.workflows.state import MetadataFilter, SRAIdentifiers
 
-### OpenVirome API interaction functions
+### OpenVirome API queries
 
+# Large id lists are split into chunks that are posted concurrently and merged,
+# keeping request bodies well under the API Gateway payload and timeout limits.
+ID_CHUNK_SIZE = 10000
+ID_CHUNK_CONCURRENCY = 4
+# /identifiers requests with many filters of one type (e.g. one sotu filter per palm
+# id) are split into batches resolved concurrently. Batches end after a filter whose
+# hash is a multiple of FILTER_BATCH_SIZE, so boundaries depend on the filters
+# themselves rather than their position: a later request sharing most palm ids gets
+# mostly the same batches, which are then served from the response cache.
+FILTER_BATCH_SIZE = 250
+FILTER_BATCH_MIN = 50
+FILTER_BATCH_MAX = 1000
+# Concurrent /counts requests issued by one batched facet-count call
+FACET_CONCURRENCY = 8
 
-def post_to_openvirome_api(route: str, data: dict) -> dict:
-    """
-    Post data to the OpenVirome API.
-    Args:
-        data: The data to post.
-    Returns:
-        The response from the API.
-    """
-    valid_routes = [
-        "/identifiers",
-        "/counts",
-        "/results",
-        "/mwas",
-    ]
-    if route not in valid_routes:
-        raise ValueError(f"Invalid route: {route}. Valid routes are: {valid_routes}")
-
-    url = "https://zrdbegawce.execute-api.us-east-1.amazonaws.com/prod" + route
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Accept-Encoding": "gzip, deflate, br, zstd",
-        "Referer": "https://mcp.openvirome.com/",
-        "Origin": "https://mcp.openvirome.com",
+
+def _identifiers_payload(filters: list[MetadataFilter], palmprint_only: bool) -> dict:
+    return {
+        "filters": filters,
+        "palmprintOnly": palmprint_only,
+    }
+
+
+def _counts_payload(
+    table: str,
+    group_by: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool,
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> dict:
+    return {
+        "table": table,
+        "groupBy": group_by,
+        "idColumn": id_column,
+        "ids": ids,
+        "sortByColumn": sort_by_column,
+        "sortByDirection": sort_by_direction,
+        "palmprintOnly": palmprint_only,
+        "pageStart": page_start,
+        "pageEnd": page_end,
+    }
+
+
+def results_payload(
+    table: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool,
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> dict:
+    return {
+        "table": table,
+        "idColumn": id_column,
+        "ids": ids,
+        "palmprintOnly": palmprint_only,
+        "sortByColumn": sort_by_column,
+        "sortByDirection": sort_by_direction,
+        "pageStart": page_start,
+        "pageEnd": page_end,
+    }
+
+
+def _mwas_payload(
+    id_column: str,
+    ids: list[str],
+    virus_families: list[str] | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> dict:
+    return {
+        "idColumn": id_column,
+        "ids": ids,
+        "virusFamilies": virus_families,
+        "pageStart": page_start,
+        "pageEnd": page_end,
     }
-    logging.info("Posting to OpenVirome API at %s with data: %s", url, data)
-    response = requests.post(url, headers=headers, json=data, timeout=300)
-    response.raise_for_status()
-    # check if the response is valid JSON, otherwise base64 decode it first
+
+
+def chunk_ids(ids: list[str], chunk_size: int | None = None) -> list[list[str]]:
+    """Split ids into de-duplicated chunks of at most `chunk_size` ids."""
+    chunk_size = chunk_size or ID_CHUNK_SIZE
+    unique_ids = list(dict.fromkeys(ids))
+    return [
+        unique_ids[i : i + chunk_size] for i in range(0, len(unique_ids), chunk_size)
+    ]
+
+
+def _run_chunks(fetch, chunks: list[list[str]]) -> list:
+    with ThreadPoolExecutor(
+        max_workers=min(ID_CHUNK_CONCURRENCY, len(chunks))
+    ) as executor:
+        return list(executor.map(fetch, chunks))
+
+
+async def _run_chunks_async(fetch, chunks: list[list[str]]) -> list:
+    semaphore = asyncio.Semaphore(ID_CHUNK_CONCURRENCY)
+
+    async def run(chunk: list[str]):
+        async with semaphore:
+            return await fetch(chunk)
+
+    return await asyncio.gather(*(run(chunk) for chunk in chunks))
+
+
+def _to_number(value: object) -> int | float:
+    if isinstance(value, (int, float)):
+        return value
     try:
-        return response.json()
-    except ValueError:
-        try:
-            decoded_data = base64.b64decode(response.text)
-            decoded_data = decoded_data.decode("utf-8")
-            return json.loads(decoded_data)
-        except Exception as e:
-            logging.error("Failed to decode response: %s", e)
-            raise ValueError("Response is not valid JSON and cannot be decoded") from e
+        return int(value)
+    except (TypeError, ValueError):
+        return float(value or 0)
+
+
+def _sort_and_paginate(
+    rows: list[dict],
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> list[dict]:
+    if sort_by_column:
+        present = [row for row in rows if row.get(sort_by_column) is not None]
+        missing = [row for row in rows if row.get(sort_by_column) is None]
+        present.sort(
+            key=lambda row: row[sort_by_column],
+            reverse=(sort_by_direction or "").lower() == "desc",
+        )
+        rows = present + missing
+    return rows[page_start or 0 : page_end]
+
+
+def _merge_count_chunks(
+    chunks: list[object],
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> list[dict]:
+    """Sum per-`name` counts across chunk responses, then re-sort and re-paginate."""
+    merged: dict[object, dict] = {}
+    for response in chunks:
+        for row in chunk_rows(response):
+            name = row.get("name")
+            if name in merged:
+                merged[name]["count"] += _to_number(row.get("count"))
+            else:
+                merged[name] = {**row, "count": _to_number(row.get("count"))}
+    return _sort_and_paginate(
+        list(merged.values()), sort_by_column, sort_by_direction, page_start, page_end
+    )
+
+
+def _merge_result_chunks(
+    chunks: list[object],
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> list[dict]:
+    """Concatenate result chunk responses, then re-sort and re-paginate."""
+    rows = [row for response in chunks for row in chunk_rows(response)]
+    if not sort_by_column and page_start is None and page_end is None:
+        return rows
+    return _sort_and_paginate(
+        rows, sort_by_column, sort_by_direction, page_start, page_end
+    )
+
+
+def _filter_key(metadata_filter: MetadataFilter) -> tuple[str, str, str]:
+    return (
+        str(metadata_filter.get("filterType")),
+        str(metadata_filter.get("filterValue")),
+        str(metadata_filter.get("groupByKey")),
+    )
+
+
+def _filter_batches(filters: list[MetadataFilter]) -> list[list[MetadataFilter]]:
+    """
+    Split filters into content-defined batches, or return them as one batch if they
+    are few or of several types (which the API may combine rather than union).
+    """
+    unique = {_filter_key(f): f for f in filters}
+    if len(unique) <= FILTER_BATCH_SIZE or len({key[0] for key in unique}) > 1:
+        return [filters]
+    batches = []
+    batch: list[MetadataFilter] = []
+    for key in sorted(unique):
+        batch.append(unique[key])
+        boundary = zlib.crc32("\0".join(key).encode("utf-8")) % FILTER_BATCH_SIZE == 0
+        full = len(batch) >= FILTER_BATCH_MAX
+        if full or (boundary and len(batch) >= FILTER_BATCH_MIN):
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _merge_identifier_batches(batches: list[object]) -> SRAIdentifiers:
+    """
+    Merge /identifiers responses by taking the union of each level's `single` ids
+    (in first-seen order) and recounting `totalCount`.
+    """
+    merged: dict[str, dict] = {}
+    singles: dict[str, dict[str, None]] = {}
+    for response in batches:
+        if not isinstance(response, dict):
+            if response:
+                logging.warning(
+                    "Ignoring unexpected batch response: %s", type(response)
+                )
+            continue
+        for level, identifiers in response.items():
+            if not isinstance(identifiers, dict) or "single" not in identifiers:
+                merged.setdefault(level, identifiers)
+                continue
+            ids = dict.fromkeys(identifiers["single"] or [])
+            if level not in singles:
+                merged[level] = identifiers
+                singles[level] = ids
+            else:
+                singles[level].update(ids)
+    for level, ids in singles.items():
+        merged[level] = {
+            **merged[level],
+            "totalCount": len(ids),
+            "single": list(ids),
+        }
+    return merged
 
 
 def get_sra_identifiers_by_filters(
     filters: list[MetadataFilter],
     palmprint_only: bool = True,
+    use_cache: bool = True,
 ) -> SRAIdentifiers:
     """
     Fetch SRA identifiers based on metadata filters.
+    Many filters of one type are split into batches of about FILTER_BATCH_SIZE that
+    are resolved concurrently and merged by set union per level. Batches are cached
+    individually, so filters resolved by an earlier call are not requested again.
     Args:
         filters: List of metadata filters to apply.
         palmprint_only: Whether to filter for runs that contain palmprint data.
+        use_cache: Whether to use the API response cache.
     Returns:
         A dictionary containing SRA identifiers grouped by biosample, bioproject, and run.
     """
     if not filters:
         return {}
+    batches = _filter_batches(filters)
+    if len(batches) == 1:
+        data = _identifiers_payload(batches[0], palmprint_only)
+        return post_to_openvirome_api("/identifiers", data, use_cache=use_cache)
 
-    data = {
-        "filters": filters,
-        "palmprintOnly": palmprint_only,
-    }
-    response = post_to_openvirome_api("/identifiers", data)
-    return response
+    def fetch(batch: list[MetadataFilter]) -> object:
+        data = _identifiers_payload(batch, palmprint_only)
+        return post_to_openvirome_api("/identifiers", data, use_cache=use_cache)
+
+    return _merge_identifier_batches(_run_chunks(fetch, batches))
+
+
+async def get_sra_identifiers_by_filters_async(
+    filters: list[MetadataFilter],
+    palmprint_only: bool = True,
+    use_cache: bool = True,
+) -> SRAIdentifiers:
+    """
+    Async version of `get_sra_identifiers_by_filters`.
+    """
+    if not filters:
+        return {}
+    batches = _filter_batches(filters)
+    if len(batches) == 1:
+        data = _identifiers_payload(batches[0], palmprint_only)
+        return await post_to_openvirome_api_async(
+            "/identifiers", data, use_cache=use_cache
+        )
+
+    async def fetch(batch: list[MetadataFilter]) -> object:
+        data = _identifiers_payload(batch, palmprint_only)
+        return await post_to_openvirome_api_async(
+            "/identifiers", data, use_cache=use_cache
+        )
+
+    return _merge_identifier_batches(await _run_chunks_async(fetch, batches))
 
 
 def get_counts_by_identifiers(
@@ -85,9 +318,12 @@ def get_counts_by_identifiers(
     sort_by_direction: str | None = None,
     page_start: int | None = None,
     page_end: int | None = None,
+    use_cache: bool = True,
 ) -> dict[str, object]:
     """
         Fetch metadata counts from the OpenVirome API based on SRA ids.
+        Id lists longer than ID_CHUNK_SIZE are split into concurrent requests whose
+        counts are summed per name before sorting and pagination are applied.
     Args:
         table: The metadata table to query.
         group_by: The column to group counts by.
@@ -98,25 +334,263 @@ def get_counts_by_identifiers(
         sort_by_direction: Direction to sort the results (asc or desc).
         page_start: Start index for pagination.
         page_end: End index for pagination.
+        use_cache: Whether to use the API response cache.
     Returns:
         A dictionary containing metadata counts.
     """
     if not ids:
         return {}
+    if len(ids) <= ID_CHUNK_SIZE:
+        data = _counts_payload(
+            table,
+            group_by,
+            id_column,
+            ids,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            page_start,
+            page_end,
+        )
+        return post_to_openvirome_api("/counts", data, use_cache=use_cache)
 
-    data = {
-        "table": table,
-        "groupBy": group_by,
-        "idColumn": id_column,
-        "ids": ids,
-        "sortByColumn": sort_by_column,
-        "sortByDirection": sort_by_direction,
-        "palmprintOnly": palmprint_only,
-        "pageStart": page_start,
-        "pageEnd": page_end,
-    }
-    response = post_to_openvirome_api("/counts", data)
-    return response
+    # Counts are only additive over complete histograms, so chunks are unpaginated
+    def fetch(chunk: list[str]) -> object:
+        data = _counts_payload(
+            table, group_by, id_column, chunk, palmprint_only, None, None, None, None
+        )
+        return post_to_openvirome_api("/counts", data, use_cache=use_cache)
+
+    chunks = _run_chunks(fetch, chunk_ids(ids))
+    return _merge_count_chunks(
+        chunks, sort_by_column, sort_by_direction, page_start, page_end
+    )
+
+
+async def get_counts_by_identifiers_async(
+    table: str,
+    group_by: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool = True,
+    sort_by_column: str | None = None,
+    sort_by_direction: str | None = None,
+    page_start: int | None = None,
+    page_end: int | None = None,
+    use_cache: bool = True,
+) -> dict[str, object]:
+    """
+    Async version of `get_counts_by_identifiers`.
+    """
+    if not ids:
+        return {}
+    if len(ids) <= ID_CHUNK_SIZE:
+        data = _counts_payload(
+            table,
+            group_by,
+            id_column,
+            ids,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            page_start,
+            page_end,
+        )
+        return await post_to_openvirome_api_async("/counts", data, use_cache=use_cache)
+
+    async def fetch(chunk: list[str]) -> object:
+        data = _counts_payload(
+            table, group_by, id_column, chunk, palmprint_only, None, None, None, None
+        )
+        return await post_to_openvirome_api_async("/counts", data, use_cache=use_cache)
+
+    chunks = await _run_chunks_async(fetch, chunk_ids(ids))
+    return _merge_count_chunks(
+        chunks, sort_by_column, sort_by_direction, page_start, page_end
+    )
+
+
+# A count facet: (table, group_by, id_column)
+Facet = tuple[str, str, str]
+
+
+def _plan_facet_requests(
+    facets: list[Facet],
+    ids_by_column: dict[str, list[str]],
+    palmprint_only: bool,
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> list[tuple[Facet, bool, dict]]:
+    """
+    Build the /counts payloads for every facet and id chunk.
+    Each id list is chunked and JSON-encoded once and shared by all facets using it.
+    Returns:
+        (facet, chunked, payload) tuples; chunked facets are fetched unpaginated.
+    """
+    encoded = _encode_id_chunks(facets, ids_by_column)
+    paging = (sort_by_column, sort_by_direction, page_start, page_end)
+    plan = []
+    for facet in facets:
+        chunks = encoded[facet[2]]
+        chunked = len(chunks) > 1
+        for chunk in chunks:
+            # Chunked facets are fetched unpaginated, then merged and paginated here
+            data = _counts_payload(
+                *facet,
+                chunk,
+                palmprint_only,
+                *((None,) * len(paging) if chunked else paging),
+            )
+            plan.append((facet, chunked, data))
+    return plan
+
+
+def _encode_id_chunks(
+    facets: list[Facet], ids_by_column: dict[str, list[str]]
+) -> dict[str, list[EncodedIds]]:
+    """Chunk and encode the id list of each id column the facets use, once."""
+    encoded: dict[str, list[EncodedIds]] = {}
+    for _, _, id_column in facets:
+        if id_column not in encoded:
+            ids = ids_by_column.get(id_column) or []
+            chunks = [ids] if len(ids) <= ID_CHUNK_SIZE else chunk_ids(ids)
+            encoded[id_column] = [EncodedIds(chunk) for chunk in chunks if chunk]
+    return encoded
+
+
+def _collect_facet_counts(
+    facets: list[Facet],
+    plan: list[tuple[Facet, bool, dict]],
+    responses: list[object],
+    sort_by_column: str | None,
+    sort_by_direction: str | None,
+    page_start: int | None,
+    page_end: int | None,
+) -> dict[Facet, object]:
+    grouped: dict[Facet, list[object]] = {facet: [] for facet in facets}
+    chunked_facets = set()
+    for (facet, chunked, _), response in zip(plan, responses):
+        grouped[facet].append(response)
+        if chunked:
+            chunked_facets.add(facet)
+
+    results = {}
+    for facet, facet_responses in grouped.items():
+        if not facet_responses:
+            results[facet] = {}
+        elif facet in chunked_facets:
+            results[facet] = _merge_count_chunks(
+                facet_responses,
+                sort_by_column,
+                sort_by_direction,
+                page_start,
+                page_end,
+            )
+        else:
+            results[facet] = facet_responses[0]
+    return results
+
+
+def get_facet_counts_by_identifiers(
+    facets: list[Facet],
+    ids_by_column: dict[str, list[str]],
+    palmprint_only: bool = True,
+    sort_by_column: str | None = None,
+    sort_by_direction: str | None = None,
+    page_start: int | None = None,
+    page_end: int | None = None,
+    use_cache: bool = True,
+) -> dict[Facet, object]:
+    """
+    Fetch several metadata count histograms for the same SRA ids in one batch.
+    Each id list is serialized and hashed once and shared by every facet that uses it.
+    Args:
+        facets: List of (table, group_by, id_column) facets to count.
+        ids_by_column: SRA identifiers keyed by id column (e.g. "run", "biosample").
+        palmprint_only: Whether to filter for runs that contain palmprint data.
+        sort_by_column: Column to sort each histogram by.
+        sort_by_direction: Direction to sort each histogram (asc or desc).
+        page_start: Start index for pagination.
+        page_end: End index for pagination.
+        use_cache: Whether to use the API response cache.
+    Returns:
+        A dictionary mapping each facet to its metadata counts.
+    """
+    plan = _plan_facet_requests(
+        facets,
+        ids_by_column,
+        palmprint_only,
+        sort_by_column,
+        sort_by_direction,
+        page_start,
+        page_end,
+    )
+    responses = []
+    if plan:
+        with ThreadPoolExecutor(
+            max_workers=min(FACET_CONCURRENCY, len(plan))
+        ) as executor:
+            responses = list(
+                executor.map(
+                    lambda item: post_to_openvirome_api(
+                        "/counts", item[2], use_cache=use_cache
+                    ),
+                    plan,
+                )
+            )
+    return _collect_facet_counts(
+        facets,
+        plan,
+        responses,
+        sort_by_column,
+        sort_by_direction,
+        page_start,
+        page_end,
+    )
+
+
+async def get_facet_counts_by_identifiers_async(
+    facets: list[Facet],
+    ids_by_column: dict[str, list[str]],
+    palmprint_only: bool = True,
+    sort_by_column: str | None = None,
+    sort_by_direction: str | None = None,
+    page_start: int | None = None,
+    page_end: int | None = None,
+    use_cache: bool = True,
+) -> dict[Facet, object]:
+    """
+    Async version of `get_facet_counts_by_identifiers`.
+    """
+    plan = _plan_facet_requests(
+        facets,
+        ids_by_column,
+        palmprint_only,
+        sort_by_column,
+        sort_by_direction,
+        page_start,
+        page_end,
+    )
+    semaphore = asyncio.Semaphore(FACET_CONCURRENCY)
+
+    async def fetch(data: dict) -> object:
+        async with semaphore:
+            return await post_to_openvirome_api_async(
+                "/counts", data, use_cache=use_cache
+            )
+
+    responses = await asyncio.gather(*(fetch(data) for _, _, data in plan))
+    return _collect_facet_counts(
+        facets,
+        plan,
+        responses,
+        sort_by_column,
+        sort_by_direction,
+        page_start,
+        page_end,
+    )
 
 
 def get_results_by_identifiers(
@@ -128,9 +602,12 @@ def get_results_by_identifiers(
     sort_by_direction: str | None = None,
     page_start: int | None = None,
     page_end: int | None = None,
+    use_cache: bool = True,
 ) -> dict[str, object]:
     """
     Fetch results from the OpenVirome API based on SRA accessions.
+    Id lists longer than ID_CHUNK_SIZE are split into concurrent requests whose rows
+    are concatenated before sorting and pagination are applied.
     Args:
         table: The results table to query.
         id_column: The SRA identifier column that joints to the results table.
@@ -140,23 +617,95 @@ def get_results_by_identifiers(
         sort_by_direction: Direction to sort the results (asc or desc).
         page_start: Start index for pagination.
         page_end: End index for pagination.
+        use_cache: Whether to use the API response cache.
     Returns:
         A dictionary containing results.
     """
     if not ids:
         return {}
-    data = {
-        "table": table,
-        "idColumn": id_column,
-        "ids": ids,
-        "palmprintOnly": palmprint_only,
-        "sortByColumn": sort_by_column,
-        "sortByDirection": sort_by_direction,
-        "pageStart": page_start,
-        "pageEnd": page_end,
-    }
-    response = post_to_openvirome_api("/results", data)
-    return response
+    if len(ids) <= ID_CHUNK_SIZE:
+        data = results_payload(
+            table,
+            id_column,
+            ids,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            page_start,
+            page_end,
+        )
+        return post_to_openvirome_api("/results", data, use_cache=use_cache)
+
+    # The first `page_end` rows overall are among the first `page_end` of each chunk
+    chunk_page_start = 0 if page_start is not None or page_end is not None else None
+
+    def fetch(chunk: list[str]) -> object:
+        data = results_payload(
+            table,
+            id_column,
+            chunk,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            chunk_page_start,
+            page_end,
+        )
+        return post_to_openvirome_api("/results", data, use_cache=use_cache)
+
+    chunks = _run_chunks(fetch, chunk_ids(ids))
+    return _merge_result_chunks(
+        chunks, sort_by_column, sort_by_direction, page_start, page_end
+    )
+
+
+async def get_results_by_identifiers_async(
+    table: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool = True,
+    sort_by_column: str | None = None,
+    sort_by_direction: str | None = None,
+    page_start: int | None = None,
+    page_end: int | None = None,
+    use_cache: bool = True,
+) -> dict[str, object]:
+    """
+    Async version of `get_results_by_identifiers`.
+    """
+    if not ids:
+        return {}
+    if len(ids) <= ID_CHUNK_SIZE:
+        data = results_payload(
+            table,
+            id_column,
+            ids,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            page_start,
+            page_end,
+        )
+        return await post_to_openvirome_api_async("/results", data, use_cache=use_cache)
+
+    chunk_page_start = 0 if page_start is not None or page_end is not None else None
+
+    async def fetch(chunk: list[str]) -> object:
+        data = results_payload(
+            table,
+            id_column,
+            chunk,
+            palmprint_only,
+            sort_by_column,
+            sort_by_direction,
+            chunk_page_start,
+            page_end,
+        )
+        return await post_to_openvirome_api_async("/results", data, use_cache=use_cache)
+
+    chunks = await _run_chunks_async(fetch, chunk_ids(ids))
+    return _merge_result_chunks(
+        chunks, sort_by_column, sort_by_direction, page_start, page_end
+    )
 
 
 def get_mwas_results_by_identifiers(
@@ -165,6 +714,7 @@ def get_mwas_results_by_identifiers(
     virus_families: list[str] | None = None,
     page_start: int | None = None,
     page_end: int | None = None,
+    use_cache: bool = True,
 ) -> dict[str, object]:
     """
     Fetch MWAS results from the OpenVirome API based on SRA accessions.
@@ -174,116 +724,28 @@ def get_mwas_results_by_identifiers(
         virus_families: Optional list of virus families to filter results by.
         page_start: Start index for pagination.
         page_end: End index for pagination.
+        use_cache: Whether to use the API response cache.
     Returns:
         A dictionary containing MWAS results.
     """
     if not ids:
         return {}
-    data = {
-        "idColumn": id_column,
-        "ids": ids,
-        "virusFamilies": virus_families,
-        "pageStart": page_start,
-        "pageEnd": page_end,
-    }
-    response = post_to_openvirome_api("/mwas", data)
-    return response
-
-
-### Serratus database interaction functions
-
-
-def get_palm_ids_by_species(
-    species: str, percent_identity: float = 90
-) -> dict[str, object]:
-    """
-    Fetch palm_ids from the Serratus database based on a virus species name.
-    Args:
-        species: The species of the virus to search for.
-    Returns:
-        A dictionary containing the palm_ids and their associated tax_ids and percent_identity.
-    """
-    query = """
-    SELECT palm_id, tax_species, gb_pid FROM
-    palm_virome
-    WHERE
-        node_qc = 'true'
-        AND tax_species LIKE %s
-        AND gb_pid >= %s
-    """
-    species = f"%{species}%"
-    rows = run_sql_query(query, params=(species, percent_identity))
-    if len(rows) <= 1:
-        return {"data": []}
-
-    return {"data": rows}
-
-
-# Can delete if unused, neo4j version is much faster
-def get_similar_palm_ids_sql(
-    palm_ids: list[str], percent_identity: float = 90
-) -> dict[str, object]:
-    """
-    Fetch similar viruses based on palm_ids and percent_identity.
-    Args:
-        palm_ids: List of palm_ids to search for.
-        percent_identity: Minimum percent identity for similarity.
-    Returns:
-        A dictionary containing similar viruses.
-    """
-    if not palm_ids:
-        return {"data": []}
-    query = """
-    SELECT palm_id1, palm_id2, pident FROM public.palm_graph
-    WHERE pident >= %s AND palm_id1 IN %s
-    """
-    rows = run_sql_query(
-        query,
-        params=(tuple(palm_ids), percent_identity),
-    )
-    if not rows:
-        return {"data": []}
-    return {"data": rows}
-
+    data = _mwas_payload(id_column, ids, virus_families, page_start, page_end)
+    return post_to_openvirome_api("/mwas", data, use_cache=use_cache)
 
-### Neo4j graph database interaction functions
 
-
-def get_similar_palm_ids_neo4j(
-    palm_ids: list[str], percent_identity: float = 90
+async def get_mwas_results_by_identifiers_async(
+    id_column: str,
+    ids: list[str],
+    virus_families: list[str] | None = None,
+    page_start: int | None = None,
+    page_end: int | None = None,
+    use_cache: bool = True,
 ) -> dict[str, object]:
     """
-    Fetch similar viruses based on palm_ids and percent_identity using a graph query.
-    Args:
-        palm_ids: List of palm_ids to search for.
-        percent_identity: Minimum percent identity for similarity.
-    Returns:
-        A dictionary containing similar viruses.
+    Async version of `get_mwas_results_by_identifiers`.
     """
-    if not palm_ids:
-        return {"data": []}
-    percent_identity_normalized = percent_identity / 100.0
-    columns = ["palm_id1", "palm_id2", "pident"]
-    query = """
-    MATCH (n:Palmprint)-[r:SEQUENCE_ALIGNMENT]-(m:Palmprint)
-    WHERE r.percentIdentity >= $percent_identity AND n.palmId IN $palm_ids
-    RETURN n.palmId AS palm_id1, m.palmId AS palm_id2, r.percentIdentity AS pident
-    """
-    params = {
-        "palm_ids": palm_ids,
-        "percent_identity": percent_identity_normalized,
-    }
-
-    rows = run_neo4j_query(query, params=params)
-    if not rows:
-        return {"data": []}
-
-    # Modify data so it's consistent with the equivalent SQL query
-    # Convert pident to int between 0 and 100
-    clean_rows = [list(row.values()) for row in rows]
-    for row in clean_rows:
-        row[2] = int(row[2] * 100)
-    # Prepend column names to the rows list
-    clean_rows.insert(0, columns)
-
-    return {"data": clean_rows}
+    if not ids:
+        return {}
+    data = _mwas_payload(id_column, ids, virus_families, page_start, page_end)
+    return await post_to_openvirome_api_async("/mwas", data, use_cache=use_cache)
@@ -0,0 +1,781 @@
+import logging
+import threading
+import time
+from typing import AsyncIterator, Iterator
+import base64
+import hashlib
+import json
+import os
+
+import httpx
+
+from src.tools.cache import SingleFlight, TTLCache, canonical_hash
+from src.tools.json_stream import ResponseDecoder, loads
+from src.tools.metrics import track
+from src.tools.request_encoding import (
+    available_codings,
+    compress_body,
+    encode_accessions,
+)
+from src.tools.http_clients import SharedHTTPClients
+from src.tools.upstream import UpstreamRoute, UpstreamUnavailableError
+
+### OpenVirome API interaction functions
+
+OPENVIROME_API_URL = "https://zrdbegawce.execute-api.us-east-1.amazonaws.com/prod"
+VALID_ROUTES = [
+    "/identifiers",
+    "/counts",
+    "/results",
+    "/mwas",
+]
+REQUEST_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate, br, zstd",
+    "Referer": "https://mcp.openvirome.com/",
+    "Origin": "https://mcp.openvirome.com",
+}
+REQUEST_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+POOL_LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=16,
+    keepalive_expiry=120.0,
+)
+
+# Response cache, keyed by route and a canonical hash of the payload.
+# Lists under these keys are order-insensitive, so reordered ids/filters still hit.
+CACHE_TTLS = {
+    "/identifiers": 3600.0,
+    "/counts": 3600.0,
+    "/results": 1800.0,
+    "/mwas": 3600.0,
+}
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_UNORDERED_KEYS = frozenset({"ids", "filters", "virusFamilies"})
+# Opt-in request body encodings for large payloads. Each is only used on a route
+# after a capability probe shows the route accepts it; otherwise requests are sent as
+# plain JSON. Override with OPENVIROME_REQUEST_COMPRESSION ("gzip", "zstd" or "" for
+# none) and OPENVIROME_COMPACT_IDS ("1" to send id lists as accession ranges).
+REQUEST_COMPRESSION = ""
+COMPACT_IDS = False
+# Smaller bodies and id lists are sent as they are
+COMPRESSION_MIN_BYTES = 16 * 1024
+COMPACT_IDS_MIN_COUNT = 1000
+# Items kept from the request's id or filter list in a capability probe, and how
+# long a probe result is trusted
+PROBE_ITEMS = 50
+CAPABILITY_TTL_SECONDS = 3600.0
+# Responses meaning the API couldn't read an encoded body; the request is resent as
+# plain JSON and the encoding is no longer used on the route
+ENCODING_REJECTED_STATUSES = frozenset({400, 415, 422})
+COMPACT_IDS_FEATURE = "compact_ids"
+
+# Streamed responses are only cached when their decoded body is at most this large,
+# so streaming a huge response never buffers it whole
+STREAM_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Per-route overrides of upstream.DEFAULT_POLICY (concurrency limits, timeouts,
+# retries and circuit breaking). Every route is a read, so all are retried.
+# OPENVIROME_ROUTE_POLICIES can hold a JSON object of further overrides per route.
+ROUTE_POLICIES = {
+    "/identifiers": {"timeout_seconds": 120.0},
+    "/counts": {"initial_concurrency": 16, "timeout_seconds": 60.0},
+    "/results": {"timeout_seconds": 180.0, "latency_target_seconds": 60.0},
+    "/mwas": {"initial_concurrency": 4, "timeout_seconds": 180.0},
+}
+
+_response_cache = TTLCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES)
+# Identical requests already in flight share one response; each waiter decodes its
+# own copy of the body
+_in_flight = SingleFlight("openvirome", copy=lambda pair: (loads(pair[1]), pair[1]))
+# (route, encoding) -> (whether the route accepts it, monotonic time it was learned)
+_capabilities: dict[tuple[str, str], tuple[bool, float]] = {}
+_probe_flight = SingleFlight("openvirome_probe")
+_upstream_routes: dict[str, UpstreamRoute] = {}
+_upstream_routes_lock = threading.Lock()
+_clients = SharedHTTPClients(
+    lambda: httpx.Client(
+        base_url=OPENVIROME_API_URL,
+        headers=REQUEST_HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        limits=POOL_LIMITS,
+    ),
+    lambda: httpx.AsyncClient(
+        base_url=OPENVIROME_API_URL,
+        headers=REQUEST_HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        limits=POOL_LIMITS,
+    ),
+)
+
+
+def get_openvirome_client() -> httpx.Client:
+    """
+    Return the process-wide sync HTTP client for the OpenVirome API.
+    Connections are kept alive between calls so repeated requests reuse TLS sessions.
+    """
+    return _clients.get_sync()
+
+
+def get_openvirome_async_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide async HTTP client for the OpenVirome API.
+    The client is bound to the running event loop and is recreated if the loop changes;
+    the replaced client is closed on its own loop.
+    """
+    return _clients.get_async()
+
+
+async def close_openvirome_clients() -> None:
+    """Close the shared OpenVirome HTTP clients and release pooled connections."""
+    await _clients.aclose()
+
+
+def _route_policy(route: str) -> dict:
+    policy = dict(ROUTE_POLICIES.get(route, {}))
+    overrides = os.environ.get("OPENVIROME_ROUTE_POLICIES")
+    if overrides:
+        try:
+            policy.update(json.loads(overrides).get(route, {}))
+        except (ValueError, AttributeError) as e:
+            logging.warning("Ignoring invalid OPENVIROME_ROUTE_POLICIES: %s", e)
+    return policy
+
+
+def get_upstream_route(route: str) -> UpstreamRoute:
+    """
+    Return the concurrency limiter, retry policy and circuit breaker of an API route.
+
+    Optional environment variables:
+        - OPENVIROME_ROUTE_POLICIES: JSON object mapping routes to policy overrides,
+          e.g. {"/mwas": {"max_concurrency": 8, "timeout_seconds": 300}}
+
+    Args:
+        route: The API route.
+    Returns:
+        The route's UpstreamRoute, created from its policy on first use.
+    """
+    upstream = _upstream_routes.get(route)
+    if upstream is None:
+        with _upstream_routes_lock:
+            upstream = _upstream_routes.get(route)
+            if upstream is None:
+                upstream = _upstream_routes[route] = UpstreamRoute(
+                    f"OpenVirome {route}", _route_policy(route)
+                )
+    return upstream
+
+
+def configure_route_policy(route: str, **settings: object) -> UpstreamRoute:
+    """
+    Override policy settings of an API route, replacing its limiter and breaker.
+    Args:
+        route: The API route.
+        **settings: upstream.DEFAULT_POLICY keys to override.
+    Returns:
+        The route's new UpstreamRoute.
+    """
+    _validate_route(route)
+    with _upstream_routes_lock:
+        ROUTE_POLICIES[route] = {**ROUTE_POLICIES.get(route, {}), **settings}
+        _upstream_routes.pop(route, None)
+    return get_upstream_route(route)
+
+
+def get_upstream_stats() -> list[dict[str, object]]:
+    """Return concurrency, retry and circuit breaker statistics per API route."""
+    return [get_upstream_route(route).stats() for route in VALID_ROUTES]
+
+
+def _validate_route(route: str) -> None:
+    if route not in VALID_ROUTES:
+        raise ValueError(f"Invalid route: {route}. Valid routes are: {VALID_ROUTES}")
+
+
+def _ids_digest(ids: list[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(map(str, ids))).encode("utf-8")).hexdigest()
+
+
+class EncodedIds:
+    """
+    An id list serialized to JSON once, so it can be shared by several request payloads
+    without re-encoding or re-hashing it for every request.
+    """
+
+    def __init__(self, ids: list[str]) -> None:
+        self.ids = ids
+        self.json = json.dumps(ids)
+        self.digest = _ids_digest(ids)
+        self._compact: dict | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def compact(self) -> dict:
+        """Return the ids encoded as accession ranges, computed once."""
+        if self._compact is None:
+            self._compact = encode_accessions(self.ids)
+        return self._compact
+
+
+def _cache_key(route: str, data: dict) -> tuple[str, str]:
+    ids = data.get("ids")
+    if ids is not None:
+        digest = ids.digest if isinstance(ids, EncodedIds) else _ids_digest(ids)
+        data = {**data, "ids": digest}
+    return (route, canonical_hash(data, CACHE_UNORDERED_KEYS))
+
+
+def encode_payload(data: dict) -> bytes:
+    """
+    Encode a request payload as JSON, splicing in the pre-encoded JSON of EncodedIds.
+    """
+    ids = data.get("ids")
+    if not isinstance(ids, EncodedIds):
+        return json.dumps(data).encode("utf-8")
+    rest = json.dumps({k: v for k, v in data.items() if k != "ids"})
+    separator = ", " if rest != "{}" else ""
+    return f'{{"ids": {ids.json}{separator}{rest[1:]}'.encode("utf-8")
+
+
+def _describe_payload(data: dict) -> dict:
+    """Summarize long lists in a payload so logging does not serialize them."""
+    return {
+        k: (
+            f"<{len(v)} items>"
+            if isinstance(v, (list, EncodedIds)) and len(v) > 10
+            else v
+        )
+        for k, v in data.items()
+    }
+
+
+def _requested_encodings() -> tuple[str | None, bool]:
+    coding = os.environ.get("OPENVIROME_REQUEST_COMPRESSION", REQUEST_COMPRESSION)
+    if coding and coding not in available_codings():
+        logging.warning("Request compression %s is unavailable; ignoring it", coding)
+        coding = ""
+    compact = os.environ.get("OPENVIROME_COMPACT_IDS", "1" if COMPACT_IDS else "")
+    return coding or None, compact.lower() not in ("", "0", "false", "no")
+
+
+def _capability(route: str, feature: str) -> bool | None:
+    entry = _capabilities.get((route, feature))
+    if entry is None or time.monotonic() - entry[1] > CAPABILITY_TTL_SECONDS:
+        return None
+    return entry[0]
+
+
+def _set_capability(route: str, feature: str, supported: bool) -> None:
+    if _capability(route, feature) != supported:
+        logging.info(
+            "OpenVirome %s %s %s request encoding",
+            route,
+            "accepts" if supported else "doesn't accept",
+            feature,
+        )
+    _capabilities[(route, feature)] = (supported, time.monotonic())
+
+
+def get_request_encoding_capabilities() -> list[dict[str, object]]:
+    """
+    Return the request encodings currently known to be supported or not, as
+    `{"route": ..., "encoding": ..., "supported": ...}` records.
+    """
+    capabilities = []
+    for route, feature in sorted(_capabilities):
+        supported = _capability(route, feature)
+        if supported is not None:
+            capabilities.append(
+                {"route": route, "encoding": feature, "supported": supported}
+            )
+    return capabilities
+
+
+def _note_advertised_codings(route: str, response: httpx.Response) -> None:
+    # A server can list the request content codings it accepts in an Accept-Encoding
+    # response header (RFC 7694), which settles them without a probe
+    advertised = response.headers.get("Accept-Encoding")
+    if advertised is None:
+        return
+    codings = {part.split(";")[0].strip().lower() for part in advertised.split(",")}
+    for coding in available_codings():
+        _set_capability(route, coding, coding in codings)
+
+
+def encode_request(
+    data: dict,
+    coding: str | None,
+    compact: bool,
+    min_bytes: int = COMPRESSION_MIN_BYTES,
+    min_ids: int = COMPACT_IDS_MIN_COUNT,
+) -> tuple[bytes, dict[str, str], list[str]]:
+    """
+    Encode a request body, compacting and compressing it if it is large enough.
+    Returns:
+        The body, the extra request headers and the encodings applied.
+    """
+    applied = []
+    ids = data.get("ids")
+    if compact and ids is not None and len(ids) >= min_ids:
+        compact_ids = (
+            ids.compact() if isinstance(ids, EncodedIds) else encode_accessions(ids)
+        )
+        data = {**data, "ids": compact_ids}
+        applied.append(COMPACT_IDS_FEATURE)
+    content = encode_payload(data)
+    headers = {}
+    if coding is not None and len(content) >= min_bytes:
+        content = compress_body(content, coding)
+        headers["Content-Encoding"] = coding
+        applied.append(coding)
+    return content, headers, applied
+
+
+def _wanted_encodings(data: dict) -> list[str]:
+    # Opted-in encodings that would apply to this payload
+    coding, compact = _requested_encodings()
+    wanted = []
+    ids = data.get("ids")
+    if compact and ids is not None and len(ids) >= COMPACT_IDS_MIN_COUNT:
+        wanted.append(COMPACT_IDS_FEATURE)
+    if coding is not None:
+        wanted.append(coding)
+    return wanted
+
+
+def _probe_payload(data: dict) -> dict:
+    # The request with its id/filter list cut down, so a probe is cheap but realistic
+    return {
+        key: (
+            (value.ids if isinstance(value, EncodedIds) else value)[:PROBE_ITEMS]
+            if key in ("ids", "filters") and value is not None
+            else value
+        )
+        for key, value in data.items()
+    }
+
+
+def _probe_bodies(data: dict, feature: str) -> tuple[dict, bytes, bytes, dict]:
+    payload = _probe_payload(data)
+    plain = encode_payload(payload)
+    coding = None if feature == COMPACT_IDS_FEATURE else feature
+    encoded, headers, _ = encode_request(
+        payload, coding, feature == COMPACT_IDS_FEATURE, min_bytes=0, min_ids=0
+    )
+    return payload, plain, encoded, headers
+
+
+def _probe_verdict(
+    route: str, feature: str, expected: object, response: httpx.Response
+) -> None:
+    # The route supports the encoding if the encoded request gets the same answer as
+    # the plain one. An empty answer doesn't show the ids were read.
+    if response.status_code in ENCODING_REJECTED_STATUSES or response.is_server_error:
+        _set_capability(route, feature, False)
+        return
+    try:
+        result, _ = decode_response(response)
+    except (httpx.HTTPError, ValueError):
+        _set_capability(route, feature, False)
+        return
+    _set_capability(
+        route,
+        feature,
+        result == expected and (feature != COMPACT_IDS_FEATURE or bool(expected)),
+    )
+
+
+def _probe(route: str, data: dict, feature: str) -> None:
+    _, plain, encoded, headers = _probe_bodies(data, feature)
+    client = get_openvirome_client()
+    upstream = get_upstream_route(route)
+    with track("backend", "openvirome", f"probe {feature}"):
+        try:
+            expected, _ = decode_response(
+                upstream.send(_post_request(client, route, plain, {}), max_retries=0)
+            )
+            response = upstream.send(
+                _post_request(client, route, encoded, headers), max_retries=0
+            )
+        except (httpx.HTTPError, UpstreamUnavailableError, ValueError) as e:
+            # Inconclusive; probe again on a later request
+            logging.warning("OpenVirome %s probe for %s failed: %s", route, feature, e)
+            return
+        _probe_verdict(route, feature, expected, response)
+
+
+async def _probe_async(route: str, data: dict, feature: str) -> None:
+    _, plain, encoded, headers = _probe_bodies(data, feature)
+    client = get_openvirome_async_client()
+    upstream = get_upstream_route(route)
+    with track("backend", "openvirome", f"probe {feature}"):
+        try:
+            expected, _ = decode_response(
+                await upstream.send_async(
+                    _post_request(client, route, plain, {}), max_retries=0
+                )
+            )
+            response = await upstream.send_async(
+                _post_request(client, route, encoded, headers), max_retries=0
+            )
+        except (httpx.HTTPError, UpstreamUnavailableError, ValueError) as e:
+            logging.warning("OpenVirome %s probe for %s failed: %s", route, feature, e)
+            return
+        _probe_verdict(route, feature, expected, response)
+
+
+def _negotiated(route: str, data: dict) -> tuple[str | None, bool]:
+    coding = None
+    compact = False
+    for feature in _wanted_encodings(data):
+        if not _capability(route, feature):
+            continue
+        if feature == COMPACT_IDS_FEATURE:
+            compact = True
+        else:
+            coding = feature
+    return coding, compact
+
+
+def _negotiate(route: str, data: dict) -> tuple[str | None, bool]:
+    """Probe the encodings this request wants and return the accepted ones."""
+    for feature in _wanted_encodings(data):
+        if _capability(route, feature) is None:
+            _probe_flight.do((route, feature), _probe, route, data, feature)
+    return _negotiated(route, data)
+
+
+async def _negotiate_async(route: str, data: dict) -> tuple[str | None, bool]:
+    for feature in _wanted_encodings(data):
+        if _capability(route, feature) is None:
+            await _probe_flight.do_async(
+                (route, feature), _probe_async, route, data, feature
+            )
+    return _negotiated(route, data)
+
+
+def _post_request(
+    client, route: str, content: bytes, headers: dict[str, str], stream: bool = False
+):
+    # Request factory for UpstreamRoute.send(_async); a streamed response is returned
+    # as soon as its headers arrive, leaving the body to be read
+    return lambda timeout: client.send(
+        client.build_request(
+            "POST", route, content=content, headers=headers, timeout=timeout
+        ),
+        stream=stream,
+    )
+
+
+def _rejected_encoding(
+    route: str, response: httpx.Response, applied: list[str]
+) -> bool:
+    if not applied or response.status_code not in ENCODING_REJECTED_STATUSES:
+        return False
+    logging.warning(
+        "OpenVirome %s rejected a %s request body (%d); resending without it",
+        route,
+        "+".join(applied),
+        response.status_code,
+    )
+    for feature in applied:
+        _set_capability(route, feature, False)
+    return True
+
+
+def _send(route: str, data: dict, stream: bool = False) -> tuple[httpx.Response, int]:
+    """
+    Send a request with the negotiated body encodings. If the API rejects them, they
+    are marked unsupported on the route and the request is resent without them.
+    Returns:
+        The response and the size of the request body sent.
+    """
+    coding, compact = _negotiate(route, data)
+    client = get_openvirome_client()
+    upstream = get_upstream_route(route)
+    content, headers, applied = encode_request(data, coding, compact)
+    response = upstream.send(_post_request(client, route, content, headers, stream))
+    while _rejected_encoding(route, response, applied):
+        # Each rejection disables the encodings it used, so this ends at plain JSON
+        response.close()
+        content, headers, applied = encode_request(data, *_negotiated(route, data))
+        response = upstream.send(_post_request(client, route, content, headers, stream))
+    _note_advertised_codings(route, response)
+    return response, len(content)
+
+
+async def _send_async(
+    route: str, data: dict, stream: bool = False
+) -> tuple[httpx.Response, int]:
+    """Async version of `_send`."""
+    coding, compact = await _negotiate_async(route, data)
+    client = get_openvirome_async_client()
+    upstream = get_upstream_route(route)
+    content, headers, applied = encode_request(data, coding, compact)
+    response = await upstream.send_async(
+        _post_request(client, route, content, headers, stream)
+    )
+    while _rejected_encoding(route, response, applied):
+        await response.aclose()
+        content, headers, applied = encode_request(data, *_negotiated(route, data))
+        response = await upstream.send_async(
+            _post_request(client, route, content, headers, stream)
+        )
+    _note_advertised_codings(route, response)
+    return response, len(content)
+
+
+def decode_response(response: httpx.Response) -> tuple[dict, bytes]:
+    """
+    Decode an API response.
+    Returns:
+        The parsed JSON and the raw JSON bytes it was parsed from.
+    """
+    response.raise_for_status()
+    body = response.content
+    # check if the response is valid JSON, otherwise base64 decode it first
+    try:
+        return loads(body), body
+    except ValueError:
+        try:
+            decoded_data = base64.b64decode(body)
+            return loads(decoded_data), decoded_data
+        except Exception as e:
+            logging.error("Failed to decode response: %s", e)
+            raise ValueError("Response is not valid JSON and cannot be decoded") from e
+
+
+def _get_cached_response(route: str, data: dict) -> tuple[tuple[str, str], dict | None]:
+    key = _cache_key(route, data)
+    body = _response_cache.get(key)
+    if body is None:
+        return key, None
+    logging.info("OpenVirome API cache hit for %s", route)
+    return key, loads(body)
+
+
+def _measure_call(call, request_bytes: int, body: bytes, result: object) -> None:
+    call.request_bytes = request_bytes
+    call.response_bytes = len(body)
+    call.rows = len(result) if isinstance(result, list) else 0
+
+
+def invalidate_openvirome_cache(
+    route: str | None = None, data: dict | None = None
+) -> int:
+    """
+    Remove cached OpenVirome API responses.
+    Args:
+        route: Only invalidate responses for this route. If None, all routes.
+        data: Only invalidate the response for this exact payload (requires route).
+    Returns:
+        The number of cache entries removed.
+    """
+    if route is not None and data is not None:
+        return _response_cache.invalidate(key=_cache_key(route, data))
+    if route is not None:
+        return _response_cache.invalidate(predicate=lambda key: key[0] == route)
+    return _response_cache.invalidate()
+
+
+def get_openvirome_cache_stats() -> dict[str, object]:
+    """Return hit/miss and size counters for the OpenVirome API response cache."""
+    return _response_cache.stats()
+
+
+def post_to_openvirome_api(route: str, data: dict, use_cache: bool = True) -> dict:
+    """
+    Post data to the OpenVirome API.
+    Args:
+        route: The API route to post to.
+        data: The data to post.
+        use_cache: Whether to serve the response from, and store it in, the cache.
+            Identical requests in flight are shared either way.
+    Returns:
+        The response from the API.
+    """
+    _validate_route(route)
+    if use_cache:
+        key, cached = _get_cached_response(route, data)
+        if cached is not None:
+            return cached
+    else:
+        key = _cache_key(route, data)
+
+    def post() -> tuple[dict, bytes]:
+        logging.info(
+            "Posting to OpenVirome API at %s with data: %s",
+            route,
+            _describe_payload(data),
+        )
+        with track("backend", "openvirome", route) as call:
+            response, request_bytes = _send(route, data)
+            result, body = decode_response(response)
+            _measure_call(call, request_bytes, body, result)
+        return result, body
+
+    result, body = _in_flight.do(key, post)
+    if use_cache:
+        _response_cache.set(key, body, ttl=CACHE_TTLS[route], size=len(body))
+    return result
+
+
+async def post_to_openvirome_api_async(
+    route: str, data: dict, use_cache: bool = True
+) -> dict:
+    """
+    Post data to the OpenVirome API without blocking the event loop.
+    Args:
+        route: The API route to post to.
+        data: The data to post.
+        use_cache: Whether to serve the response from, and store it in, the cache.
+            Identical requests in flight are shared either way.
+    Returns:
+        The response from the API.
+    """
+    _validate_route(route)
+    if use_cache:
+        key, cached = _get_cached_response(route, data)
+        if cached is not None:
+            return cached
+    else:
+        key = _cache_key(route, data)
+
+    async def post() -> tuple[dict, bytes]:
+        logging.info(
+            "Posting to OpenVirome API at %s with data: %s",
+            route,
+            _describe_payload(data),
+        )
+        with track("backend", "openvirome", route) as call:
+            response, request_bytes = await _send_async(route, data)
+            result, body = decode_response(response)
+            _measure_call(call, request_bytes, body, result)
+        return result, body
+
+    result, body = await _in_flight.do_async(key, post)
+    if use_cache:
+        _response_cache.set(key, body, ttl=CACHE_TTLS[route], size=len(body))
+    return result
+
+
+def _decode_stream_chunk(decoder: ResponseDecoder, call, chunk: bytes) -> list[dict]:
+    try:
+        rows = decoder.feed(chunk)
+    except ValueError as e:
+        logging.error("Failed to decode response: %s", e)
+        raise ValueError("Response is not valid JSON and cannot be decoded") from e
+    call.rows += len(rows)
+    return rows
+
+
+def _finish_stream(
+    decoder: ResponseDecoder, call, route: str, key: tuple[str, str] | None
+) -> list[dict]:
+    # Returns the last rows and caches the body if it was kept
+    try:
+        rows = decoder.close()
+    except ValueError as e:
+        logging.error("Failed to decode response: %s", e)
+        raise ValueError("Response is not valid JSON and cannot be decoded") from e
+    if decoder.value is not None:
+        rows = chunk_rows(decoder.value)
+    call.rows += len(rows)
+    body = decoder.body
+    if key is not None and body is not None:
+        _response_cache.set(key, body, ttl=CACHE_TTLS[route], size=len(body))
+    return rows
+
+
+def stream_from_openvirome_api(
+    route: str, data: dict, use_cache: bool = True
+) -> Iterator[dict]:
+    """
+    Post data to the OpenVirome API and yield the rows of the returned array as they
+    arrive. The body (JSON or base64-encoded JSON) is decoded incrementally, so peak
+    memory stays near one network chunk of rows rather than several copies of the
+    whole response. Unlike `post_to_openvirome_api`, identical requests in flight
+    aren't shared.
+    Args:
+        route: The API route to post to.
+        data: The data to post.
+        use_cache: Whether to serve the response from the cache, and store it there if
+            its decoded body is at most STREAM_CACHE_MAX_BYTES.
+    Yields:
+        Rows of the response array; a response that isn't an array yields none.
+    """
+    _validate_route(route)
+    key = None
+    if use_cache:
+        key, cached = _get_cached_response(route, data)
+        if cached is not None:
+            yield from chunk_rows(cached)
+            return
+
+    logging.info(
+        "Streaming from OpenVirome API at %s with data: %s",
+        route,
+        _describe_payload(data),
+    )
+    decoder = ResponseDecoder(keep_bytes=STREAM_CACHE_MAX_BYTES if use_cache else 0)
+    with track("backend", "openvirome", route) as call:
+        response, call.request_bytes = _send(route, data, stream=True)
+        try:
+            if response.is_error:
+                response.read()
+                response.raise_for_status()
+            for chunk in response.iter_bytes():
+                yield from _decode_stream_chunk(decoder, call, chunk)
+            yield from _finish_stream(decoder, call, route, key)
+        finally:
+            response.close()
+            call.response_bytes = decoder.bytes_received
+
+
+async def stream_from_openvirome_api_async(
+    route: str, data: dict, use_cache: bool = True
+) -> AsyncIterator[dict]:
+    """
+    Async version of `stream_from_openvirome_api`.
+    """
+    _validate_route(route)
+    key = None
+    if use_cache:
+        key, cached = _get_cached_response(route, data)
+        if cached is not None:
+            for row in chunk_rows(cached):
+                yield row
+            return
+
+    logging.info(
+        "Streaming from OpenVirome API at %s with data: %s",
+        route,
+        _describe_payload(data),
+    )
+    decoder = ResponseDecoder(keep_bytes=STREAM_CACHE_MAX_BYTES if use_cache else 0)
+    with track("backend", "openvirome", route) as call:
+        response, call.request_bytes = await _send_async(route, data, stream=True)
+        try:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                for row in _decode_stream_chunk(decoder, call, chunk):
+                    yield row
+            for row in _finish_stream(decoder, call, route, key):
+                yield row
+        finally:
+            await response.aclose()
+            call.response_bytes = decoder.bytes_received
+
+
+def chunk_rows(response: object) -> list[dict]:
+    """Return the rows of a list response; anything else has none."""
+    if isinstance(response, list):
+        return response
+    if response:
+        logging.warning("Ignoring unexpected chunk response: %s", type(response))
+    return []
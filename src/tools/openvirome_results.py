@@ -0,0 +1,268 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator
+
+from src.tools.openvirome import chunk_ids, results_payload
+from src.tools.openvirome_client import (
+    EncodedIds,
+    chunk_rows,
+    post_to_openvirome_api,
+    post_to_openvirome_api_async,
+    stream_from_openvirome_api,
+    stream_from_openvirome_api_async,
+)
+
+### Streaming /results
+
+# Rows per request when streaming /results
+RESULTS_PAGE_SIZE = 5000
+# Column ordering the rows of a single id, used when one id has more rows than fit in
+# a /results page and its rows are paged by offset
+RESULTS_ROW_ORDER_COLUMNS = {"palm_virome": "palm_id"}
+
+
+@dataclass
+class _Page:
+    """Rows seen so far in the /results page being read."""
+
+    count: int = 0
+    # Id of the rows being buffered; they are complete once a later id starts
+    current: object = None
+    rows: list[dict] = field(default_factory=list)
+    completed: set = field(default_factory=set)
+
+
+class _ResultsPager:
+    """
+    Pages /results by id (keyset paging) rather than by row offset, so rows with the
+    same sort key can't be repeated or skipped at page boundaries. Each request asks
+    for the ids not yet complete, sorted by `id_column`, from the first row. A page is
+    ordered by id, so every id in a full page except the last one is complete; the
+    last id's rows are dropped and requested again with the remaining ids. An id with
+    more rows than fit in a page is paged by offset on its own, ordered by
+    RESULTS_ROW_ORDER_COLUMNS.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        id_column: str,
+        ids: list[str],
+        palmprint_only: bool,
+        page_size: int,
+    ) -> None:
+        self._table = table
+        self._id_column = id_column
+        self._palmprint_only = palmprint_only
+        self._page_size = page_size
+        # Id chunks still to page; the first holds the ids not yet complete
+        self._chunks = deque(chunk_ids(ids))
+        # Offset of the next page of an id paged on its own
+        self._offset: int | None = None
+        self._page = _Page()
+
+    def payload(self) -> dict | None:
+        """Return the payload of the next request, or None once every id is done."""
+        while self._chunks and not self._chunks[0]:
+            self._chunks.popleft()
+        if not self._chunks:
+            return None
+        if self._offset is not None:
+            ids = self._chunks[0][:1]
+            sort_by_column = RESULTS_ROW_ORDER_COLUMNS.get(self._table, self._id_column)
+            page_start = self._offset
+        else:
+            ids = EncodedIds(self._chunks[0])
+            sort_by_column = self._id_column
+            page_start = 0
+        return results_payload(
+            self._table,
+            self._id_column,
+            ids,
+            self._palmprint_only,
+            sort_by_column,
+            "asc",
+            page_start,
+            page_start + self._page_size,
+        )
+
+    def feed(self, row: dict) -> list[dict]:
+        """Take the next row of the page; return the rows known to be complete."""
+        page = self._page
+        page.count += 1
+        if self._offset is not None:
+            return [row]
+        key = row.get(self._id_column)
+        if key == page.current:
+            page.rows.append(row)
+            return []
+        if key in page.completed:
+            raise ValueError(
+                f"OpenVirome /results rows aren't ordered by {self._id_column}"
+            )
+        if page.current is not None:
+            page.completed.add(page.current)
+        ready, page.rows, page.current = page.rows, [row], key
+        return ready
+
+    def end_page(self) -> list[dict]:
+        """Finish the page; return its remaining complete rows."""
+        page, self._page = self._page, _Page()
+        full = page.count >= self._page_size
+        remaining = self._chunks[0]
+        if self._offset is not None:
+            self._offset = self._offset + self._page_size if full else None
+            if not full:
+                self._chunks[0] = remaining[1:]
+            return []
+        if not full:
+            self._chunks[0] = []
+            return page.rows
+        if page.completed:
+            self._chunks[0] = [i for i in remaining if i not in page.completed]
+        else:
+            # One id filled the page; page through its rows on their own
+            self._chunks[0] = [page.current] + [
+                i for i in remaining if i != page.current
+            ]
+            self._offset = 0
+        return []
+
+
+def _page_rows(pager: _ResultsPager, response: object) -> list[dict]:
+    rows = [ready for row in chunk_rows(response) for ready in pager.feed(row)]
+    return rows + pager.end_page()
+
+
+def _stream_result_pages(pager: _ResultsPager, use_cache: bool) -> Iterator[dict]:
+    """Stream the rows of each page as they arrive."""
+    while (data := pager.payload()) is not None:
+        for row in stream_from_openvirome_api("/results", data, use_cache=use_cache):
+            yield from pager.feed(row)
+        yield from pager.end_page()
+
+
+def _prefetch_result_pages(pager: _ResultsPager, use_cache: bool) -> Iterator[dict]:
+    """Yield the rows of each page, requesting the next page ahead of time."""
+    data = pager.payload()
+    if data is None:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(post_to_openvirome_api, "/results", data, use_cache)
+        while pending is not None:
+            rows = _page_rows(pager, pending.result())
+            data = pager.payload()
+            pending = None
+            if data is not None:
+                pending = executor.submit(
+                    post_to_openvirome_api, "/results", data, use_cache
+                )
+            yield from rows
+
+
+async def _stream_result_pages_async(
+    pager: _ResultsPager, use_cache: bool
+) -> AsyncIterator[dict]:
+    """Async version of `_stream_result_pages`."""
+    while (data := pager.payload()) is not None:
+        async for row in stream_from_openvirome_api_async(
+            "/results", data, use_cache=use_cache
+        ):
+            for ready in pager.feed(row):
+                yield ready
+        for ready in pager.end_page():
+            yield ready
+
+
+async def _prefetch_result_pages_async(
+    pager: _ResultsPager, use_cache: bool
+) -> AsyncIterator[dict]:
+    """Async version of `_prefetch_result_pages`."""
+
+    def fetch(data: dict) -> asyncio.Future:
+        return asyncio.ensure_future(
+            post_to_openvirome_api_async("/results", data, use_cache=use_cache)
+        )
+
+    data = pager.payload()
+    if data is None:
+        return
+    pending = fetch(data)
+    try:
+        while pending is not None:
+            rows = _page_rows(pager, await pending)
+            data = pager.payload()
+            pending = fetch(data) if data is not None else None
+            for row in rows:
+                yield row
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+def iter_results_by_identifiers(
+    table: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool = True,
+    page_size: int | None = None,
+    prefetch: bool = False,
+    use_cache: bool = True,
+) -> Iterator[dict]:
+    """
+    Stream results from the OpenVirome API one page at a time.
+    Pages are keyed by id rather than row offset (see `_ResultsPager`), so every row
+    is returned once even though many rows share an id. Rows are ordered by
+    `id_column` within each id chunk; id lists longer than ID_CHUNK_SIZE are paged one
+    chunk after another. By default each page is decoded as it arrives and its rows
+    are yielded as soon as their id is complete, so only about one network chunk of
+    rows is held in memory. With `prefetch`, whole pages are decoded instead and the
+    next page is requested while the current one is consumed.
+    Args:
+        table: The results table to query.
+        id_column: The SRA identifier column that joints to the results table.
+        ids: List of SRA identifiers to search for.
+        palmprint_only: Whether to filter for runs that contain palmprint data.
+        page_size: Rows per request, defaults to RESULTS_PAGE_SIZE.
+        prefetch: Whether to fetch whole pages, requesting the next page while the
+            current one is consumed, instead of streaming rows as they arrive.
+        use_cache: Whether to use the API response cache.
+    Yields:
+        Result rows.
+    """
+    pager = _ResultsPager(
+        table, id_column, ids, palmprint_only, page_size or RESULTS_PAGE_SIZE
+    )
+    if prefetch:
+        yield from _prefetch_result_pages(pager, use_cache)
+    else:
+        yield from _stream_result_pages(pager, use_cache)
+
+
+async def iter_results_by_identifiers_async(
+    table: str,
+    id_column: str,
+    ids: list[str],
+    palmprint_only: bool = True,
+    page_size: int | None = None,
+    prefetch: bool = False,
+    use_cache: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Async version of `iter_results_by_identifiers`.
+    """
+    pager = _ResultsPager(
+        table, id_column, ids, palmprint_only, page_size or RESULTS_PAGE_SIZE
+    )
+    if prefetch:
+        rows = _prefetch_result_pages_async(pager, use_cache)
+    else:
+        rows = _stream_result_pages_async(pager, use_cache)
+    try:
+        async for row in rows:
+            yield row
+    finally:
+        # Cancel a prefetch or close a stream the caller stopped reading
+        await rows.aclose()
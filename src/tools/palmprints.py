@@ -0,0 +1,332 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from src.resources.psql import run_sql_query
+from src.resources.neo4j import run_neo4j_query_columns
+from src.resources.palm_graph_index import get_palm_graph_index
+from src.resources.species_index import (
+    get_species_index,
+    log_fuzzy_match,
+    match_species_fuzzy,
+)
+
+### Serratus database interaction functions
+
+PALM_IDS_BY_SPECIES_QUERY = """
+SELECT palm_id, tax_species, gb_pid FROM
+palm_virome
+WHERE
+    node_qc = 'true'
+    AND tax_species ILIKE %s
+    AND gb_pid >= %s
+"""
+
+SPECIES_NAMES_QUERY = """
+SELECT DISTINCT tax_species FROM
+palm_virome
+WHERE
+    node_qc = 'true'
+    AND tax_species IS NOT NULL
+"""
+
+PALM_IDS_BY_SPECIES_NAMES_QUERY = """
+SELECT palm_id, tax_species, gb_pid FROM
+palm_virome
+WHERE
+    node_qc = 'true'
+    AND tax_species IN %s
+    AND gb_pid >= %s
+"""
+
+
+def species_pattern(species: str) -> str:
+    """Return the LIKE pattern matching names that contain `species` literally."""
+    # Match the name literally, as the species index does
+    for char in ("\\", "%", "_"):
+        species = species.replace(char, "\\" + char)
+    return f"%{species.strip()}%"
+
+
+def _lookup_species_sql(
+    species: str, percent_identity: float, fuzzy: bool
+) -> list[list[str]]:
+    """
+    Look up palm_ids by species in Postgres, matching names like `SpeciesIndex.lookup`.
+    """
+    rows = run_sql_query(
+        PALM_IDS_BY_SPECIES_QUERY,
+        params=(species_pattern(species), percent_identity),
+    )
+    if len(rows) > 1 or not fuzzy:
+        return rows
+    names = [row[0] for row in run_sql_query(SPECIES_NAMES_QUERY)[1:]]
+    query = species.strip().lower()
+    if any(query in name.lower() for name in names):
+        # A species matched, but none of its palm_ids reach percent_identity
+        return rows
+    matches = match_species_fuzzy(species, names)
+    if not matches:
+        return rows
+    log_fuzzy_match(species, matches)
+    return run_sql_query(
+        PALM_IDS_BY_SPECIES_NAMES_QUERY, params=(tuple(matches), percent_identity)
+    )
+
+
+def _species_response(rows: list[list[str]]) -> dict[str, object]:
+    if len(rows) <= 1:
+        return {"data": []}
+    # Surface the names matched, since a fragment or a fuzzy match can resolve to
+    # species other than the one asked for
+    matched = list(dict.fromkeys(row[1] for row in rows[1:]))
+    return {"data": rows, "matched_species": matched}
+
+
+def get_palm_ids_by_species(
+    species: str, percent_identity: float = 90, fuzzy: bool = False
+) -> dict[str, object]:
+    """
+    Fetch palm_ids from the Serratus database based on a virus species name.
+    Species names are matched by case-insensitive substring using the in-memory species
+    index; Postgres is queried directly until the index has loaded.
+    Args:
+        species: The species of the virus to search for.
+        percent_identity: Minimum gb_pid of the returned palm_ids.
+        fuzzy: Use the closest species names if none contain `species`.
+    Returns:
+        A dictionary containing the palm_ids and their associated tax_ids and
+        percent_identity, and the tax_species names that matched.
+    """
+    index = get_species_index()
+    if index is not None:
+        rows = index.lookup(species, percent_identity, fuzzy)
+    else:
+        rows = _lookup_species_sql(species, percent_identity, fuzzy)
+    return _species_response(rows)
+
+
+async def get_palm_ids_by_species_async(
+    species: str, percent_identity: float = 90, fuzzy: bool = False
+) -> dict[str, object]:
+    """
+    Async version of `get_palm_ids_by_species`.
+    """
+    index = get_species_index()
+    if index is not None:
+        rows = index.lookup(species, percent_identity, fuzzy)
+    else:
+        rows = await asyncio.to_thread(
+            _lookup_species_sql, species, percent_identity, fuzzy
+        )
+    return _species_response(rows)
+
+
+# Can delete if unused, neo4j version is much faster
+def get_similar_palm_ids_sql(
+    palm_ids: list[str], percent_identity: float = 90
+) -> dict[str, object]:
+    """
+    Fetch similar viruses based on palm_ids and percent_identity.
+    Args:
+        palm_ids: List of palm_ids to search for.
+        percent_identity: Minimum percent identity for similarity.
+    Returns:
+        A dictionary containing similar viruses.
+    """
+    if not palm_ids:
+        return {"data": []}
+    query = """
+    SELECT palm_id1, palm_id2, pident FROM public.palm_graph
+    WHERE pident >= %s AND palm_id1 IN %s
+    """
+    rows = run_sql_query(
+        query,
+        params=(tuple(palm_ids), percent_identity),
+    )
+    if not rows:
+        return {"data": []}
+    return {"data": rows}
+
+
+### Neo4j graph database interaction functions
+
+# Palm ids per UNWIND batch, and batches run concurrently over the shared driver
+SIMILARITY_BATCH_SIZE = 500
+SIMILARITY_BATCH_CONCURRENCY = 4
+
+SIMILAR_PALM_IDS_QUERY = """
+UNWIND $palm_ids AS palm_id
+MATCH (n:Palmprint {palmId: palm_id})-[r:SEQUENCE_ALIGNMENT]-(m:Palmprint)
+WHERE r.percentIdentity >= $percent_identity
+RETURN DISTINCT n.palmId AS palm_id1, m.palmId AS palm_id2, r.percentIdentity AS pident
+"""
+
+SIMILAR_PALM_ID_NEIGHBORS_QUERY = """
+UNWIND $palm_ids AS palm_id
+MATCH (:Palmprint {palmId: palm_id})-[r:SEQUENCE_ALIGNMENT]-(m:Palmprint)
+WHERE r.percentIdentity >= $percent_identity
+RETURN DISTINCT m.palmId AS palm_id
+"""
+
+
+def run_similarity_batches(
+    query: str,
+    palm_ids: list[str],
+    percent_identity: float,
+    batch_size: int | None = None,
+) -> list[dict[str, list]]:
+    """
+    Run a similarity query over de-duplicated batches of palm ids, concurrently.
+    Returns:
+        The columnar result of each batch that returned rows.
+    Raises:
+        RuntimeError: If any batch failed, so a partial result isn't mistaken for
+            (and cached as) the complete one.
+    """
+    batch_size = batch_size or SIMILARITY_BATCH_SIZE
+    unique_ids = list(dict.fromkeys(palm_ids))
+    batches = [
+        unique_ids[i : i + batch_size] for i in range(0, len(unique_ids), batch_size)
+    ]
+
+    def run(batch: list[str]) -> dict[str, list] | None:
+        params = {
+            "palm_ids": batch,
+            "percent_identity": percent_identity / 100.0,
+        }
+        return run_neo4j_query_columns(query, params=params)
+
+    if len(batches) == 1:
+        results = [run(batches[0])]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(SIMILARITY_BATCH_CONCURRENCY, len(batches))
+        ) as executor:
+            results = list(executor.map(run, batches))
+    failed = sum(columns is None for columns in results)
+    if failed:
+        raise RuntimeError(
+            f"Neo4j similarity query failed for {failed} of {len(batches)} batches"
+        )
+    return [columns for columns in results if columns]
+
+
+def get_similar_palm_ids_neo4j(
+    palm_ids: list[str], percent_identity: float = 90
+) -> dict[str, object]:
+    """
+    Fetch similar viruses based on palm_ids and percent_identity using a graph query.
+    Large inputs are split into batches that run concurrently.
+    Args:
+        palm_ids: List of palm_ids to search for.
+        percent_identity: Minimum percent identity for similarity.
+    Returns:
+        A dictionary containing similar viruses.
+    """
+    if not palm_ids:
+        return {"data": []}
+
+    batches = run_similarity_batches(SIMILAR_PALM_IDS_QUERY, palm_ids, percent_identity)
+    if not any(columns["palm_id1"] for columns in batches):
+        return {"data": []}
+
+    # Modify data so it's consistent with the equivalent SQL query
+    # Convert pident to int between 0 and 100, floored like the palm graph index
+    # (the small epsilon keeps values like 0.29 * 100 from flooring to 28)
+    clean_rows = [["palm_id1", "palm_id2", "pident"]]
+    for columns in batches:
+        pidents = [int(pident * 100 + 1e-6) for pident in columns["pident"]]
+        clean_rows.extend(
+            list(row) for row in zip(columns["palm_id1"], columns["palm_id2"], pidents)
+        )
+
+    return {"data": clean_rows}
+
+
+def get_similar_palm_id_neighbors_neo4j(
+    palm_ids: list[str], percent_identity: float = 90
+) -> list[str]:
+    """
+    Fetch the distinct palm_ids similar to any of the given palm_ids.
+    Unlike `get_similar_palm_ids_neo4j`, only the neighbor ids are returned, so no
+    (palm_id1, palm_id2, pident) triples are shipped from the database.
+    Args:
+        palm_ids: List of palm_ids to search for.
+        percent_identity: Minimum percent identity for similarity.
+    Returns:
+        A list of distinct neighbor palm_ids (which may include input palm_ids).
+    """
+    if not palm_ids:
+        return []
+    batches = run_similarity_batches(
+        SIMILAR_PALM_ID_NEIGHBORS_QUERY, palm_ids, percent_identity
+    )
+    return list(
+        dict.fromkeys(palm_id for columns in batches for palm_id in columns["palm_id"])
+    )
+
+
+### Palm similarity lookups, served from the local graph index when available
+
+
+def get_similar_palm_ids(
+    palm_ids: list[str], percent_identity: float = 90
+) -> dict[str, object]:
+    """
+    Fetch similar viruses based on palm_ids and percent_identity.
+    Uses the memory-mapped palm graph index if one is configured and fresh,
+    otherwise falls back to Neo4j.
+    Args:
+        palm_ids: List of palm_ids to search for.
+        percent_identity: Minimum percent identity for similarity.
+    Returns:
+        A dictionary containing similar viruses.
+    """
+    index = get_palm_graph_index()
+    if index is None:
+        return get_similar_palm_ids_neo4j(palm_ids, percent_identity)
+    palm_id1, palm_id2, pident = index.similar(palm_ids, percent_identity)
+    if not palm_id1:
+        return {"data": []}
+    clean_rows = [["palm_id1", "palm_id2", "pident"]]
+    clean_rows.extend(list(row) for row in zip(palm_id1, palm_id2, pident))
+    return {"data": clean_rows}
+
+
+async def get_similar_palm_ids_async(
+    palm_ids: list[str], percent_identity: float = 90
+) -> dict[str, object]:
+    """
+    Async version of `get_similar_palm_ids`.
+    """
+    return await asyncio.to_thread(get_similar_palm_ids, palm_ids, percent_identity)
+
+
+def get_similar_palm_id_neighbors(
+    palm_ids: list[str], percent_identity: float = 90
+) -> list[str]:
+    """
+    Fetch the distinct palm_ids similar to any of the given palm_ids.
+    Uses the memory-mapped palm graph index if one is configured and fresh,
+    otherwise falls back to Neo4j.
+    Args:
+        palm_ids: List of palm_ids to search for.
+        percent_identity: Minimum percent identity for similarity.
+    Returns:
+        A list of distinct neighbor palm_ids (which may include input palm_ids).
+    """
+    index = get_palm_graph_index()
+    if index is None:
+        return get_similar_palm_id_neighbors_neo4j(palm_ids, percent_identity)
+    return index.neighbor_ids(palm_ids, percent_identity)
+
+
+async def get_similar_palm_id_neighbors_async(
+    palm_ids: list[str], percent_identity: float = 90
+) -> list[str]:
+    """
+    Async version of `get_similar_palm_id_neighbors`.
+    """
+    return await asyncio.to_thread(
+        get_similar_palm_id_neighbors, palm_ids, percent_identity
+    )
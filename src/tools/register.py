@@ -1,9 +1,9 @@
 import logging
 
 from src.tools.workflows.register import register_workflows
-from src.tools.openvirome import (
-    get_similar_palm_ids_neo4j,
-    get_palm_ids_by_species,
+from src.tools.palmprints import (
+    get_similar_palm_ids_async,
+    get_palm_ids_by_species_async,
 )
 
 
@@ -22,18 +22,25 @@ def register_tools(mcp):
         return {"error": error_msg}
 
     @mcp.tool("get_similar_palm_ids")
-    def similar_palm_ids_tool(palm_ids: list[str], percent_identity: float = 90):
+    async def similar_palm_ids_tool(palm_ids: list[str], percent_identity: float = 90):
         """Fetch similar viruses based on palm_ids and percent_identity."""
         try:
-            return get_similar_palm_ids_neo4j(palm_ids, percent_identity)
+            return await get_similar_palm_ids_async(palm_ids, percent_identity)
         except Exception as error:
             return _handle_error(f"Error fetching similar viruses: {error}")
 
     @mcp.tool("get_palm_ids_by_species")
-    def palm_ids_from_species_tool(species_name: str, percent_identity: float = 90):
-        """Fetch palm_ids from a given virus name."""
+    async def palm_ids_from_species_tool(
+        species_name: str, percent_identity: float = 90, fuzzy: bool = False
+    ):
+        """
+        Fetch palm_ids from a given virus name. With fuzzy, a name that no species
+        contains resolves to the closest species names; check matched_species.
+        """
         try:
-            palm_ids = get_palm_ids_by_species(species_name, percent_identity)
+            palm_ids = await get_palm_ids_by_species_async(
+                species_name, percent_identity, fuzzy
+            )
             if not palm_ids:
                 return _handle_error(
                     f"No palm_ids found for species name: {species_name}"
@@ -0,0 +1,93 @@
+import gzip
+import re
+
+try:
+    import zstandard
+except ImportError:  # zstd request bodies are only offered when zstandard is installed
+    zstandard = None
+
+# Marks an `ids` value holding accession ranges rather than a plain list
+ACCESSION_RANGES_FORMAT = "accession-ranges"
+
+_ACCESSION = re.compile(r"([A-Za-z_]*)(\d+)")
+
+
+def available_codings() -> list[str]:
+    """Return the request Content-Encodings this process can produce."""
+    return ["gzip", "zstd"] if zstandard is not None else ["gzip"]
+
+
+def compress_body(content: bytes, coding: str) -> bytes:
+    """
+    Compress a request body.
+    Args:
+        content: The body.
+        coding: "gzip" or "zstd", sent as the Content-Encoding.
+    Returns:
+        The compressed body.
+    """
+    if coding == "gzip":
+        # Level 6 gets most of level 9's ratio on accession lists at a third the cost
+        return gzip.compress(content, compresslevel=6, mtime=0)
+    if coding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(content)
+    raise ValueError(f"Unsupported request encoding: {coding}")
+
+
+def encode_accessions(ids: list[str]) -> dict:
+    """
+    Encode accessions compactly as numeric ranges grouped by prefix and digit count.
+    Order and duplicates aren't preserved. The encoding is
+    `{"format": "accession-ranges", "groups": [...], "other": [...]}`, where each
+    group is `{"prefix": "SRR", "digits": 7, "ranges": [gap, length, ...]}`: a range
+    of `length` consecutive numbers starts `gap` after the end of the previous range
+    (or after 0 for the first one), and numbers are zero-padded to `digits`. Ids
+    without a numeric suffix are listed in `other`.
+    Args:
+        ids: Accessions, e.g. SRR/SAMN/PRJNA ids.
+    Returns:
+        The encoded ids.
+    """
+    numbers: dict[tuple[str, int], set[int]] = {}
+    other = set()
+    for accession in ids:
+        match = _ACCESSION.fullmatch(accession)
+        if match is None:
+            other.add(accession)
+            continue
+        prefix, digits = match.groups()
+        numbers.setdefault((prefix, len(digits)), set()).add(int(digits))
+
+    groups = []
+    for (prefix, digits), values in sorted(numbers.items()):
+        ranges = []
+        previous_end = 0
+        start = None
+        for number in sorted(values):
+            if start is not None and number == end + 1:
+                end = number
+                continue
+            if start is not None:
+                ranges += [start - previous_end, end - start + 1]
+                previous_end = end
+            start = end = number
+        ranges += [start - previous_end, end - start + 1]
+        groups.append({"prefix": prefix, "digits": digits, "ranges": ranges})
+    return {
+        "format": ACCESSION_RANGES_FORMAT,
+        "groups": groups,
+        "other": sorted(other),
+    }
+
+
+def decode_accessions(encoded: dict) -> list[str]:
+    """Decode `encode_accessions` output back into a de-duplicated id list."""
+    ids = []
+    for group in encoded["groups"]:
+        prefix, digits, ranges = group["prefix"], group["digits"], group["ranges"]
+        end = 0
+        for gap, length in zip(ranges[::2], ranges[1::2]):
+            start = end + gap
+            ids.extend(f"{prefix}{n:0{digits}d}" for n in range(start, start + length))
+            end = start + length - 1
+    return ids + list(encoded.get("other", []))
@@ -0,0 +1,480 @@
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import httpx
+
+# Statuses that mean the upstream is overloaded or briefly unavailable; requests that
+# get them are retried (if idempotent) and count against the circuit breaker
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+DEFAULT_POLICY = {
+    # AIMD concurrency limit: +1 per window of fast successes, halved on overload
+    "initial_concurrency": 8,
+    "min_concurrency": 1,
+    "max_concurrency": 32,
+    # Successful responses slower than this also count as overload
+    "latency_target_seconds": 20.0,
+    "timeout_seconds": 120.0,
+    "connect_timeout_seconds": 10.0,
+    # Retries with full-jitter exponential backoff, for idempotent routes only
+    "idempotent": True,
+    "max_retries": 3,
+    "backoff_base_seconds": 0.5,
+    "backoff_max_seconds": 10.0,
+    # The circuit opens after this many consecutive failures and lets one probe
+    # request through after open_seconds
+    "failure_threshold": 5,
+    "open_seconds": 30.0,
+}
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+
+@dataclass
+class AIMDLimit:
+    """
+    A concurrency limit adjusted by additive increase / multiplicative decrease.
+    Each fast success raises the limit by 1/limit (about +1 per window of requests);
+    an overload signal multiplies it by `decrease_factor`, at most once per latency
+    target so a burst of failures from one window only counts once.
+    """
+
+    value: float
+    minimum: float
+    maximum: float
+    latency_target: float
+    decrease_factor: float = 0.5
+    last_decrease: float = -math.inf
+
+    def slots(self) -> int:
+        """Return how many requests may be in flight at the current limit."""
+        return max(1, math.floor(self.value))
+
+    def update(self, latency: float, overloaded: bool, now: float) -> None:
+        """Adjust the limit for a finished request."""
+        if overloaded or latency > self.latency_target:
+            if now - self.last_decrease >= self.latency_target:
+                self.value = max(self.minimum, self.value * self.decrease_factor)
+                self.last_decrease = now
+        else:
+            self.value = min(self.maximum, self.value + 1.0 / self.value)
+
+
+class AdaptiveLimiter:
+    """
+    Limits concurrent requests to an AIMDLimit. Sync callers wait on a condition and
+    async callers on a future of their own event loop.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        latency_target: float,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self._limit = AIMDLimit(
+            float(initial),
+            float(minimum),
+            float(maximum),
+            latency_target,
+            decrease_factor,
+        )
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        # (event loop, future) of each waiting async caller
+        self._async_waiters: deque = deque()
+
+    @property
+    def limit(self) -> float:
+        """The current concurrency limit."""
+        return self._limit.value
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < self._limit.slots():
+            self.in_flight += 1
+            return True
+        return False
+
+    def waiting(self) -> int:
+        """Return how many async callers are queued for a slot."""
+        return len(self._async_waiters)
+
+    def acquire(self) -> None:
+        """Block until a slot is free."""
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    async def acquire_async(self) -> None:
+        """Wait, without blocking the event loop, until a slot is free."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    woken = waiter.done() and not waiter.cancelled()
+                    if woken:
+                        # Pass the wake-up on so the free slot isn't lost
+                        self._wake(1)
+                raise
+
+    def release(self, latency: float | None, overloaded: bool = False) -> None:
+        """
+        Free a slot and adjust the limit.
+        Args:
+            latency: Seconds the request took, or None to leave the limit unchanged
+                (e.g. the caller was cancelled).
+            overloaded: Whether the request failed with an overload signal.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self._limit.update(latency, overloaded, now)
+            free = self._limit.slots() - self.in_flight
+            if free > 0:
+                self._condition.notify(free)
+                self._wake(free)
+
+    def _wake(self, count: int) -> None:
+        while count > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                continue
+            count -= 1
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures. After `open_seconds` a
+    single probe request is let through: its success closes the circuit and its
+    failure opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, open_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self) -> float:
+        """Seconds until the open circuit lets a probe through."""
+        with self._lock:
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def abandon(self) -> None:
+        """Forget a request that ended without an outcome, freeing the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self.state == self.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != self.OPEN:
+                    logging.warning(
+                        "Circuit opened after %d consecutive failures",
+                        self.consecutive_failures,
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+def _retry_after_seconds(response: httpx.Response | None) -> float:
+    if response is None:
+        return 0.0
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", 0)))
+    except ValueError:
+        return 0.0
+
+
+class _ReleasingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Wraps a response body stream to call `on_close` once when it is closed."""
+
+    def __init__(self, stream, on_close: Callable[[], None]) -> None:
+        self._stream = stream
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    def _notify(self) -> None:
+        with self._lock:
+            closed, self._closed = self._closed, True
+        if not closed:
+            self._on_close()
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._notify()
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._notify()
+
+
+class UpstreamRoute:
+    """
+    Sends requests to one upstream route under an adaptive concurrency limit, a
+    circuit breaker and a retry policy.
+    Transport errors, timeouts and RETRYABLE_STATUSES are failures: they shrink the
+    concurrency limit, count toward opening the circuit and are retried with
+    full-jitter exponential backoff (honouring Retry-After) if the route is
+    idempotent. Other responses are returned as they are. A streamed response keeps
+    its concurrency slot until its body is closed, and its latency covers the body.
+    """
+
+    def __init__(self, name: str, policy: dict) -> None:
+        self.name = name
+        self.policy = {**DEFAULT_POLICY, **policy}
+        self.timeout = httpx.Timeout(
+            self.policy["timeout_seconds"],
+            connect=self.policy["connect_timeout_seconds"],
+        )
+        self.limiter = AdaptiveLimiter(
+            self.policy["initial_concurrency"],
+            self.policy["min_concurrency"],
+            self.policy["max_concurrency"],
+            self.policy["latency_target_seconds"],
+        )
+        self.breaker = CircuitBreaker(
+            self.policy["failure_threshold"], self.policy["open_seconds"]
+        )
+        self._counts = {
+            "requests": 0,
+            "failures": 0,
+            "retries": 0,
+            "throttled": 0,
+            "rejected": 0,
+        }
+        self._counts_lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def _check_circuit(self) -> None:
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise UpstreamUnavailableError(
+                f"{self.name} is failing; circuit open for another"
+                f" {self.breaker.retry_after():.1f}s"
+            )
+
+    def _finish(
+        self,
+        started: float,
+        response: httpx.Response | None,
+        error: Exception | None,
+    ) -> bool:
+        # Releases the slot and records the outcome; returns whether it failed
+        failed = error is not None or response.status_code in RETRYABLE_STATUSES
+        if failed or response.is_closed:
+            self.limiter.release(time.monotonic() - started, overloaded=failed)
+        else:
+            # A streamed body is still being read; the slot is released when the
+            # response is closed
+            response.stream = _ReleasingStream(
+                response.stream,
+                lambda: self.limiter.release(time.monotonic() - started),
+            )
+        self._count("requests")
+        if failed:
+            self._count("failures")
+            if response is not None and response.status_code == 429:
+                self._count("throttled")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return failed
+
+    def _backoff(
+        self, attempt: int, response: httpx.Response | None, max_retries: int | None
+    ) -> float | None:
+        # Seconds to wait before retrying, or None if the request shouldn't be retried
+        if max_retries is None:
+            max_retries = self.policy["max_retries"]
+        if (
+            not self.policy["idempotent"]
+            or attempt >= max_retries
+            or self.breaker.state == CircuitBreaker.OPEN
+        ):
+            return None
+        self._count("retries")
+        ceiling = min(
+            self.policy["backoff_max_seconds"],
+            self.policy["backoff_base_seconds"] * 2**attempt,
+        )
+        return max(random.uniform(0, ceiling), _retry_after_seconds(response))
+
+    def send(
+        self,
+        request: Callable[[httpx.Timeout], httpx.Response],
+        max_retries: int | None = None,
+    ) -> httpx.Response:
+        """
+        Send a request with the route's limits and retries.
+        Args:
+            request: Sends the request with the given timeout and returns the response.
+            max_retries: Overrides the policy's max_retries for this request.
+        Returns:
+            The first response that isn't a failure, or the last failed response.
+        Raises:
+            UpstreamUnavailableError: If the circuit is open.
+            httpx.TransportError: If the last attempt failed without a response.
+        """
+        attempt = 0
+        while True:
+            self._check_circuit()
+            self.limiter.acquire()
+            started = time.monotonic()
+            response, error = None, None
+            try:
+                response = request(self.timeout)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # Cancelled or failed before the upstream answered
+                self.limiter.release(None)
+                self.breaker.abandon()
+                raise
+            failed = self._finish(started, response, error)
+            delay = self._backoff(attempt, response, max_retries) if failed else None
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            logging.warning(
+                "%s attempt %d failed (%s); retrying in %.1fs",
+                self.name,
+                attempt + 1,
+                error or response.status_code,
+                delay,
+            )
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def send_async(
+        self,
+        request: Callable[[httpx.Timeout], Awaitable[httpx.Response]],
+        max_retries: int | None = None,
+    ) -> httpx.Response:
+        """Async version of `send`; `request` is awaited."""
+        attempt = 0
+        while True:
+            self._check_circuit()
+            await self.limiter.acquire_async()
+            started = time.monotonic()
+            response, error = None, None
+            try:
+                response = await request(self.timeout)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # Cancelled or failed before the upstream answered
+                self.limiter.release(None)
+                self.breaker.abandon()
+                raise
+            failed = self._finish(started, response, error)
+            delay = self._backoff(attempt, response, max_retries) if failed else None
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            logging.warning(
+                "%s attempt %d failed (%s); retrying in %.1fs",
+                self.name,
+                attempt + 1,
+                error or response.status_code,
+                delay,
+            )
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict[str, object]:
+        """Return the route's current limit, breaker state and request counters."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {
+            "name": self.name,
+            "concurrency_limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting(),
+            "circuit_state": self.breaker.state,
+            "circuit_open": self.breaker.state != CircuitBreaker.CLOSED,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            **counts,
+        }
@@ -0,0 +1,155 @@
+import logging
+import os
+import sqlite3
+from collections.abc import Mapping, Sequence
+
+from langgraph.cache.base import BaseCache, FullKey, Namespace
+from langgraph.types import CachePolicy
+
+from src.tools.cache import SQLiteCache, canonical_hash, get_sqlite_cache
+
+# Node result cache defaults, overridable with WORKFLOW_CACHE_PATH,
+# WORKFLOW_CACHE_MAX_BYTES and WORKFLOW_CACHE_TTL_SECONDS
+WORKFLOW_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "open-virome-mcp", "workflow_nodes.sqlite3"
+)
+WORKFLOW_CACHE_MAX_BYTES = 512 * 1024 * 1024
+WORKFLOW_CACHE_TTL_SECONDS = 24 * 3600
+
+
+def get_workflow_store() -> SQLiteCache | None:
+    """
+    Return the SQLite database holding cached workflow node results.
+
+    Optional environment variables:
+        - WORKFLOW_CACHE_PATH: SQLite database path (by default under
+          ~/.cache/open-virome-mcp); set it to an empty string to disable node caching
+        - WORKFLOW_CACHE_MAX_BYTES: size above which least recently used entries are
+          evicted
+
+    Returns:
+        The shared SQLiteCache, or None if node caching is disabled or the database
+        can't be opened.
+    """
+    path = os.environ.get("WORKFLOW_CACHE_PATH", WORKFLOW_CACHE_PATH)
+    if not path:
+        return None
+    max_bytes = int(
+        os.environ.get("WORKFLOW_CACHE_MAX_BYTES", WORKFLOW_CACHE_MAX_BYTES)
+    )
+    try:
+        return get_sqlite_cache(path, max_bytes=max_bytes)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning("Failed to open workflow cache at %s: %s", path, e)
+        return None
+
+
+def get_workflow_cache_stats() -> dict[str, object] | None:
+    """Return the workflow node cache counters, or None if node caching is disabled."""
+    store = get_workflow_store()
+    return store.stats() if store is not None else None
+
+
+def _namespace_prefix(namespace: Namespace) -> str:
+    return "|".join(namespace) + "\0"
+
+
+def _has_results(writes: Sequence[tuple[str, object]]) -> bool:
+    # A node that found nothing, or bailed out with only an assistant message, writes
+    # no data; caching that would replay a transient empty answer for a whole TTL
+    return any(value for channel, value in writes if channel != "messages")
+
+
+class WorkflowNodeCache(BaseCache):
+    """
+    LangGraph node cache persisted in the workflow SQLite database, so cached node
+    results survive server restarts. Only node outcomes that write data are stored;
+    empty results and early returns with just a message are recomputed on the next
+    run. The database is resolved on every call, which lets WORKFLOW_CACHE_PATH be
+    changed (or set to an empty string to disable caching) at runtime.
+    """
+
+    def get(self, keys: Sequence[FullKey]) -> dict[FullKey, object]:
+        store = get_workflow_store()
+        if store is None:
+            return {}
+        values = {}
+        for namespace, key in keys:
+            try:
+                value = store.get(_namespace_prefix(namespace) + key)
+            except sqlite3.Error as e:
+                logging.warning("Workflow cache read failed: %s", e)
+                continue
+            if value is not None:
+                encoding, _, data = value.partition(b"\0")
+                values[(namespace, key)] = self.serde.loads_typed(
+                    (encoding.decode("utf-8"), data)
+                )
+        return values
+
+    async def aget(self, keys: Sequence[FullKey]) -> dict[FullKey, object]:
+        return self.get(keys)
+
+    def set(self, pairs: Mapping[FullKey, tuple[object, int | None]]) -> None:
+        store = get_workflow_store()
+        if store is None:
+            return
+        for (namespace, key), (value, ttl) in pairs.items():
+            if not _has_results(value):
+                continue
+            encoding, data = self.serde.dumps_typed(value)
+            try:
+                store.set(
+                    _namespace_prefix(namespace) + key,
+                    encoding.encode("utf-8") + b"\0" + data,
+                    ttl=ttl,
+                )
+            except sqlite3.Error as e:
+                logging.warning("Workflow cache write failed: %s", e)
+
+    async def aset(self, pairs: Mapping[FullKey, tuple[object, int | None]]) -> None:
+        self.set(pairs)
+
+    def clear(self, namespaces: Sequence[Namespace] | None = None) -> None:
+        store = get_workflow_store()
+        if store is None:
+            return
+        if namespaces is None:
+            store.invalidate()
+            return
+        for namespace in namespaces:
+            store.invalidate(prefix=_namespace_prefix(namespace))
+
+    async def aclear(self, namespaces: Sequence[Namespace] | None = None) -> None:
+        self.clear(namespaces)
+
+
+workflow_cache = WorkflowNodeCache()
+
+
+def _state_value(state: dict, path: str) -> object:
+    value = state
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def state_cache_policy(*paths: str) -> CachePolicy:
+    """
+    Cache a node's result keyed only by the state fields it depends on.
+    Fields left out of the key (e.g. the hypothesis) don't invalidate the result, so a
+    rerun that only changes them reuses it. Id lists are treated as unordered.
+    Args:
+        *paths: Dotted state paths the node reads, e.g. "user_input.species_label".
+    Returns:
+        The cache policy, with the TTL from WORKFLOW_CACHE_TTL_SECONDS.
+    """
+
+    def key_func(state: dict) -> str:
+        return canonical_hash(
+            {path: _state_value(state, path) for path in paths},
+            unordered_keys=frozenset(["palm_ids", "single"]),
+        )
+
+    ttl = int(os.environ.get("WORKFLOW_CACHE_TTL_SECONDS", WORKFLOW_CACHE_TTL_SECONDS))
+    return CachePolicy(key_func=key_func, ttl=ttl)
@@ -3,9 +3,14 @@ import logging
 from langgraph.graph import StateGraph, START, END
 
 from src.tools.openvirome import (
-    get_counts_by_identifiers,
+    get_facet_counts_by_identifiers_async,
+)
+from src.tools.metrics import track_node
+from src.tools.workflows.state import (
+    MetadataCountsOutput,
+    MetadataCountsState,
+    State,
 )
-from src.tools.workflows.state import State
 
 
 DEFAULT_ARGS = {
@@ -16,7 +21,24 @@ DEFAULT_ARGS = {
     "palmprint_only": True,
 }
 
+# (table, group_by, id_column) for each metadata_counts facet
+FACETS = {
+    "organism": ("sra", "organism", "run"),
+    "tissue": ("biosample_tissue", "tissue", "biosample"),
+    "disease": ("biosample_disease", "do_label", "biosample"),
+    "sex": ("biosample_sex", "sex", "biosample"),
+    "stat_organism": ("sra_stat", "stat_host_order", "run"),
+    "virus_family": ("palm_virome", "tax_family", "run"),
+    "geo_attribute": (
+        "biosample_geographical_location",
+        "geo_attribute_value",
+        "biosample",
+    ),
+    "biome": ("bgl_gm4326_gp4326", "biome_attribute_value", "biosample"),
+}
+
 
+@track_node("metadata_counts")
 def get_sra_id_counts(state: State) -> State:
     logging.info("get_sra_id_counts node processing input")
     if not state["sra_identifiers"]:
@@ -59,147 +81,90 @@ def get_sra_id_counts(state: State) -> State:
     return {"metadata_counts": metadata_counts}
 
 
-def get_organism_counts(state: State) -> State:
-    logging.info("get_organism_counts node invoked")
-
+@track_node("metadata_counts")
+async def get_facet_counts(state: MetadataCountsState) -> MetadataCountsState:
+    logging.info("get_facet_counts node invoked")
     sra_identifiers = state.get("sra_identifiers", {})
-    run_ids = sra_identifiers.get("run", {}).get("single", [])
-    args = {
-        "table": "sra",
-        "group_by": "organism",
-        "id_column": "run",
-        "ids": run_ids,
-        **DEFAULT_ARGS,
+    ids_by_column = {
+        "run": sra_identifiers.get("run", {}).get("single", []),
+        "biosample": sra_identifiers.get("biosample", {}).get("single", []),
     }
+    results = await get_facet_counts_by_identifiers_async(
+        facets=list(FACETS.values()),
+        ids_by_column=ids_by_column,
+        **DEFAULT_ARGS,
+    )
+    facet_counts = {name: results[facet] for name, facet in FACETS.items()}
+    return {"facet_counts": facet_counts}
+
 
-    results = get_counts_by_identifiers(**args)
+@track_node("metadata_counts")
+def get_organism_counts(state: MetadataCountsState) -> State:
+    logging.info("get_organism_counts node invoked")
     metadata_counts = {
-        "organism": results,
+        "organism": state["facet_counts"]["organism"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_tissue_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_tissue_counts(state: MetadataCountsState) -> State:
     logging.info("get_tissue_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    biosamples = sra_identifiers.get("biosample", {}).get("single", [])
-    args = {
-        "table": "biosample_tissue",
-        "group_by": "tissue",
-        "id_column": "biosample",
-        "ids": biosamples,
-        **DEFAULT_ARGS,
-    }
-
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "tissue": results,
+        "tissue": state["facet_counts"]["tissue"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_disease_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_disease_counts(state: MetadataCountsState) -> State:
     logging.info("get_disease_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    biosamples = sra_identifiers.get("biosample", {}).get("single", [])
-    args = {
-        "table": "biosample_disease",
-        "group_by": "do_label",
-        "id_column": "biosample",
-        "ids": biosamples,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "disease": results,
+        "disease": state["facet_counts"]["disease"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_sex_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_sex_counts(state: MetadataCountsState) -> State:
     logging.info("get_sex_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    biosamples = sra_identifiers.get("biosample", {}).get("single", [])
-    args = {
-        "table": "biosample_sex",
-        "group_by": "sex",
-        "id_column": "biosample",
-        "ids": biosamples,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "sex": results,
+        "sex": state["facet_counts"]["sex"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_stat_host_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_stat_host_counts(state: MetadataCountsState) -> State:
     logging.info("get_stat_host_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    run_ids = sra_identifiers.get("run", {}).get("single", [])
-    args = {
-        "table": "sra_stat",
-        "group_by": "stat_host_order",
-        "id_column": "run",
-        "ids": run_ids,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "stat_organism": results,
+        "stat_organism": state["facet_counts"]["stat_organism"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_virus_family_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_virus_family_counts(state: MetadataCountsState) -> State:
     logging.info("get_virus_family_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    run_ids = sra_identifiers.get("run", {}).get("single", [])
-    args = {
-        "table": "palm_virome",
-        "group_by": "tax_family",
-        "id_column": "run",
-        "ids": run_ids,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "virus_family": results,
+        "virus_family": state["facet_counts"]["virus_family"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_geo_attribute_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_geo_attribute_counts(state: MetadataCountsState) -> State:
     logging.info("get_geo_attribute_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    biosamples = sra_identifiers.get("biosample", {}).get("single", [])
-    args = {
-        "table": "biosample_geographical_location",
-        "group_by": "geo_attribute_value",
-        "id_column": "biosample",
-        "ids": biosamples,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
     metadata_counts = {
-        "geo_attribute": results,
+        "geo_attribute": state["facet_counts"]["geo_attribute"],
     }
     return {"metadata_counts": metadata_counts}
 
 
-def get_biome_counts(state: State) -> State:
+@track_node("metadata_counts")
+def get_biome_counts(state: MetadataCountsState) -> State:
     logging.info("get_biome_counts node invoked")
-    sra_identifiers = state.get("sra_identifiers", {})
-    biosamples = sra_identifiers.get("biosample", {}).get("single", [])
-    args = {
-        "table": "bgl_gm4326_gp4326",
-        "group_by": "biome_attribute_value",
-        "id_column": "biosample",
-        "ids": biosamples,
-        **DEFAULT_ARGS,
-    }
-    results = get_counts_by_identifiers(**args)
+    results = state["facet_counts"]["biome"]
     biome_id_to_name = {
         "WWF_TEW_BIOME_01": "Tropical & Subtropical Moist Broadleaf Forests",
         "WWF_TEW_BIOME_02": "Tropical & Subtropical Dry Broadleaf Forests",
@@ -219,11 +184,12 @@ def get_biome_counts(state: State) -> State:
         "WWF_TEW_BIOME_99": "Ocean",
     }
     # Map biome names to full names
-    results_clean = results.copy()
-    for result in results_clean:
+    results_clean = []
+    for result in results:
         biome_id = result.get("name")
         if biome_id in biome_id_to_name:
-            result["name"] = biome_id_to_name[biome_id]
+            result = {**result, "name": biome_id_to_name[biome_id]}
+        results_clean.append(result)
 
     metadata_counts = {
         "biome": results_clean,
@@ -231,8 +197,13 @@ def get_biome_counts(state: State) -> State:
     return {"metadata_counts": metadata_counts}
 
 
-workflow = StateGraph(State)
+# Only the keys the subgraph produces are written back to the parent, so a cached run
+# never overwrites the parent's user input
+workflow = StateGraph(
+    MetadataCountsState, input_schema=State, output_schema=MetadataCountsOutput
+)
 workflow.add_node(node="get_sra_id_counts", action=get_sra_id_counts)
+workflow.add_node(node="get_facet_counts", action=get_facet_counts)
 workflow.add_node(node="get_tissue_counts", action=get_tissue_counts)
 workflow.add_node(node="get_disease_counts", action=get_disease_counts)
 workflow.add_node(node="get_organism_counts", action=get_organism_counts)
@@ -243,14 +214,15 @@ workflow.add_node(node="get_geo_attribute_counts", action=get_geo_attribute_coun
 workflow.add_node(node="get_biome_counts", action=get_biome_counts)
 
 workflow.add_edge(START, "get_sra_id_counts")
-workflow.add_edge(START, "get_tissue_counts")
-workflow.add_edge(START, "get_disease_counts")
-workflow.add_edge(START, "get_organism_counts")
-workflow.add_edge(START, "get_sex_counts")
-workflow.add_edge(START, "get_stat_host_counts")
-workflow.add_edge(START, "get_virus_family_counts")
-workflow.add_edge(START, "get_geo_attribute_counts")
-workflow.add_edge(START, "get_biome_counts")
+workflow.add_edge(START, "get_facet_counts")
+workflow.add_edge("get_facet_counts", "get_tissue_counts")
+workflow.add_edge("get_facet_counts", "get_disease_counts")
+workflow.add_edge("get_facet_counts", "get_organism_counts")
+workflow.add_edge("get_facet_counts", "get_sex_counts")
+workflow.add_edge("get_facet_counts", "get_stat_host_counts")
+workflow.add_edge("get_facet_counts", "get_virus_family_counts")
+workflow.add_edge("get_facet_counts", "get_geo_attribute_counts")
+workflow.add_edge("get_facet_counts", "get_biome_counts")
 
 workflow.add_edge("get_sra_id_counts", END)
 workflow.add_edge("get_tissue_counts", END)
@@ -2,38 +2,37 @@ import logging
 
 from langgraph.graph import StateGraph, START, END
 
-from src.tools.openvirome import (
-    get_results_by_identifiers,
-    get_mwas_results_by_identifiers,
-)
-from src.tools.workflows.state import State
+from src.tools.openvirome import get_mwas_results_by_identifiers_async
+from src.tools.openvirome_results import iter_results_by_identifiers_async
+from src.tools.identifiers import intern_ids
+from src.tools.metrics import track_node
+from src.tools.workflows.state import MWASOutput, State
 
 
-def get_matching_virus_families(state: State) -> State:
+@track_node("mwas")
+async def get_matching_virus_families(state: State) -> State:
     logging.info("get_matching_virus_families node invoked")
     sra_identifiers = state.get("sra_identifiers", {})
     run_ids = sra_identifiers.get("run", {}).get("single", [])
-    args = {
-        "table": "palm_virome",
-        "id_column": "run",
-        "ids": run_ids,
-        "page_start": 0,
-    }
-    results = get_results_by_identifiers(**args)
     # filter results to only include rows related to the original query
     # (i.e. exclude all other viruses that co-occur in the matching runs)
-    palm_ids = state.get("palm_ids", [])
-    matches = [result for result in results if result.get("palm_id") in palm_ids]
+    palm_ids = intern_ids("palm_id", state.get("palm_ids", []))
     virus_families = set()
-    for match in matches:
-        family = match.get("tax_family")
-        if family:
-            virus_families.add(family)
+    async for result in iter_results_by_identifiers_async(
+        table="palm_virome",
+        id_column="run",
+        ids=run_ids,
+    ):
+        if result.get("palm_id") in palm_ids:
+            family = result.get("tax_family")
+            if family:
+                virus_families.add(family)
 
     return {"virus_families": list(virus_families)}
 
 
-def get_mwas_results(state: State) -> State:
+@track_node("mwas")
+async def get_mwas_results(state: State) -> State:
     logging.info("get_mwas_results node invoked")
     sra_identifiers = state.get("sra_identifiers", {})
     bioprojects = sra_identifiers.get("bioproject", {}).get("single", [])
@@ -54,7 +53,7 @@ def get_mwas_results(state: State) -> State:
         "page_start": 0,
         "page_end": 100,
     }
-    mwas_results = get_mwas_results_by_identifiers(**args)
+    mwas_results = await get_mwas_results_by_identifiers_async(**args)
     if not mwas_results:
         logging.warning("No MWAS results found for bioprojects")
         return {
@@ -73,7 +72,7 @@ def get_mwas_results(state: State) -> State:
     return {"mwas_results": mwas_results}
 
 
-workflow = StateGraph(State)
+workflow = StateGraph(State, output_schema=MWASOutput)
 workflow.add_node(
     node="get_matching_virus_families", action=get_matching_virus_families
 )
@@ -0,0 +1,145 @@
+import logging
+from typing import Awaitable, Callable
+
+from langgraph.pregel import Pregel
+
+# Rows of each facet histogram and MWAS hits sent with a partial result; the full
+# lists are in the tool's final result
+PARTIAL_RESULT_ROWS = 25
+
+# Called with (progress, total, message, partial result or None)
+ProgressCallback = Callable[[float, float, str, dict | None], Awaitable[None]]
+
+
+def _subgraphs(graph: Pregel) -> dict[str, Pregel]:
+    return {
+        name: node.runnable
+        for name, node in graph.builder.nodes.items()
+        if isinstance(node.runnable, Pregel)
+    }
+
+
+def count_graph_nodes(graph: Pregel, skip: frozenset[str] = frozenset()) -> int:
+    """
+    Count the node runs a graph invocation reports, including nested subgraph nodes.
+    Args:
+        graph: The compiled graph.
+        skip: Top-level nodes that won't run, e.g. LLM nodes of the other llm_mode.
+    Returns:
+        The number of node updates the graph streams when every node runs once.
+    """
+    subgraphs = _subgraphs(graph)
+    return sum(
+        1 + (count_graph_nodes(subgraphs[name]) if name in subgraphs else 0)
+        for name in graph.builder.nodes
+        if name not in skip
+    )
+
+
+def _top_rows(rows: list) -> dict[str, object]:
+    return {"total": len(rows), "top": rows[:PARTIAL_RESULT_ROWS]}
+
+
+def summarize_update(update: dict) -> dict | None:
+    """
+    Extract the partial result worth sending to the client from one node's update.
+    Id lists are reduced to counts, and facet histograms and MWAS hits to their top rows.
+    Args:
+        update: The state update returned by a node.
+    Returns:
+        The partial result, or None if the update has nothing to report.
+    """
+    partial = {}
+    for key, value in update.items():
+        if key == "palm_ids":
+            partial["palm_ids"] = len(value)
+        elif key == "sra_identifiers":
+            partial["sra_totals"] = {
+                id_type: identifiers.get("totalCount", 0)
+                for id_type, identifiers in value.items()
+            }
+        elif key == "metadata_counts":
+            partial["metadata_counts"] = {
+                facet: _top_rows(rows) if isinstance(rows, list) else rows
+                for facet, rows in value.items()
+            }
+        elif key == "mwas_results":
+            partial["mwas_results"] = _top_rows(value)
+        elif key in ("virus_families", "validation_report", "anomaly_report"):
+            partial[key] = value
+        elif key == "messages":
+            partial["messages"] = [
+                message.get("content") if isinstance(message, dict) else str(message)
+                for message in value
+            ]
+    return partial or None
+
+
+class _ProgressReporter:
+    """Counts completed node runs and reports each one to the progress callback."""
+
+    def __init__(self, graph: Pregel, report: ProgressCallback, total: int) -> None:
+        self._report = report
+        self._subgraphs = _subgraphs(graph)
+        self._total = total
+        self._completed = 0
+
+    def advance(self, node: str, is_subgraph: bool, cached: bool) -> float:
+        """Count one completed node run and return the progress made so far."""
+        self._completed += 1
+        if is_subgraph and cached:
+            # A cached subgraph result stands in for all of its nodes
+            self._completed += count_graph_nodes(self._subgraphs[node])
+        return min(self._completed, self._total)
+
+    async def node_completed(
+        self, namespace: tuple[str, ...], node: str, update: object, cached: bool
+    ) -> None:
+        """Advance the progress and report the node's partial result, if any."""
+        path = "/".join([part.split(":")[0] for part in namespace] + [node])
+        is_subgraph = not namespace and node in self._subgraphs
+        progress = self.advance(node, is_subgraph, cached)
+        partial = None
+        if isinstance(update, dict) and (cached or not is_subgraph):
+            partial = summarize_update(update)
+        message = f"{path} {'loaded from cache' if cached else 'completed'}"
+        try:
+            await self._report(progress, self._total, message, partial)
+        except Exception as error:
+            # Progress is best effort; a client that went away shouldn't stop the run
+            logging.warning("Failed to report progress for %s: %s", path, error)
+
+
+async def stream_with_progress(
+    graph: Pregel,
+    inputs: dict,
+    report: ProgressCallback,
+    skip: frozenset[str] = frozenset(),
+) -> dict:
+    """
+    Run a graph, reporting progress and partial results as each node completes.
+    Updates of subgraph wrapper nodes only repeat what their inner nodes already
+    reported, so they advance progress without a partial result, unless the subgraph
+    result came from the node cache and its inner nodes didn't run.
+    Args:
+        graph: The compiled graph.
+        inputs: The graph input.
+        report: Async callback receiving (progress, total, message, partial result).
+        skip: Top-level nodes that won't run, used to compute the progress total.
+    Returns:
+        The final graph state, as returned by `graph.ainvoke`.
+    """
+    reporter = _ProgressReporter(graph, report, count_graph_nodes(graph, skip))
+    final_state: dict = {}
+    async for namespace, mode, chunk in graph.astream(
+        inputs, stream_mode=["updates", "values"], subgraphs=True
+    ):
+        if mode == "values":
+            if not namespace:
+                final_state = chunk
+            continue
+        cached = chunk.get("__metadata__", {}).get("cached", False)
+        for node, update in chunk.items():
+            if not node.startswith("__"):
+                await reporter.node_completed(namespace, node, update, cached)
+    return final_state
@@ -1,4 +1,9 @@
 import logging
+
+from mcp.server.fastmcp import Context
+
+from src.tools.workflows.progress import stream_with_progress
+from src.tools.workflows.state import LLMMode
 from src.tools.workflows.virus_metadata_analysis import (
     graph as virus_metadata_analysis_graph,
 )
@@ -16,18 +21,48 @@ def register_workflows(mcp):
     async def virus_metadata_analysis_tool(
         virus_species: str = "Papaya meleira virus",
         hypothesis: str = "This virus may be a cofactor of cancer in humans.",
+        llm_mode: LLMMode = "separate",
+        *,
+        ctx: Context,
     ):
-        """Run metadata analysis based on input virus and hypothesis."""
+        """
+        Run metadata analysis based on input virus and hypothesis.
+        With llm_mode "combined", the validation and anomaly reports come from a single
+        LLM call instead of two, sending the evidence only once.
+        Progress notifications are sent as each step completes, and partial results
+        (palm id counts, SRA totals, facet histograms, MWAS hits) as log messages.
+        """
         logging.info("Starting metadata anomaly workflow")
         try:
             inputs = {
                 "user_input": {
                     "species_label": virus_species,
                     "hypothesis": hypothesis,
+                    "llm_mode": llm_mode,
                 },
             }
-            output = await virus_metadata_analysis_graph.ainvoke(inputs)
-            return output
+
+            async def report(progress, total, message, partial):
+                await ctx.report_progress(progress, total, message)
+                if partial is not None:
+                    await ctx.session.send_log_message(
+                        level="info",
+                        data={"step": message, **partial},
+                        logger="virus_metadata_analysis",
+                        related_request_id=ctx.request_id,
+                    )
+
+            unused_llm_nodes = (
+                ["llm_validate_hypothesis", "llm_identify_anomalies"]
+                if llm_mode == "combined"
+                else ["llm_combined_report"]
+            )
+            return await stream_with_progress(
+                virus_metadata_analysis_graph,
+                inputs,
+                report,
+                skip=frozenset(unused_llm_nodes),
+            )
 
         except Exception as error:
             logging.error("Error in metadata anomaly workflow: %s", error)
@@ -1,5 +1,5 @@
 import operator
-from typing import Annotated, Sequence
+from typing import Annotated, Literal, Sequence
 from typing_extensions import TypedDict
 
 from langgraph.graph.message import BaseMessage
@@ -75,9 +75,20 @@ class AnomalyReport(TypedDict):
     supporting_mwas_results: list[MWASResult]
 
 
+class CombinedReport(TypedDict):
+    validation_report: ValidationReport
+    anomaly_report: AnomalyReport
+
+
+# "separate" sends the validation and anomaly prompts as two LLM calls, "combined"
+# asks for both reports in one call that shares the evidence
+LLMMode = Literal["separate", "combined"]
+
+
 class UserInput(TypedDict):
     hypothesis: str
     species_label: str
+    llm_mode: LLMMode
 
 
 class State(TypedDict):
@@ -90,3 +101,19 @@ class State(TypedDict):
     virus_families: Annotated[list[str], unique_list_merge]
     validation_report: Annotated[ValidationReport, merge_dicts]
     anomaly_report: Annotated[AnomalyReport, merge_dicts]
+
+
+class MetadataCountsOutput(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], operator.add]
+    metadata_counts: Annotated[MetadataCounts, merge_dicts]
+
+
+class MWASOutput(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], operator.add]
+    mwas_results: Annotated[list[MWASResult], operator.add]
+    virus_families: Annotated[list[str], unique_list_merge]
+
+
+class MetadataCountsState(State):
+    # Raw facet histograms, private to the metadata counts subgraph
+    facet_counts: Annotated[dict[str, list[dict[str, str]]], merge_dicts]
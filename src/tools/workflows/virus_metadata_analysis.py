@@ -2,24 +2,35 @@ import logging
 
 from langgraph.graph import StateGraph, START, END
 
-from src.tools.openvirome import (
-    get_sra_identifiers_by_filters,
-    get_palm_ids_by_species,
-    get_similar_palm_ids_neo4j,
+from src.tools.openvirome import get_sra_identifiers_by_filters_async
+from src.tools.palmprints import (
+    get_palm_ids_by_species_async,
+    get_similar_palm_id_neighbors_async,
 )
-from src.tools.llm import run_llm_completion
+from src.tools.identifiers import intern_ids
+from src.tools.metrics import track_node
+from src.tools.llm import run_llm_completion_async
+from src.tools.workflows.cache import state_cache_policy, workflow_cache
 from src.tools.workflows.metadata_counts import graph as metadata_counts_graph
 from src.tools.workflows.mwas import graph as mwas_graph
-from src.tools.workflows.state import State, ValidationReport, AnomalyReport
+from src.tools.workflows.state import (
+    State,
+    ValidationReport,
+    AnomalyReport,
+    CombinedReport,
+)
 from src.prompts.metadata_analysis import (
     validate_hypothesis_system_prompt,
     validate_hypothesis_user_prompt,
     anomaly_detection_system_prompt,
     anomaly_detection_user_prompt,
+    combined_analysis_system_prompt,
+    combined_analysis_user_prompt,
 )
 
 
-def get_palm_ids_from_species_label(state: State) -> State:
+@track_node("virus_metadata_analysis")
+async def get_palm_ids_from_species_label(state: State) -> State:
     logging.info("get_palm_ids_from_species_label node invoked")
     species_label = state["user_input"].get("species_label", "")
     if not species_label:
@@ -29,13 +40,16 @@ def get_palm_ids_from_species_label(state: State) -> State:
         }
 
     percent_identity = 80
-    palm_ids_response = get_palm_ids_by_species(species_label, percent_identity)
+    palm_ids_response = await get_palm_ids_by_species_async(
+        species_label, percent_identity
+    )
     palm_ids = palm_ids_response.get("data", [])
     palm_ids = [palm_id[0] for palm_id in palm_ids[1:]]
     return {"palm_ids": palm_ids}
 
 
-def get_evol_similar_palm_ids(state: State) -> State:
+@track_node("virus_metadata_analysis")
+async def get_evol_similar_palm_ids(state: State) -> State:
     logging.info("get_evol_similar_palm_ids node invoked")
     if not state["palm_ids"]:
         logging.warning("No palm_ids found in state")
@@ -49,17 +63,14 @@ def get_evol_similar_palm_ids(state: State) -> State:
         }
 
     percent_identity = 80
-    evol_similar_viruses = get_similar_palm_ids_neo4j(
+    evol_similar_viruses = await get_similar_palm_id_neighbors_async(
         state["palm_ids"], percent_identity
     )
-    evol_similar_viruses = evol_similar_viruses.get("data", [])
-    evol_similar_viruses = [virus[1] for virus in evol_similar_viruses[1:]]
+    evol_similar_viruses = intern_ids("palm_id", evol_similar_viruses)
 
     # only return unique palm_ids excluding the original palm_ids
-    evol_similar_viruses = [
-        palm_id for palm_id in evol_similar_viruses if palm_id not in state["palm_ids"]
-    ]
-    evol_similar_viruses = list(set(evol_similar_viruses))
+    evol_similar_viruses -= intern_ids("palm_id", state["palm_ids"])
+    evol_similar_viruses = evol_similar_viruses.to_list()
 
     if not evol_similar_viruses:
         logging.warning("No similar viruses found for palm_ids")
@@ -67,7 +78,8 @@ def get_evol_similar_palm_ids(state: State) -> State:
     return {"palm_ids": evol_similar_viruses}
 
 
-def get_matching_sra_ids(state: State) -> State:
+@track_node("virus_metadata_analysis")
+async def get_matching_sra_ids(state: State) -> State:
     logging.info("get_matching_sra_ids node invoked")
     if not state["palm_ids"]:
         logging.warning("No palm_ids found in state")
@@ -79,11 +91,14 @@ def get_matching_sra_ids(state: State) -> State:
                 }
             ]
         }
+    # palm_ids are already unique, as the state's reducer de-duplicates them
     filters = [
         {"filterType": "sotu", "filterValue": palm_id, "groupByKey": "sotu"}
         for palm_id in state["palm_ids"]
     ]
-    sra_identifiers = get_sra_identifiers_by_filters(filters, palmprint_only=True)
+    sra_identifiers = await get_sra_identifiers_by_filters_async(
+        filters, palmprint_only=True
+    )
 
     if not sra_identifiers:
         logging.warning("No SRA accessions found for palm_ids")
@@ -93,7 +108,8 @@ def get_matching_sra_ids(state: State) -> State:
     return {"sra_identifiers": sra_identifiers}
 
 
-def llm_validate_hypothesis(state: State) -> State:
+@track_node("virus_metadata_analysis")
+async def llm_validate_hypothesis(state: State) -> State:
     logging.info("llm_validate_hypothesis node invoked")
     hypothesis = state["user_input"].get("hypothesis", "")
     virus_species = state["user_input"].get("species_label", "")
@@ -114,9 +130,7 @@ def llm_validate_hypothesis(state: State) -> State:
 
     # clean up metadata counts and mwas results for LLM processing
     hypothesis = hypothesis + f". Given virus species: {virus_species}"
-    metadata_counts = {
-        k: v[:20] for k, v in metadata_counts.items() if isinstance(v, list)
-    }
+    metadata_counts = {k: v for k, v in metadata_counts.items() if isinstance(v, list)}
     system_prompt = validate_hypothesis_system_prompt()
     user_prompt = validate_hypothesis_user_prompt(
         hypothesis=hypothesis,
@@ -127,7 +141,7 @@ def llm_validate_hypothesis(state: State) -> State:
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
-    response = run_llm_completion(
+    response = await run_llm_completion_async(
         messages=prompt_messages,
         model_name="gpt-4o",
         temperature=0.0,
@@ -147,7 +161,8 @@ def llm_validate_hypothesis(state: State) -> State:
     return {"validation_report": response}
 
 
-def llm_identify_anomalies(state: State) -> State:
+@track_node("virus_metadata_analysis")
+async def llm_identify_anomalies(state: State) -> State:
     logging.info("llm_identify_anomalies node invoked")
     hypothesis = state["user_input"].get("hypothesis", "")
     virus_species = state["user_input"].get("species_label", "")
@@ -168,9 +183,7 @@ def llm_identify_anomalies(state: State) -> State:
 
     # clean up metadata counts and mwas results for LLM processing
     hypothesis = hypothesis + f". Given virus species: {virus_species}"
-    metadata_counts = {
-        k: v[:20] for k, v in metadata_counts.items() if isinstance(v, list)
-    }
+    metadata_counts = {k: v for k, v in metadata_counts.items() if isinstance(v, list)}
 
     system_prompt = anomaly_detection_system_prompt()
     user_prompt = anomaly_detection_user_prompt(
@@ -182,7 +195,7 @@ def llm_identify_anomalies(state: State) -> State:
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
-    response = run_llm_completion(
+    response = await run_llm_completion_async(
         messages=prompt_messages,
         model_name="gpt-4o",
         temperature=0.0,
@@ -197,6 +210,71 @@ def llm_identify_anomalies(state: State) -> State:
     return {"anomaly_report": response}
 
 
+@track_node("virus_metadata_analysis")
+async def llm_combined_report(state: State) -> State:
+    logging.info("llm_combined_report node invoked")
+    hypothesis = state["user_input"].get("hypothesis", "")
+    virus_species = state["user_input"].get("species_label", "")
+    metadata_counts = state.get("metadata_counts", {})
+    mwas_results = state.get("mwas_results", {})
+    if not hypothesis or (not metadata_counts and not mwas_results):
+        logging.warning("Missing hypothesis, metadata counts, or MWAS results in state")
+        return {
+            "messages": [
+                {
+                    "role": "assistant",
+                    "content": (
+                        "Missing hypothesis, metadata counts, or MWAS results in state"
+                    ),
+                }
+            ]
+        }
+
+    # clean up metadata counts and mwas results for LLM processing
+    hypothesis = hypothesis + f". Given virus species: {virus_species}"
+    metadata_counts = {k: v for k, v in metadata_counts.items() if isinstance(v, list)}
+
+    system_prompt = combined_analysis_system_prompt()
+    user_prompt = combined_analysis_user_prompt(
+        hypothesis=hypothesis,
+        metadata_counts=metadata_counts,
+        mwas_results=mwas_results,
+    )
+    prompt_messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    response = await run_llm_completion_async(
+        messages=prompt_messages,
+        model_name="gpt-4o",
+        temperature=0.0,
+        structured_output=CombinedReport,
+    )
+    if not response:
+        logging.warning("No response from LLM for combined analysis")
+        return {
+            "messages": [
+                {
+                    "role": "assistant",
+                    "content": "No validation or anomaly report generated.",
+                }
+            ]
+        }
+
+    return {
+        "validation_report": response.get("validation_report", {}),
+        "anomaly_report": response.get("anomaly_report", {}),
+    }
+
+
+def route_llm_analysis(state: State) -> list[str]:
+    """Pick the LLM node(s) for the requested llm_mode; separate calls by default."""
+    if state["user_input"].get("llm_mode", "separate") == "combined":
+        return ["llm_combined_report"]
+    return ["llm_validate_hypothesis", "llm_identify_anomalies"]
+
+
+@track_node("virus_metadata_analysis")
 def get_supporting_documents(state: State) -> State:
     logging.info("get_supporting_documents node invoked")
     anomaly_report = state.get("anomaly_report", {})
@@ -216,16 +294,38 @@ def get_supporting_documents(state: State) -> State:
 
 workflow = StateGraph(State)
 
+# Data-gathering nodes are cached on disk keyed only by the state they read, so a
+# rerun for the same species with a different hypothesis only reruns the LLM nodes.
+# They raise on backend failures rather than return partial data, since LangGraph
+# doesn't cache a node that raised
 workflow.add_node(
     node="get_palm_ids_from_species_label",
     action=get_palm_ids_from_species_label,
+    cache_policy=state_cache_policy("user_input.species_label"),
+)
+workflow.add_node(
+    node="get_evol_similar_palm_ids",
+    action=get_evol_similar_palm_ids,
+    cache_policy=state_cache_policy("palm_ids"),
+)
+workflow.add_node(
+    node="get_matching_sra_ids",
+    action=get_matching_sra_ids,
+    cache_policy=state_cache_policy("palm_ids"),
+)
+workflow.add_node(
+    node="get_metadata_counts",
+    action=metadata_counts_graph,
+    cache_policy=state_cache_policy("sra_identifiers"),
+)
+workflow.add_node(
+    node="get_mwas_results",
+    action=mwas_graph,
+    cache_policy=state_cache_policy("palm_ids", "sra_identifiers"),
 )
-workflow.add_node(node="get_evol_similar_palm_ids", action=get_evol_similar_palm_ids)
-workflow.add_node(node="get_matching_sra_ids", action=get_matching_sra_ids)
-workflow.add_node(node="get_metadata_counts", action=metadata_counts_graph)
-workflow.add_node(node="get_mwas_results", action=mwas_graph)
 workflow.add_node(node="llm_validate_hypothesis", action=llm_validate_hypothesis)
 workflow.add_node(node="llm_identify_anomalies", action=llm_identify_anomalies)
+workflow.add_node(node="llm_combined_report", action=llm_combined_report)
 workflow.add_node(node="get_supporting_documents", action=get_supporting_documents)
 
 workflow.add_edge(START, "get_palm_ids_from_species_label")
@@ -233,15 +333,15 @@ workflow.add_edge("get_palm_ids_from_species_label", "get_evol_similar_palm_ids"
 workflow.add_edge("get_evol_similar_palm_ids", "get_matching_sra_ids")
 workflow.add_edge("get_matching_sra_ids", "get_metadata_counts")
 workflow.add_edge("get_matching_sra_ids", "get_mwas_results")
-workflow.add_edge("get_metadata_counts", "llm_validate_hypothesis")
-workflow.add_edge("get_metadata_counts", "llm_identify_anomalies")
-workflow.add_edge("get_mwas_results", "llm_validate_hypothesis")
-workflow.add_edge("get_mwas_results", "llm_identify_anomalies")
+llm_nodes = ["llm_validate_hypothesis", "llm_identify_anomalies", "llm_combined_report"]
+workflow.add_conditional_edges("get_metadata_counts", route_llm_analysis, llm_nodes)
+workflow.add_conditional_edges("get_mwas_results", route_llm_analysis, llm_nodes)
 workflow.add_edge("llm_identify_anomalies", "get_supporting_documents")
 workflow.add_edge("llm_validate_hypothesis", "get_supporting_documents")
+workflow.add_edge("llm_combined_report", "get_supporting_documents")
 workflow.add_edge("get_supporting_documents", END)
 
-graph = workflow.compile()
+graph = workflow.compile(cache=workflow_cache)
 
 
 ## Save the graph image for documentation or visualization purposes
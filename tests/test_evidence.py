@@ -0,0 +1,60 @@
+from src.prompts.evidence import encode_evidence, estimate_tokens
+
+
+def _mwas(count):
+    return [
+        {
+            "bioproject": f"PRJNA{i}",
+            "family": "Flaviviridae",
+            "metadata_field": "tissue",
+            "metadata_value": f"value {i}",
+            "fold_change": "2.5",
+            "p_value": str(0.0001 * (i + 1)),
+        }
+        for i in range(count)
+    ]
+
+
+def _counts(count):
+    return {
+        "sra": {"run": 100, "biosample": 80},
+        "tissue": [{"name": f"tissue {i}", "count": 1000 - i} for i in range(count)],
+        "disease": [{"name": f"disease {i}", "count": 500 - i} for i in range(count)],
+    }
+
+
+def test_evidence_fits_the_token_budget():
+    for budget in (200, 500, 2000):
+        evidence = encode_evidence(_counts(200), _mwas(200), token_budget=budget)
+        # Section titles and the truncation notes are the only unbudgeted text
+        assert estimate_tokens(evidence) <= budget * 1.1
+
+
+def test_truncated_sections_keep_their_best_rows():
+    evidence = encode_evidence(_counts(200), _mwas(200), token_budget=500)
+    lines = evidence.splitlines()
+    mwas_title = next(line for line in lines if line.startswith("MWAS Results"))
+    assert "(top " in mwas_title and "of 200)" in mwas_title
+    mwas_start = lines.index(mwas_title)
+    assert lines[mwas_start + 2].startswith("PRJNA0|")
+    tissue_start = next(i for i, line in enumerate(lines) if line.startswith("tissue"))
+    assert lines[tissue_start + 2] == "tissue 0|1000"
+
+
+def test_small_evidence_is_kept_whole():
+    evidence = encode_evidence(_counts(2), _mwas(2), token_budget=3000)
+    assert "top " not in evidence
+    assert "sra: run=100, biosample=80" in evidence
+    assert "PRJNA1|Flaviviridae|tissue|value 1|2.5|0.0002" in evidence
+
+
+def test_unknown_mwas_fields_are_kept():
+    results = _mwas(2)
+    results[0]["taxSpecies"] = ["Zika virus", "Dengue virus"]
+    results[1]["pValueAdjusted"] = "0.000123456"
+    results[1]["biosamples"] = [f"SAMN{i}" for i in range(10)]
+    evidence = encode_evidence({}, results)
+    header = next(line for line in evidence.splitlines() if line.startswith("bio"))
+    assert header.split("|")[-3:] == ["taxSpecies", "pValueAdjusted", "biosamples"]
+    assert "|Zika virus,Dengue virus||" in evidence
+    assert "|0.000123|SAMN0,SAMN1,SAMN2,+7 more" in evidence
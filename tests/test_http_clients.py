@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.tools.http_clients import SharedHTTPClients, close_async_client
+
+
+@pytest.fixture(name="other_loop")
+def fixture_other_loop():
+    """An event loop running in a background thread, as in another worker."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def _wait_closed(client: httpx.AsyncClient) -> bool:
+    deadline = time.monotonic() + 5
+    while not client.is_closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return client.is_closed
+
+
+def test_client_is_closed_on_its_running_loop(other_loop):
+    client = httpx.AsyncClient()
+    close_async_client(client, other_loop)
+    assert _wait_closed(client)
+
+
+def test_client_of_a_stopped_loop_is_dropped():
+    loop = asyncio.new_event_loop()
+    loop.close()
+    client = httpx.AsyncClient()
+    close_async_client(client, loop)
+    assert not client.is_closed
+
+
+def test_sync_client_is_recreated_once_closed():
+    clients = SharedHTTPClients(httpx.Client, httpx.AsyncClient)
+    client = clients.get_sync()
+    assert clients.get_sync() is client
+    client.close()
+    assert clients.get_sync() is not client
+
+
+def test_async_client_of_another_loop_is_closed(other_loop):
+    clients = SharedHTTPClients(httpx.Client, httpx.AsyncClient)
+
+    async def get():
+        return clients.get_async()
+
+    old_client = asyncio.run_coroutine_threadsafe(get(), other_loop).result(5)
+    client = asyncio.run(get())
+    assert client is not old_client
+    assert _wait_closed(old_client)
+    asyncio.run(clients.aclose())
+    assert client.is_closed
@@ -0,0 +1,58 @@
+# pylint: disable=protected-access
+import pytest
+
+from src.tools import identifiers, openvirome
+from src.tools.identifiers import IdentifierInterner, get_interner, intern_ids
+
+
+def test_set_algebra():
+    interner = IdentifierInterner("palm_id")
+    a = interner.intern(["u1", "u2", "u3", "u2"])
+    b = interner.intern(["u3", "u4"])
+    assert a.to_list() == ["u1", "u2", "u3"]
+    assert (a | b).to_list() == ["u1", "u2", "u3", "u4"]
+    assert (a & b).to_list() == ["u3"]
+    assert (a - b).to_list() == ["u1", "u2"]
+    assert "u2" in a and "u4" not in a and "unseen" not in a
+
+
+def test_kinds_do_not_mix():
+    with pytest.raises(ValueError):
+        _ = IdentifierInterner("run").intern(["a"]) | IdentifierInterner(
+            "biosample"
+        ).intern(["a"])
+
+
+def test_full_interner_is_replaced(monkeypatch):
+    monkeypatch.setattr(identifiers, "_interners", {})
+    monkeypatch.setenv("IDENTIFIER_INTERNER_MAX_IDS", "3")
+    old = intern_ids("run", ["SRR1", "SRR2", "SRR3"])
+    new = intern_ids("run", ["SRR3", "SRR4"])
+    assert new.interner is not old.interner
+    assert len(get_interner("run")) == 2
+    # Sets from the retired interner still combine with current ones
+    assert (old | new).to_list() == ["SRR3", "SRR4", "SRR1", "SRR2"]
+    assert (old - new).to_list() == ["SRR1", "SRR2"]
+    assert (new & old).to_list() == ["SRR3"]
+
+
+def test_identifier_batches_merge_by_level(monkeypatch):
+    monkeypatch.setattr(identifiers, "_interners", {})
+    merged = openvirome._merge_identifier_batches(
+        [
+            {
+                "run": {"totalCount": 2, "single": ["SRR1", "SRR2"]},
+                "bioproject": {"totalCount": 1, "single": ["PRJNA1"]},
+            },
+            {
+                "run": {"totalCount": 2, "single": ["SRR2", "SRR3"]},
+                "bioproject": {"totalCount": 1, "single": ["PRJNA1"]},
+            },
+            None,
+        ]
+    )
+    assert merged["run"]["single"] == ["SRR1", "SRR2", "SRR3"]
+    assert merged["run"]["totalCount"] == 3
+    assert merged["bioproject"] == {"totalCount": 1, "single": ["PRJNA1"]}
+    # The throwaway union doesn't fill the process-wide interners
+    assert not identifiers._interners
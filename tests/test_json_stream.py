@@ -0,0 +1,118 @@
+import base64
+import binascii
+import json
+import random
+
+import pytest
+
+from src.tools.json_stream import (
+    Base64Decoder,
+    JSONArrayParser,
+    ResponseDecoder,
+    loads,
+)
+
+ROWS = [
+    {"run": "SRR1", "palm_id": "u1", "count": 3, "note": 'brace } and "quote"'},
+    {"run": "SRR2", "palm_id": "u2", "count": -1.5e3, "tags": ["a", "b"]},
+    {"run": "SRR3", "nested": {"k": [1, {"x": None}]}, "flag": True},
+    [1, 2],
+    "text, with ],",
+    12345678901234567890123,
+    None,
+]
+
+
+def _chunks(data: bytes, seed: int) -> list[bytes]:
+    rng = random.Random(seed)
+    chunks, start = [], 0
+    while start < len(data):
+        end = start + rng.randint(1, 16)
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def _decode(decoder, chunks):
+    items = []
+    for chunk in chunks:
+        items.extend(decoder.feed(chunk))
+    return items + decoder.close()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_array_elements_match_a_whole_parse(seed):
+    body = json.dumps(ROWS, indent=seed % 3 or None).encode()
+    assert _decode(JSONArrayParser(), _chunks(body, seed)) == ROWS
+
+
+def test_elements_are_returned_as_they_complete():
+    parser = JSONArrayParser()
+    assert not parser.feed(b'[{"a": 1}')
+    # An element is returned once the delimiter after it arrives
+    assert parser.feed(b', {"b"') == [{"a": 1}]
+    assert parser.feed(b": 2},") == [{"b": 2}]
+    assert parser.feed(b" 7") == []
+    assert parser.feed(b"]") == [7] and parser.close() == []
+
+
+def test_multibyte_characters_split_across_chunks():
+    body = json.dumps([{"name": "Ångström virus ✓"}], ensure_ascii=False).encode()
+    chunks = [body[i : i + 1] for i in range(len(body))]
+    assert _decode(JSONArrayParser(), chunks) == [{"name": "Ångström virus ✓"}]
+
+
+def test_non_array_document_is_parsed_on_close():
+    parser = JSONArrayParser()
+    assert _decode(parser, [b'  {"total', b'Count": 2}']) == []
+    assert parser.value == {"totalCount": 2}
+
+
+@pytest.mark.parametrize("body", [b"", b"[1, 2", b"[1 2]", b'[{"a": 1}}]', b"[1,, 2]"])
+def test_invalid_arrays_raise(body):
+    with pytest.raises(ValueError):
+        _decode(JSONArrayParser(), [body])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_base64_decodes_incrementally(seed):
+    data = json.dumps(ROWS).encode()
+    encoded = base64.encodebytes(data)  # wrapped at 76 characters
+    assert b"".join(_decode_base64(_chunks(encoded, seed))) == data
+
+
+def _decode_base64(chunks):
+    decoder = Base64Decoder()
+    return [decoder.feed(chunk) for chunk in chunks] + [decoder.close()]
+
+
+def test_base64_tolerates_missing_padding():
+    encoded = base64.b64encode(b"[1, 2]x").rstrip(b"=")
+    assert b"".join(_decode_base64([encoded])) == b"[1, 2]x"
+
+
+def test_invalid_base64_raises():
+    with pytest.raises(binascii.Error):
+        _decode_base64([b"ab$d"])
+
+
+@pytest.mark.parametrize("encode", [False, True])
+def test_response_decoder_detects_base64(encode):
+    body = json.dumps(ROWS).encode()
+    if encode:
+        body = base64.b64encode(body)
+    decoder = ResponseDecoder(keep_bytes=1 << 20)
+    assert _decode(decoder, _chunks(body, 1)) == ROWS
+    assert decoder.body == json.dumps(ROWS).encode()
+    assert decoder.bytes_received == len(body)
+
+
+def test_response_decoder_stops_keeping_large_bodies():
+    body = json.dumps(ROWS).encode()
+    decoder = ResponseDecoder(keep_bytes=len(body) - 1)
+    assert _decode(decoder, _chunks(body, 2)) == ROWS
+    assert decoder.body is None
+
+
+def test_loads_falls_back_for_documents_orjson_rejects():
+    assert loads(b'{"fold_change": Infinity}') == {"fold_change": float("inf")}
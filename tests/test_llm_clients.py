@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from src.tools import llm
+
+
+@pytest.fixture(name="azure_env")
+def fixture_azure_env(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.invalid")
+    yield
+    asyncio.run(llm.close_openai_clients())
+
+
+@pytest.mark.usefixtures("azure_env")
+def test_client_is_shared_on_one_loop():
+    async def get_twice():
+        return llm.get_openai_client(), llm.get_openai_client()
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    assert llm.get_openai_client("gpt-4o-mini") is not first
+
+
+@pytest.mark.usefixtures("azure_env")
+def test_client_is_rebuilt_for_another_loop():
+    async def get():
+        return llm.get_openai_client()
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert second is not first
+    assert second.http_async_client is not first.http_async_client
+
+
+def test_llm_cache_is_shared_per_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "a.sqlite3"))
+    cache = llm.get_llm_cache()
+    assert llm.get_llm_cache() is cache
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "b.sqlite3"))
+    assert llm.get_llm_cache().path == str(tmp_path / "b.sqlite3")
+    monkeypatch.setenv("LLM_CACHE_PATH", "")
+    assert llm.get_llm_cache() is None
@@ -0,0 +1,40 @@
+# pylint: disable=protected-access
+import re
+
+from src.resources.register import get_server_metrics
+from src.tools import openvirome_client
+from src.tools.metrics import render_prometheus, track
+
+SAMPLE = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*(\{.*\})? \S+")
+
+
+def _samples(text: str) -> list[str]:
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+def test_exposition_is_valid_after_a_capability_probe(monkeypatch):
+    monkeypatch.setattr(openvirome_client, "_capabilities", {})
+    openvirome_client._set_capability("/counts", "gzip", True)
+    openvirome_client._set_capability("/results", "compact_ids", False)
+    with track("openvirome", "/counts"):
+        pass
+
+    text = render_prometheus(get_server_metrics())
+    invalid = [line for line in _samples(text) if not SAMPLE.fullmatch(line)]
+    assert not invalid
+    assert (
+        'openvirome_mcp_request_encodings_supported{route="/counts",encoding="gzip"} 1'
+        in text
+    )
+    assert (
+        "openvirome_mcp_request_encodings_supported"
+        '{route="/results",encoding="compact_ids"} 0'
+    ) in text
+
+
+def test_keys_that_are_not_metric_names_become_labels():
+    text = render_prometheus({"section": {"/counts": {"hits": 2}, "ok": 1}})
+    assert _samples(text) == [
+        'openvirome_mcp_section_hits{key="/counts"} 2',
+        "openvirome_mcp_section_ok 1",
+    ]
@@ -0,0 +1,15 @@
+import asyncio
+
+from src.tools import openvirome_client
+
+
+def test_async_client_is_reused_on_one_loop():
+    async def get_twice():
+        return (
+            openvirome_client.get_openvirome_async_client(),
+            openvirome_client.get_openvirome_async_client(),
+        )
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    assert str(first.base_url).startswith(openvirome_client.OPENVIROME_API_URL)
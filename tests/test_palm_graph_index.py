@@ -0,0 +1,90 @@
+from src.resources import palm_graph_index
+from src.resources.palm_graph_index import PalmGraphIndex, build_palm_graph_index
+from src.tools import palmprints
+
+# Undirected SEQUENCE_ALIGNMENT edges as (palm_id1, palm_id2, percentIdentity)
+EDGES = [
+    ("u1", "u2", 0.95),
+    ("u1", "u3", 0.9),
+    ("u3", "u4", 0.29),
+    ("u2", "u5", 0.899),
+    ("u6", "u7", 1.0),
+    ("u4", "u1", 0.5),
+]
+
+
+def _build_index(tmp_path, monkeypatch) -> PalmGraphIndex:
+    def export(_query, batch_size):
+        assert batch_size == palm_graph_index.EXPORT_BATCH_SIZE
+        palm_id1, palm_id2, pident = zip(*EDGES)
+        yield {"palm_id1": list(palm_id1), "palm_id2": list(palm_id2), "pident": pident}
+
+    monkeypatch.setattr(palm_graph_index, "iter_neo4j_query_columns", export)
+    path = str(tmp_path / "index")
+    metadata = build_palm_graph_index(path, release="test")
+    assert metadata["num_nodes"] == 7
+    assert metadata["num_edges"] == 2 * len(EDGES)
+    return PalmGraphIndex(path)
+
+
+def _fake_neo4j(query, params):
+    """Evaluate the similarity Cypher queries against EDGES."""
+    rows = {}
+    for palm_id in params["palm_ids"]:
+        for a, b, pident in EDGES:
+            if pident < params["percent_identity"] or palm_id not in (a, b):
+                continue
+            other = b if palm_id == a else a
+            if query == palmprints.SIMILAR_PALM_IDS_QUERY:
+                rows[(palm_id, other, pident)] = None
+            else:
+                rows[(other,)] = None
+    if query == palmprints.SIMILAR_PALM_IDS_QUERY:
+        columns = ["palm_id1", "palm_id2", "pident"]
+    else:
+        columns = ["palm_id"]
+    return {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+
+
+def _rows(result):
+    return sorted(tuple(row) for row in result["data"][1:])
+
+
+def test_index_matches_neo4j(tmp_path, monkeypatch):
+    index = _build_index(tmp_path, monkeypatch)
+    monkeypatch.setattr(palmprints, "run_neo4j_query_columns", _fake_neo4j)
+    monkeypatch.setattr(palmprints, "get_palm_graph_index", lambda: index)
+
+    for palm_ids in (["u1"], ["u1", "u4", "u1"], ["u3", "u6", "missing"], ["zz"]):
+        for percent_identity in (0, 29, 50, 89.9, 90, 100):
+            neo4j = palmprints.get_similar_palm_ids_neo4j(palm_ids, percent_identity)
+            local = palmprints.get_similar_palm_ids(palm_ids, percent_identity)
+            assert _rows(local) == _rows(neo4j), (palm_ids, percent_identity)
+
+            neo4j_neighbors = palmprints.get_similar_palm_id_neighbors_neo4j(
+                palm_ids, percent_identity
+            )
+            local_neighbors = palmprints.get_similar_palm_id_neighbors(
+                palm_ids, percent_identity
+            )
+            assert sorted(local_neighbors) == sorted(neo4j_neighbors)
+
+
+def test_index_orders_neighbors_by_pident(tmp_path, monkeypatch):
+    index = _build_index(tmp_path, monkeypatch)
+    palm_id1, palm_id2, pident = index.similar(["u1"], 0)
+    assert palm_id1 == ["u1", "u1", "u1"]
+    assert palm_id2 == ["u2", "u3", "u4"]
+    assert pident == [95, 90, 50]
+    assert not index.similar([], 0)[0]
+
+
+def test_get_palm_graph_index_ignores_stale_release(tmp_path, monkeypatch):
+    index = _build_index(tmp_path, monkeypatch)
+    monkeypatch.setenv("PALM_GRAPH_INDEX_DIR", index.path)
+    monkeypatch.setenv("PALM_GRAPH_INDEX_RELEASE", "test")
+    assert palm_graph_index.get_palm_graph_index().path == index.path
+    monkeypatch.setenv("PALM_GRAPH_INDEX_RELEASE", "other")
+    assert palm_graph_index.get_palm_graph_index() is None
+    monkeypatch.delenv("PALM_GRAPH_INDEX_DIR")
+    assert palm_graph_index.get_palm_graph_index() is None
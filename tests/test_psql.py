@@ -0,0 +1,111 @@
+import pytest
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from src.resources import psql
+from src.resources.psql import ConnectionPool
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self._rows = list(rows)
+        self.description = [("palm_id",), ("gb_pid",)]
+        self.itersize = None
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def execute(self, query, params=None):
+        del query, params
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class _Connection:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.closed = 0
+        self.cursors = []
+        self.in_transaction = False
+
+    def cursor(self, name=None):
+        del name
+        self.in_transaction = True
+        cursor = _Cursor(self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+    def get_transaction_status(self):
+        if self.in_transaction:
+            return extensions.TRANSACTION_STATUS_INTRANS
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(name="pool")
+def fixture_pool(monkeypatch):
+    conn = _Connection([(f"u{i}", 90) for i in range(10)])
+    pool = ConnectionPool("serratus", lambda: conn, max_size=1, acquire_timeout=0.1)
+    monkeypatch.setattr(psql, "_pools", {"serratus": pool})
+    return pool
+
+
+def test_abandoned_stream_releases_its_connection(pool):
+    batches = psql.iter_sql_query("SELECT 1", batch_size=3)
+    assert next(batches)[1] == [("u0", 90), ("u1", 90), ("u2", 90)]
+    assert pool.metrics()["in_use"] == 1
+    batches.close()
+    metrics = pool.metrics()
+    assert (metrics["in_use"], metrics["idle"]) == (0, 1)
+    conn = pool.acquire()
+    assert conn.cursors[0].closed
+    # The named cursor's transaction was rolled back before the connection was reused
+    assert not conn.in_transaction
+
+
+def test_stream_reads_every_batch(pool):
+    batches = list(psql.iter_sql_query("SELECT 1", batch_size=4))
+    assert [len(rows) for _, rows in batches] == [4, 4, 2]
+    assert batches[0][0] == ["palm_id", "gb_pid"]
+    assert pool.metrics()["in_use"] == 0
+
+
+def test_failed_connect_frees_the_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("unreachable")
+        return _Connection()
+
+    pool = ConnectionPool("test", connect, max_size=1, acquire_timeout=0.1)
+    with pytest.raises(OSError):
+        pool.acquire()
+    conn = pool.acquire()
+    with pytest.raises(PoolError):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.metrics()["checkout_failures"] == 2
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    fresh = _Connection()
+    connections = iter([_Connection(), fresh])
+    pool = ConnectionPool("test", lambda: next(connections), max_size=2)
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.closed = 1
+    assert pool.acquire() is fresh
+    assert pool.metrics()["discarded"] == 1
@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+
+from src.tools import request_encoding
+from src.tools.request_encoding import (
+    compress_body,
+    decode_accessions,
+    encode_accessions,
+)
+
+
+def test_accessions_round_trip_ignores_order_and_duplicates():
+    ids = ["SRR0000003", "SRR0000001", "SRR0000002", "SRR0000010", "SRR0000001"]
+    encoded = encode_accessions(ids)
+    assert encoded["groups"] == [{"prefix": "SRR", "digits": 7, "ranges": [1, 3, 7, 1]}]
+    assert sorted(decode_accessions(encoded)) == sorted(set(ids))
+
+
+def test_accessions_round_trip_mixed_prefixes_widths_and_other():
+    ids = [
+        "SRR123",
+        "SRR0123",
+        "SAMN00000042",
+        "PRJNA5",
+        "PRJNA6",
+        "ERR9",
+        "not-an-accession",
+        "ABC",
+    ]
+    encoded = encode_accessions(ids)
+    assert encoded["other"] == ["ABC", "not-an-accession"]
+    # The same number with different zero padding stays distinct
+    assert sorted(decode_accessions(encoded)) == sorted(ids)
+
+
+def test_accessions_empty():
+    encoded = encode_accessions([])
+    assert encoded == {"format": "accession-ranges", "groups": [], "other": []}
+    assert not decode_accessions(encoded)
+
+
+def test_compress_body_gzip_round_trip():
+    body = b'{"ids": ["SRR0000001"]}' * 100
+    assert gzip.decompress(compress_body(body, "gzip")) == body
+
+
+def test_compress_body_zstd_round_trip():
+    zstandard = pytest.importorskip("zstandard")
+    body = b'{"ids": ["SRR0000001"]}' * 100
+    compressed = compress_body(body, "zstd")
+    assert zstandard.ZstdDecompressor().decompress(compressed) == body
+
+
+def test_compress_body_without_zstandard(monkeypatch):
+    monkeypatch.setattr(request_encoding, "zstandard", None)
+    assert request_encoding.available_codings() == ["gzip"]
+    with pytest.raises(ValueError):
+        compress_body(b"{}", "zstd")
+    with pytest.raises(ValueError):
+        compress_body(b"{}", "br")
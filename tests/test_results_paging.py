@@ -0,0 +1,146 @@
+import asyncio
+import random
+
+import pytest
+
+from src.tools import openvirome_results
+
+ROWS = [{"run": f"SRR{i % 7}", "palm_id": f"u{i}"} for i in range(23)]
+
+
+@pytest.fixture(name="server")
+def fixture_server(monkeypatch):
+    """
+    Serve /results pages from `server["rows"]`, recording each payload. Rows that tie
+    on the sort column come back in a different order on every request, as they can
+    from LIMIT/OFFSET queries.
+    """
+    rng = random.Random(0)
+    server = {"rows": ROWS, "requests": [], "sorted": True}
+
+    def page(data):
+        server["requests"].append(data)
+        ids = set(getattr(data["ids"], "ids", data["ids"]))
+        rows = [row for row in server["rows"] if row["run"] in ids]
+        if server["sorted"]:
+            rng.shuffle(rows)
+            rows.sort(key=lambda row: row[data["sortByColumn"]])
+        return rows[data["pageStart"] : data["pageEnd"]]
+
+    async def stream_async(route, data, use_cache=True):
+        del route, use_cache
+        for row in page(data):
+            yield row
+
+    async def post_async(route, data, use_cache=True):
+        del route, use_cache
+        return page(data)
+
+    monkeypatch.setattr(
+        openvirome_results,
+        "stream_from_openvirome_api",
+        lambda route, data, use_cache=True: iter(page(data)),
+    )
+    monkeypatch.setattr(
+        openvirome_results,
+        "post_to_openvirome_api",
+        lambda route, data, use_cache=True: page(data),
+    )
+    monkeypatch.setattr(
+        openvirome_results, "stream_from_openvirome_api_async", stream_async
+    )
+    monkeypatch.setattr(openvirome_results, "post_to_openvirome_api_async", post_async)
+    return server
+
+
+def _collect(run_async: bool, **kwargs) -> list[dict]:
+    if not run_async:
+        return list(openvirome_results.iter_results_by_identifiers(**kwargs))
+
+    async def collect():
+        rows = openvirome_results.iter_results_by_identifiers_async(**kwargs)
+        return [row async for row in rows]
+
+    return asyncio.run(collect())
+
+
+def _palm_ids(rows: list[dict]) -> list[str]:
+    return sorted(row["palm_id"] for row in rows)
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+@pytest.mark.parametrize("run_async", [False, True])
+def test_pages_cover_every_row_once(server, prefetch, run_async):
+    rows = _collect(
+        run_async,
+        table="palm_virome",
+        id_column="run",
+        ids=[f"SRR{i}" for i in range(7)] * 2,
+        page_size=5,
+        prefetch=prefetch,
+    )
+    assert _palm_ids(rows) == _palm_ids(ROWS)
+    # Rows come grouped by run, in run order
+    runs = [row["run"] for row in rows]
+    assert runs == sorted(runs)
+    # Every page is keyed by the ids still to fetch, never by a row offset
+    for data in server["requests"]:
+        assert (data["sortByColumn"], data["sortByDirection"]) == ("run", "asc")
+        assert (data["pageStart"], data["pageEnd"]) == (0, 5)
+    assert len(server["requests"][-1]["ids"].ids) < 7
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+@pytest.mark.parametrize("run_async", [False, True])
+def test_id_with_more_rows_than_a_page(server, prefetch, run_async):
+    server["rows"] = ROWS + [{"run": "SRR1", "palm_id": f"v{i}"} for i in range(9)]
+    rows = _collect(
+        run_async,
+        table="palm_virome",
+        id_column="run",
+        ids=["SRR1", "SRR2"],
+        page_size=5,
+        prefetch=prefetch,
+    )
+    assert _palm_ids(rows) == _palm_ids(
+        [row for row in server["rows"] if row["run"] in ("SRR1", "SRR2")]
+    )
+    offset_pages = [
+        (data["ids"], data["sortByColumn"], data["pageStart"])
+        for data in server["requests"]
+        if data["pageStart"]
+    ]
+    assert offset_pages == [(["SRR1"], "palm_id", 5), (["SRR1"], "palm_id", 10)]
+
+
+def test_rows_out_of_id_order_are_rejected(server):
+    server["sorted"] = False
+    server["rows"] = [{"run": run, "palm_id": "u"} for run in ["A", "B", "A", "B"]]
+    with pytest.raises(ValueError, match="ordered by run"):
+        list(
+            openvirome_results.iter_results_by_identifiers(
+                "palm_virome", "run", ["A", "B"], page_size=10
+            )
+        )
+
+
+def test_no_ids_make_no_requests(server):
+    assert not _collect(False, table="palm_virome", id_column="run", ids=[])
+    assert not _collect(
+        True, table="palm_virome", id_column="run", ids=[], prefetch=True
+    )
+    assert not server["requests"]
+
+
+def test_abandoned_async_prefetch_is_cancelled(server):
+    async def first_row():
+        rows = openvirome_results.iter_results_by_identifiers_async(
+            "palm_virome", "run", ["SRR1", "SRR2"], page_size=2, prefetch=True
+        )
+        row = await anext(rows)
+        await rows.aclose()
+        await asyncio.sleep(0)
+        return row
+
+    assert asyncio.run(first_row())["run"] in ("SRR1", "SRR2")
+    assert len(server["requests"]) <= 3
@@ -0,0 +1,99 @@
+# pylint: disable=protected-access
+import asyncio
+import threading
+
+import pytest
+
+from src.resources import neo4j
+from src.tools.cache import SingleFlight
+
+
+def _run_concurrently(single_flight, fn, callers=4):
+    """Call `single_flight.do` from several threads while `fn` blocks."""
+    release = threading.Event()
+    results, errors = [], []
+
+    def leader_fn():
+        release.wait(5)
+        return fn()
+
+    def call():
+        try:
+            results.append(single_flight.do("key", leader_fn))
+        except Exception as error:
+            errors.append(error)
+
+    coalesced = single_flight.stats()["coalesced"] + callers - 1
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    while single_flight.stats()["coalesced"] < coalesced:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_waiters_share_a_copy_of_the_result():
+    single_flight = SingleFlight("test_copy", copy=list)
+    results, errors = _run_concurrently(single_flight, lambda: [1, 2])
+    assert not errors
+    assert results == [[1, 2]] * 4
+    assert len({id(result) for result in results}) == 4
+    assert single_flight.stats()["calls"] == 1
+
+
+def test_waiters_share_a_none_result():
+    single_flight = SingleFlight("test_none", copy=list)
+    results, errors = _run_concurrently(single_flight, lambda: None)
+    assert not errors
+    assert results == [None] * 4
+
+
+def test_waiters_reraise_the_leaders_error():
+    def fail():
+        raise RuntimeError("backend down")
+
+    single_flight = SingleFlight("test_error", copy=list)
+    results, errors = _run_concurrently(single_flight, fail)
+    assert not results
+    assert len(errors) == 4
+    assert all(str(error) == "backend down" for error in errors)
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_async_waiters_reraise_the_leaders_error():
+    single_flight = SingleFlight("test_async_error", copy=list)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def main():
+        return await asyncio.gather(
+            *(single_flight.do_async("key", fail) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(main())
+    assert [str(error) for error in errors] == ["backend down"] * 3
+    assert single_flight.stats() == {
+        "name": "test_async_error",
+        "calls": 1,
+        "coalesced": 2,
+        "in_flight": 0,
+    }
+
+
+@pytest.mark.parametrize(
+    "single_flight",
+    [
+        neo4j._in_flight_records,
+        neo4j._in_flight_columns,
+    ],
+)
+def test_failed_neo4j_query_is_shared_as_none(single_flight):
+    results, errors = _run_concurrently(single_flight, lambda: None)
+    assert not errors
+    assert results == [None] * 4
@@ -0,0 +1,55 @@
+import pytest
+
+from src.resources.species_index import SpeciesIndex
+from src.tools import palmprints
+
+ROWS = [
+    ("u1", "Tobacco mosaic virus", 95),
+    ("u2", "Tobacco mosaic virus", 85),
+    ("u3", "Tomato mosaic virus", 99),
+    ("u4", "Zika virus", 92),
+]
+
+
+def _fake_run_sql_query(query, conn=None, params=None, database="serratus"):
+    """Evaluate the species queries over ROWS the way Postgres would."""
+    del conn, database
+    header = ["palm_id", "tax_species", "gb_pid"]
+    if query == palmprints.SPECIES_NAMES_QUERY:
+        return [["tax_species"]] + [[name] for name in sorted({r[1] for r in ROWS})]
+    if query == palmprints.PALM_IDS_BY_SPECIES_QUERY:
+        fragment = params[0].strip("%").lower()
+        names = {r[1] for r in ROWS if fragment in r[1].lower()}
+    else:
+        names = set(params[0])
+    return [header] + [
+        [palm_id, name, str(gb_pid)]
+        for palm_id, name, gb_pid in ROWS
+        if name in names and gb_pid >= params[1]
+    ]
+
+
+@pytest.fixture(name="lookup", params=["index", "postgres"])
+def fixture_lookup(request, monkeypatch):
+    index = SpeciesIndex(ROWS) if request.param == "index" else None
+    monkeypatch.setattr(palmprints, "get_species_index", lambda: index)
+    monkeypatch.setattr(palmprints, "run_sql_query", _fake_run_sql_query)
+    return palmprints.get_palm_ids_by_species
+
+
+def test_substring_match(lookup):
+    result = lookup("mosaic", 90)
+    assert [row[0] for row in result["data"][1:]] == ["u1", "u3"]
+    assert result["matched_species"] == ["Tobacco mosaic virus", "Tomato mosaic virus"]
+
+
+def test_misspelling_needs_fuzzy(lookup):
+    assert lookup("Tobaco mosaic virus", 80) == {"data": []}
+    result = lookup("Tobaco mosaic virus", 80, fuzzy=True)
+    assert [row[0] for row in result["data"][1:]] == ["u1", "u2"]
+    assert result["matched_species"] == ["Tobacco mosaic virus"]
+
+
+def test_fuzzy_skipped_when_a_species_matches(lookup):
+    # Zika virus matches but has no palm_id at 95%; it isn't swapped for another
+    assert lookup("Zika virus", 95, fuzzy=True) == {"data": []}
@@ -0,0 +1,191 @@
+import asyncio
+import time
+import types
+
+import httpx
+import pytest
+
+from src.tools import upstream
+from src.tools.upstream import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    UpstreamRoute,
+    UpstreamUnavailableError,
+)
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    """Replace the module's clock with one the test advances by hand."""
+    clock = types.SimpleNamespace(now=1000.0, sleep=time.sleep)
+    clock.monotonic = lambda: clock.now
+    monkeypatch.setattr(upstream, "time", clock)
+    return clock
+
+
+def test_limit_grows_additively_and_halves_on_overload(clock):
+    limiter = AdaptiveLimiter(4, 1, 6, latency_target=1.0)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == pytest.approx(4.92, abs=0.01)
+
+    limiter.acquire()
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == pytest.approx(2.46, abs=0.01)
+    # A second overload within one latency target counts as the same burst
+    limiter.acquire()
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == pytest.approx(2.46, abs=0.01)
+    clock.now += 1.0
+    limiter.acquire()
+    limiter.release(5.0)
+    assert limiter.limit == pytest.approx(1.23, abs=0.01)
+
+
+def test_limit_stays_within_bounds(clock):
+    limiter = AdaptiveLimiter(2, 1, 3, latency_target=1.0)
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 3
+    for _ in range(10):
+        clock.now += 1.0
+        limiter.acquire()
+        limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 1
+    limiter.acquire()
+    limiter.release(None)
+    assert (limiter.limit, limiter.in_flight) == (1, 0)
+
+
+def test_async_waiter_gets_the_freed_slot():
+    limiter = AdaptiveLimiter(1, 1, 1, latency_target=1.0)
+
+    async def main():
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert limiter.waiting() == 1 and not waiter.done()
+        limiter.release(0.1)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_breaker_transitions(clock):
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=30)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() == 30
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+class _Body(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """A response body that arrives in chunks, as from a real connection."""
+
+    def __init__(self, *chunks):
+        self._chunks = chunks
+
+    def __iter__(self):
+        yield from self._chunks
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def _route(**policy):
+    return UpstreamRoute(
+        "test",
+        {"backoff_base_seconds": 0, "backoff_max_seconds": 0, **policy},
+    )
+
+
+def _client(statuses):
+    statuses = iter(statuses)
+    return httpx.Client(
+        base_url="http://upstream",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(next(statuses), stream=_Body(b"[1, ", b"2]"))
+        ),
+    )
+
+
+def _post(client, stream=False):
+    return lambda timeout: client.send(
+        client.build_request("POST", "/results", timeout=timeout), stream=stream
+    )
+
+
+def test_retries_until_success():
+    route = _route()
+    response = route.send(_post(_client([503, 429, 200])))
+    assert response.status_code == 200
+    stats = route.stats()
+    assert (stats["requests"], stats["failures"], stats["retries"]) == (3, 2, 2)
+    assert stats["throttled"] == 1 and stats["circuit_state"] == "closed"
+
+
+def test_open_circuit_fails_fast():
+    route = _route(failure_threshold=2, max_retries=5)
+    response = route.send(_post(_client([503, 503, 200])))
+    # Retrying stops once the circuit opens; the last failure is returned
+    assert response.status_code == 503
+    with pytest.raises(UpstreamUnavailableError):
+        route.send(_post(_client([200])))
+    assert route.stats()["rejected"] == 1
+
+
+def test_non_idempotent_route_is_not_retried():
+    route = _route(idempotent=False)
+    assert route.send(_post(_client([502, 200]))).status_code == 502
+
+
+def test_streamed_response_holds_its_slot_until_closed():
+    route = _route()
+    response = route.send(_post(_client([200]), stream=True))
+    assert route.stats()["in_flight"] == 1
+    assert response.read() == b"[1, 2]"
+    response.close()
+    response.close()
+    assert route.stats()["in_flight"] == 0
+
+
+def test_async_streamed_response_holds_its_slot_until_closed():
+    route = _route()
+    client = httpx.AsyncClient(
+        base_url="http://upstream",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=_Body(b"[", b"]"))
+        ),
+    )
+
+    async def main():
+        response = await route.send_async(_post(client, stream=True))
+        assert route.stats()["in_flight"] == 1
+        async for _ in response.aiter_bytes():
+            pass
+        await response.aclose()
+        await client.aclose()
+
+    asyncio.run(main())
+    assert route.stats()["in_flight"] == 0
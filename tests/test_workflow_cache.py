@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.tools import palmprints
+from src.tools.workflows import virus_metadata_analysis
+from src.tools.workflows.cache import (
+    get_workflow_store,
+    state_cache_policy,
+    workflow_cache,
+)
+from src.tools.workflows.state import State
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_CACHE_PATH", str(tmp_path / "nodes.sqlite3"))
+    return get_workflow_store()
+
+
+def _neighbors_graph():
+    graph = StateGraph(State)
+    graph.add_node(
+        "neighbors",
+        virus_metadata_analysis.get_evol_similar_palm_ids,
+        cache_policy=state_cache_policy("palm_ids"),
+    )
+    graph.add_edge(START, "neighbors")
+    graph.add_edge("neighbors", END)
+    return graph.compile(cache=workflow_cache)
+
+
+def test_similarity_batches_raise_when_a_batch_fails(monkeypatch):
+    results = iter([{"palm_id": ["u2"]}, None])
+    monkeypatch.setattr(
+        palmprints,
+        "run_neo4j_query_columns",
+        lambda query, params: next(results),
+    )
+    monkeypatch.setattr(palmprints, "SIMILARITY_BATCH_SIZE", 1)
+    monkeypatch.setattr(palmprints, "SIMILARITY_BATCH_CONCURRENCY", 1)
+    with pytest.raises(RuntimeError, match="1 of 2 batches"):
+        palmprints.get_similar_palm_id_neighbors_neo4j(["u1", "u3"], 80)
+
+
+def test_failed_node_is_not_cached(store, monkeypatch):
+    monkeypatch.setattr(palmprints, "get_palm_graph_index", lambda: None)
+    monkeypatch.setattr(palmprints, "run_neo4j_query_columns", lambda *_, **__: None)
+    app = _neighbors_graph()
+    with pytest.raises(RuntimeError):
+        asyncio.run(app.ainvoke({"palm_ids": ["u1"]}))
+    assert store.stats()["entries"] == 0
+
+    monkeypatch.setattr(
+        palmprints,
+        "run_neo4j_query_columns",
+        lambda *_, **__: {"palm_id": ["u1", "u2"]},
+    )
+    state = asyncio.run(app.ainvoke({"palm_ids": ["u1"]}))
+    # The node's new palm_ids are merged into the input's
+    assert state["palm_ids"] == ["u1", "u2"]
+    assert store.stats()["entries"] == 1
+
+
+def test_empty_outcomes_are_not_cached(store, monkeypatch):
+    monkeypatch.setattr(palmprints, "get_palm_graph_index", lambda: None)
+    monkeypatch.setattr(
+        palmprints, "run_neo4j_query_columns", lambda *_, **__: {"palm_id": ["u1"]}
+    )
+    app = _neighbors_graph()
+    # No new neighbors, and no palm ids at all: neither outcome writes data
+    asyncio.run(app.ainvoke({"palm_ids": ["u1"]}))
+    asyncio.run(app.ainvoke({"palm_ids": []}))
+    assert store.stats()["entries"] == 0